@@ -0,0 +1,4 @@
+"""
+Python analytics for the MTG Analytics pipeline.
+Modules in this package are imported lazily by the orchestrator, stage by stage.
+"""
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metagame aggregates for the MTG Analytics pipeline.
+Aggregates are computed per tournament, then merged, so they can be cached
+and combined over any date range without re-reading the decklists.
+"""
+
+UNKNOWN_ARCHETYPE = "Unknown"
+
+def empty_aggregate():
+    """Return an empty aggregate."""
+    return {"decks": 0, "archetypes": {}, "matchups": {}, "cards": {}}
+
+def tournament_aggregate(tournament):
+    """Compute the aggregate contribution of a single tournament.
+
+    - archetypes: {archetype: deck count}
+    - matchups: {archetype: {opponent archetype: [wins, losses, draws]}}
+    - cards: {card: [main decks, main copies, side decks, side copies]}
+    """
+    aggregate = empty_aggregate()
+    aggregate["date"] = tournament.get("date")
+    aggregate["format"] = tournament.get("format")
+
+    decks = tournament.get("decks", [])
+    archetype_by_deck = {
+        deck.get("deck_id"): deck.get("archetype") or UNKNOWN_ARCHETYPE
+        for deck in decks
+    }
+
+    for deck in decks:
+        archetype = archetype_by_deck.get(deck.get("deck_id"), UNKNOWN_ARCHETYPE)
+        aggregate["decks"] += 1
+        aggregate["archetypes"][archetype] = aggregate["archetypes"].get(archetype, 0) + 1
+
+        for match in deck.get("matches", []):
+            opponent = archetype_by_deck.get(match.get("opponent_id"))
+            if opponent is None:
+                continue
+            record = aggregate["matchups"].setdefault(archetype, {}).setdefault(opponent, [0, 0, 0])
+            result = match.get("result")
+            if result == "win":
+                record[0] += 1
+            elif result == "loss":
+                record[1] += 1
+            else:
+                record[2] += 1
+
+        for board, offset in (("mainboard", 0), ("sideboard", 2)):
+            seen = set()
+            for card in deck.get(board, []):
+                name = card.get("card_name")
+                if not name:
+                    continue
+                stats = aggregate["cards"].setdefault(name, [0, 0, 0, 0])
+                if name not in seen:
+                    stats[offset] += 1
+                    seen.add(name)
+                stats[offset + 1] += card.get("quantity") or 0
+
+    return aggregate
+
+def merge_aggregates(aggregates):
+    """Merge tournament aggregates into a single aggregate."""
+    merged = empty_aggregate()
+    merged["tournaments"] = 0
+
+    for aggregate in aggregates:
+        merged["tournaments"] += 1
+        merged["decks"] += aggregate["decks"]
+
+        for archetype, count in aggregate["archetypes"].items():
+            merged["archetypes"][archetype] = merged["archetypes"].get(archetype, 0) + count
+
+        for archetype, opponents in aggregate["matchups"].items():
+            target = merged["matchups"].setdefault(archetype, {})
+            for opponent, record in opponents.items():
+                totals = target.setdefault(opponent, [0, 0, 0])
+                for i, value in enumerate(record):
+                    totals[i] += value
+
+        for card, stats in aggregate["cards"].items():
+            totals = merged["cards"].setdefault(card, [0, 0, 0, 0])
+            for i, value in enumerate(stats):
+                totals[i] += value
+
+    return merged
+
+def metagame_shares(aggregate):
+    """Return archetype shares, most played first."""
+    total = aggregate["decks"]
+    archetypes = sorted(aggregate["archetypes"].items(), key=lambda item: (-item[1], item[0]))
+    return {
+        "total_decks": total,
+        "tournaments": aggregate.get("tournaments", 0),
+        "archetypes": [
+            {"name": name, "decks": count, "share": round(count / total, 4) if total else 0.0}
+            for name, count in archetypes
+        ]
+    }
+
+def matchup_matrix(aggregate, archetypes=None):
+    """Return the win-rate matrix between archetypes (draws excluded from win rates)."""
+    if archetypes is None:
+        archetypes = [entry["name"] for entry in metagame_shares(aggregate)["archetypes"]]
+
+    win_rates = []
+    matches = []
+    for archetype in archetypes:
+        rate_row = []
+        match_row = []
+        opponents = aggregate["matchups"].get(archetype, {})
+        for opponent in archetypes:
+            wins, losses, draws = opponents.get(opponent, [0, 0, 0])
+            decided = wins + losses
+            rate_row.append(round(wins / decided, 4) if decided else None)
+            match_row.append(wins + losses + draws)
+        win_rates.append(rate_row)
+        matches.append(match_row)
+
+    return {"archetypes": archetypes, "win_rates": win_rates, "matches": matches}
+
+def card_stats(aggregate, limit=200):
+    """Return play rate and average copies of the most played cards."""
+    total = aggregate["decks"]
+    cards = sorted(aggregate["cards"].items(), key=lambda item: (-(item[1][0] + item[1][2]), item[0]))
+    result = []
+    for name, (main_decks, main_copies, side_decks, side_copies) in cards[:limit]:
+        result.append({
+            "card": name,
+            "main_rate": round(main_decks / total, 4) if total else 0.0,
+            "main_copies": round(main_copies / main_decks, 2) if main_decks else 0.0,
+            "side_rate": round(side_decks / total, 4) if total else 0.0,
+            "side_copies": round(side_copies / side_decks, 2) if side_decks else 0.0
+        })
+    return {"total_decks": total, "cards": result}
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sparse deck-by-card matrix for the MTG Analytics pipeline.
+Decks are rows and cards are columns, stored in CSR layout with NumPy arrays.
+Mainboard and sideboard counts share the same sparsity structure.
+"""
+
+import numpy as np
+
+class DeckCardMatrix:
+    """Deck-by-card count matrix in CSR layout.
+
+    Row i holds the cards of deck i in indices[indptr[i]:indptr[i + 1]], with
+    their mainboard counts in main[...] and their sideboard counts in side[...].
+    """
+
+    def __init__(self, indptr, indices, main, side, cards, deck_ids, archetypes=None, metadata=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.main = main
+        self.side = side
+        self.cards = cards
+        self.deck_ids = deck_ids
+        self.archetypes = archetypes if archetypes is not None else [None] * len(deck_ids)
+        self.metadata = metadata or {}
+        self.card_index = {name: i for i, name in enumerate(cards)}
+
+    @property
+    def shape(self):
+        return (len(self.indptr) - 1, len(self.cards))
+
+    @classmethod
+    def from_decks(cls, decks, card_index=None):
+        """Build the matrix from unified-format decks."""
+        card_index = dict(card_index or {})
+        indptr = [0]
+        indices = []
+        main = []
+        side = []
+        deck_ids = []
+        archetypes = []
+
+        for deck in decks:
+            counts = {}
+            for board, slot in (("mainboard", 0), ("sideboard", 1)):
+                for card in deck.get(board, []):
+                    name = card.get("card_name")
+                    if not name:
+                        continue
+                    card_id = card_index.setdefault(name, len(card_index))
+                    entry = counts.setdefault(card_id, [0, 0])
+                    entry[slot] += card.get("quantity") or 0
+
+            for card_id in sorted(counts):
+                indices.append(card_id)
+                main.append(counts[card_id][0])
+                side.append(counts[card_id][1])
+            indptr.append(len(indices))
+            deck_ids.append(deck.get("deck_id"))
+            archetypes.append(deck.get("archetype"))
+
+        cards = [None] * len(card_index)
+        for name, card_id in card_index.items():
+            cards[card_id] = name
+
+        return cls(
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(main, dtype=np.int16),
+            np.asarray(side, dtype=np.int16),
+            cards,
+            deck_ids,
+            archetypes
+        )
+
+    @classmethod
+    def from_tournaments(cls, tournaments, card_index=None):
+        """Build the matrix from every deck of unified-format tournaments."""
+        return cls.from_decks((deck for tournament in tournaments for deck in tournament.get("decks", [])), card_index)
+
+    def row_cards(self, row, include_sideboard=False):
+        """Return the column indices of the cards played by a deck."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        if include_sideboard:
+            return self.indices[start:end]
+        return self.indices[start:end][self.main[start:end] > 0]
+
+    def row_lengths(self):
+        """Return the number of distinct cards of each deck."""
+        return np.diff(self.indptr)
+
+    def to_scipy(self, board="main"):
+        """Return a scipy.sparse.csr_matrix of the mainboard or sideboard counts."""
+        from scipy.sparse import csr_matrix
+        data = self.main if board == "main" else self.side
+        return csr_matrix((data, self.indices, self.indptr), shape=self.shape)
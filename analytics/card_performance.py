@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Card-level performance analytics for the MTG Analytics pipeline.
+For every archetype, computes the play rate and average copies of its cards
+and the win-rate delta of the decks that play a card against the decks of
+the same archetype that do not.
+
+Everything is computed with NumPy group-bys over a slice of the card store:
+the non-zero entries of the deck-by-card matrix are keyed by (archetype, card)
+and reduced with bincount, so a year of a format takes a few passes over
+its arrays instead of a loop over decks.
+
+Example:
+  python -m analytics.card_performance --format modern --days 365
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from analytics.card_store import update_store
+from analytics.dataset import processed_data_dir, configure_logging
+
+logger = logging.getLogger('analytics.card_performance')
+
+# Archetypes with fewer decks are left out; deltas need enough matches on both sides
+DEFAULT_MIN_DECKS = 20
+DEFAULT_MIN_MATCHES = 30
+DEFAULT_CARD_LIMIT = 40
+
+def _rate(numerator, denominator):
+    """Divide element-wise, with NaN where the denominator is zero."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+def _round(value, digits=4):
+    return None if np.isnan(value) else round(float(value), digits)
+
+def card_performance(matrix, board="main", min_decks=DEFAULT_MIN_DECKS, min_matches=DEFAULT_MIN_MATCHES,
+                     limit=DEFAULT_CARD_LIMIT):
+    """Return the per-archetype card statistics of a DeckCardMatrix sliced from the card store.
+
+    The matrix metadata must hold the per-deck "archetype" codes and "wins" and
+    "losses" counts. Decks without archetype are counted in no archetype.
+    """
+    rows, columns = matrix.shape
+    archetype_names = matrix.archetypes.vocabulary
+    if rows == 0 or not archetype_names:
+        return {"board": board, "archetypes": []}
+
+    archetypes = np.asarray(matrix.metadata["archetype"], dtype=np.int64)
+    wins = np.asarray(matrix.metadata["wins"], dtype=np.int64)
+    losses = np.asarray(matrix.metadata["losses"], dtype=np.int64)
+    counts = np.asarray(matrix.main if board == "main" else matrix.side)
+    cards = np.asarray(matrix.indices, dtype=np.int64)
+    entry_rows = np.repeat(np.arange(rows), np.diff(np.asarray(matrix.indptr)))
+
+    # Entries of decks with an archetype and a copy of the card on the board
+    played = (counts > 0) & (archetypes[entry_rows] >= 0)
+    entry_rows, cards, counts = entry_rows[played], cards[played], counts[played]
+    entry_archetypes = archetypes[entry_rows]
+
+    # Per archetype totals
+    typed = archetypes >= 0
+    archetype_count = len(archetype_names)
+    decks = np.bincount(archetypes[typed], minlength=archetype_count)
+    archetype_wins = np.bincount(archetypes[typed], weights=wins[typed], minlength=archetype_count)
+    archetype_losses = np.bincount(archetypes[typed], weights=losses[typed], minlength=archetype_count)
+
+    # Per (archetype, card) group-by over the non-zero entries
+    keys, groups = np.unique(entry_archetypes * columns + cards, return_inverse=True)
+    group_archetypes, group_cards = keys // columns, keys % columns
+    group_decks = np.bincount(groups)
+    group_copies = np.bincount(groups, weights=counts)
+    group_wins = np.bincount(groups, weights=wins[entry_rows])
+    group_losses = np.bincount(groups, weights=losses[entry_rows])
+
+    without_wins = archetype_wins[group_archetypes] - group_wins
+    without_losses = archetype_losses[group_archetypes] - group_losses
+    play_rate = group_decks / decks[group_archetypes]
+    average_copies = group_copies / group_decks
+    rate_with = _rate(group_wins, group_wins + group_losses)
+    rate_without = _rate(without_wins, without_wins + without_losses)
+    # A delta needs enough matches with and without the card
+    reliable = (group_wins + group_losses >= min_matches) & (without_wins + without_losses >= min_matches)
+    delta = np.where(reliable, rate_with - rate_without, np.nan)
+
+    # Groups sorted by archetype, then by play rate
+    order = np.lexsort((-play_rate, group_archetypes))
+    boundaries = np.searchsorted(group_archetypes[order], np.arange(archetype_count + 1))
+    archetype_win_rate = _rate(archetype_wins, archetype_wins + archetype_losses)
+
+    result = []
+    for code in np.argsort(-decks, kind="stable"):
+        if decks[code] < min_decks:
+            break
+        selected = order[boundaries[code]:boundaries[code + 1]][:limit]
+        result.append({
+            "archetype": archetype_names[code],
+            "decks": int(decks[code]),
+            "win_rate": _round(archetype_win_rate[code]),
+            "cards": [
+                {
+                    "card": matrix.cards[group_cards[i]],
+                    "decks": int(group_decks[i]),
+                    "play_rate": _round(play_rate[i]),
+                    "average_copies": _round(average_copies[i], 2),
+                    "win_rate_with": _round(rate_with[i]),
+                    "win_rate_without": _round(rate_without[i]),
+                    "win_rate_delta": _round(delta[i]),
+                    "matches_with": int(group_wins[i] + group_losses[i])
+                }
+                for i in selected
+            ]
+        })
+    return {"board": board, "archetypes": result}
+
+def card_performance_section(store_dir, data_dir, start_date=None, end_date=None, **kwargs):
+    """Update the card store of a format and return the card performance of a date range, for the report."""
+    store, added = update_store(store_dir, data_dir)
+    if added:
+        logger.info(f"Card store updated with {added} decks.")
+    section = card_performance(store.slice(start_date, end_date), **kwargs)
+    section.update({"start_date": start_date, "end_date": end_date})
+    return section
+
+def main():
+    """Print the card performance of a format over a date range."""
+    configure_logging()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Per-archetype card play rates and win-rate deltas")
+    parser.add_argument("--format", required=True, help="Format to analyze")
+    parser.add_argument("--days", type=int, default=365, help="Number of days ending at --end-date")
+    parser.add_argument("--end-date", default=datetime.now().strftime("%Y-%m-%d"), help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--board", choices=["main", "side"], default="main", help="Board to analyze")
+    parser.add_argument("--min-decks", type=int, default=DEFAULT_MIN_DECKS, help="Minimum decks of an archetype")
+    parser.add_argument("--min-matches", type=int, default=DEFAULT_MIN_MATCHES,
+                        help="Minimum matches with and without a card for its win-rate delta")
+    parser.add_argument("--limit", type=int, default=DEFAULT_CARD_LIMIT, help="Cards per archetype")
+    parser.add_argument("--store-dir", help="Card store directory (default: data/card-store/<format>)")
+    args = parser.parse_args()
+
+    end_date = args.end_date
+    start_date = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    store_dir = args.store_dir or os.path.join(base_dir, "data", "card-store", args.format.lower())
+    section = card_performance_section(
+        store_dir, processed_data_dir(base_dir, args.format), start_date, end_date,
+        board=args.board, min_decks=args.min_decks, min_matches=args.min_matches, limit=args.limit
+    )
+    print(json.dumps(section, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
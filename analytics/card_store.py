@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent memory-mapped deck-by-card store for the MTG Analytics pipeline.
+Keeps the CSR deck-by-card counts of a whole format history on disk, with
+companion per-deck arrays (date, format, archetype, source, rank, match wins
+and losses), sorted by date so that a date range is a contiguous block of rows
+that can be sliced without copying or loading the rest of the history.
+
+Example:
+  python -m analytics.card_store --format modern
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import date
+
+import numpy as np
+
+from analytics.card_matrix import DeckCardMatrix
+from analytics.dataset import (
+    processed_data_dir, list_tournament_files, load_tournament, configure_logging, _use_data_collection_modules
+)
+
+logger = logging.getLogger('analytics.card_store')
+
+STORE_VERSION = 2
+
+# Array name -> dtype. Row arrays have one entry per deck, pointer arrays one more.
+ARRAYS = {
+    "indptr": np.int64,
+    "indices": np.int32,
+    "main": np.int16,
+    "side": np.int16,
+    "date": np.int32,
+    "format": np.int16,
+    "archetype": np.int32,
+    "source": np.int16,
+    "rank": np.int16,
+    "wins": np.int16,
+    "losses": np.int16,
+    "tournament": np.int32,
+    "deck_id_offsets": np.int64,
+    "deck_ids": np.uint8
+}
+
+VOCABULARIES = ("cards", "formats", "archetypes", "sources", "tournaments")
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+def date_to_day(iso_date):
+    """Convert an ISO date string to a day number."""
+    return date.fromisoformat(iso_date).toordinal() - _EPOCH
+
+def day_to_date(day):
+    """Convert a day number back to an ISO date string."""
+    return date.fromordinal(int(day) + _EPOCH).isoformat()
+
+def _empty_meta():
+    meta = {"version": STORE_VERSION, "rows": 0, "nnz": 0, "id_bytes": 0, "files": {}}
+    meta.update({name: [] for name in VOCABULARIES})
+    return meta
+
+class CodedView:
+    """Read-only sequence decoding integer codes through a vocabulary."""
+
+    def __init__(self, codes, vocabulary):
+        self.codes = codes
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return self.vocabulary[code] if code >= 0 else None
+
+    def __iter__(self):
+        for code in self.codes:
+            yield self.vocabulary[code] if code >= 0 else None
+
+class DeckIdView:
+    """Read-only sequence of deck ids stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class CardCountStore:
+    """Memory-mapped deck-by-card counts of one format, rows sorted by date."""
+
+    def __init__(self, store_dir):
+        """Open the store in store_dir (empty if it does not exist yet)."""
+        self.store_dir = store_dir
+        self.meta = self._load_meta()
+        self.arrays = self._map_arrays()
+
+    def _path(self, name):
+        return os.path.join(self.store_dir, f"{name}.bin")
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.store_dir, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("version") == STORE_VERSION:
+                return meta
+            logger.warning(f"Ignoring card store with unsupported version in {self.store_dir}")
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable card store metadata in {self.store_dir}: {e}")
+        return _empty_meta()
+
+    def _lengths(self):
+        rows, nnz, id_bytes = self.meta["rows"], self.meta["nnz"], self.meta["id_bytes"]
+        lengths = {name: rows for name in ARRAYS}
+        lengths.update({"indptr": rows + 1, "deck_id_offsets": rows + 1,
+                        "indices": nnz, "main": nnz, "side": nnz, "deck_ids": id_bytes})
+        return lengths
+
+    def _map_arrays(self):
+        """Memory-map every array, limited to the rows recorded in the metadata."""
+        arrays = {}
+        for name, length in self._lengths().items():
+            if length == 0 or not os.path.exists(self._path(name)):
+                arrays[name] = np.zeros(1 if name in ("indptr", "deck_id_offsets") else 0, dtype=ARRAYS[name])
+            else:
+                arrays[name] = np.memmap(self._path(name), dtype=ARRAYS[name], mode='r', shape=(length,))
+        return arrays
+
+    @property
+    def rows(self):
+        return self.meta["rows"]
+
+    def date_range(self):
+        """Return the first and last dates in the store."""
+        if not self.rows:
+            return None, None
+        dates = self.arrays["date"]
+        return day_to_date(dates[0]), day_to_date(dates[-1])
+
+    def row_range(self, start_date=None, end_date=None):
+        """Return the [first, last) rows of decks within an inclusive date range."""
+        dates = self.arrays["date"]
+        first = int(np.searchsorted(dates, date_to_day(start_date), side="left")) if start_date else 0
+        last = int(np.searchsorted(dates, date_to_day(end_date), side="right")) if end_date else self.rows
+        return first, max(first, last)
+
+    def slice(self, start_date=None, end_date=None):
+        """Return a DeckCardMatrix over a date range backed by views of the mapped arrays."""
+        first, last = self.row_range(start_date, end_date)
+        arrays = self.arrays
+        indptr = arrays["indptr"][first:last + 1]
+        low, high = int(indptr[0]), int(indptr[-1])
+
+        matrix = DeckCardMatrix(
+            np.asarray(indptr) - low,
+            arrays["indices"][low:high],
+            arrays["main"][low:high],
+            arrays["side"][low:high],
+            self.meta["cards"],
+            DeckIdView(arrays["deck_id_offsets"][first:last + 1], arrays["deck_ids"]),
+            CodedView(arrays["archetype"][first:last], self.meta["archetypes"]),
+            {name: arrays[name][first:last]
+             for name in ("date", "format", "archetype", "source", "rank", "wins", "losses", "tournament")}
+        )
+        return matrix
+
+    def _encode_tournament(self, tournament, vocab_index):
+        """Encode the decks of a tournament into per-array lists."""
+        encoded = {name: [] for name in ARRAYS}
+        day = date_to_day(tournament["date"])
+        codes = {
+            "format": vocab_index["formats"].setdefault(tournament.get("format") or "", len(vocab_index["formats"])),
+            "source": vocab_index["sources"].setdefault(tournament.get("source") or "", len(vocab_index["sources"])),
+            "tournament": vocab_index["tournaments"].setdefault(tournament.get("tournament_id"),
+                                                                len(vocab_index["tournaments"]))
+        }
+
+        for deck in tournament.get("decks", []):
+            counts = {}
+            for board, slot in (("mainboard", 0), ("sideboard", 1)):
+                for card in deck.get(board, []):
+                    name = card.get("card_name")
+                    if not name:
+                        continue
+                    card_id = vocab_index["cards"].setdefault(name, len(vocab_index["cards"]))
+                    counts.setdefault(card_id, [0, 0])[slot] += card.get("quantity") or 0
+
+            for card_id in sorted(counts):
+                encoded["indices"].append(card_id)
+                encoded["main"].append(counts[card_id][0])
+                encoded["side"].append(counts[card_id][1])
+            encoded["indptr"].append(len(counts))
+
+            archetype = deck.get("archetype")
+            encoded["archetype"].append(
+                vocab_index["archetypes"].setdefault(archetype, len(vocab_index["archetypes"])) if archetype else -1
+            )
+            encoded["date"].append(day)
+            encoded["format"].append(codes["format"])
+            encoded["source"].append(codes["source"])
+            encoded["tournament"].append(codes["tournament"])
+            rank = deck.get("rank")
+            encoded["rank"].append(rank if isinstance(rank, int) else -1)
+            results = [match.get("result") for match in deck.get("matches", [])]
+            encoded["wins"].append(results.count("win"))
+            encoded["losses"].append(results.count("loss"))
+            deck_id = (deck.get("deck_id") or "").encode("utf-8")
+            encoded["deck_ids"].append(deck_id)
+
+        return encoded
+
+    def append(self, tournaments):
+        """Append tournaments dated on or after the last stored date.
+
+        Tournaments already in the store are skipped. Returns the number of decks
+        added, or None if a tournament predates the store and a rebuild is needed.
+        """
+        known = set(self.meta["tournaments"])
+        tournaments = sorted(
+            (t for t in tournaments if t.get("date") and t.get("tournament_id") not in known),
+            key=lambda t: t["date"]
+        )
+        if not tournaments:
+            return 0
+        last_day = int(self.arrays["date"][-1]) if self.rows else None
+        if last_day is not None and date_to_day(tournaments[0]["date"]) < last_day:
+            return None
+
+        vocab_index = {name: {value: i for i, value in enumerate(self.meta[name])} for name in VOCABULARIES}
+        os.makedirs(self.store_dir, exist_ok=True)
+        handles = {name: open(self._path(name), 'ab') for name in ARRAYS}
+        nnz, id_bytes, rows = self.meta["nnz"], self.meta["id_bytes"], self.meta["rows"]
+
+        try:
+            if rows == 0:
+                # Reset any bytes left over from an interrupted write
+                for name, handle in handles.items():
+                    handle.truncate(0)
+                np.zeros(1, dtype=np.int64).tofile(handles["indptr"])
+                np.zeros(1, dtype=np.int64).tofile(handles["deck_id_offsets"])
+            else:
+                self._truncate_to_meta(handles)
+
+            for tournament in tournaments:
+                encoded = self._encode_tournament(tournament, vocab_index)
+                row_lengths = np.asarray(encoded.pop("indptr"), dtype=np.int64)
+                deck_ids = encoded.pop("deck_ids")
+                id_lengths = np.fromiter((len(d) for d in deck_ids), dtype=np.int64, count=len(deck_ids))
+                encoded.pop("deck_id_offsets")
+
+                (nnz + np.cumsum(row_lengths)).tofile(handles["indptr"])
+                (id_bytes + np.cumsum(id_lengths)).tofile(handles["deck_id_offsets"])
+                handles["deck_ids"].write(b"".join(deck_ids))
+                for name, values in encoded.items():
+                    np.asarray(values, dtype=ARRAYS[name]).tofile(handles[name])
+
+                nnz += int(row_lengths.sum())
+                id_bytes += int(id_lengths.sum())
+                rows += len(row_lengths)
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        added = rows - self.meta["rows"]
+        for name in VOCABULARIES:
+            vocabulary = [None] * len(vocab_index[name])
+            for value, i in vocab_index[name].items():
+                vocabulary[i] = value
+            self.meta[name] = vocabulary
+        self.meta.update({"rows": rows, "nnz": nnz, "id_bytes": id_bytes})
+        self._save_meta()
+        self.arrays = self._map_arrays()
+        return added
+
+    def _truncate_to_meta(self, handles):
+        """Drop bytes written after the last committed metadata (interrupted append)."""
+        for name, length in self._lengths().items():
+            handles[name].truncate(length * np.dtype(ARRAYS[name]).itemsize)
+
+    def _save_meta(self):
+        """Write the metadata last and atomically: it commits the appended rows."""
+        path = os.path.join(self.store_dir, "meta.json")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(f"{path}.tmp", path)
+
+    def clear(self):
+        """Remove every row from the store."""
+        self.meta = _empty_meta()
+        self.arrays = self._map_arrays()
+        if os.path.isdir(self.store_dir):
+            for name in ARRAYS:
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._save_meta()
+
+def update_store(store_dir, data_dir, batch_size=200):
+    """Bring the store up to date with a processed data directory.
+
+    New tournaments are appended when they are not older than the stored
+    history; otherwise the store is rebuilt from every tournament, in date order.
+    The store is also rebuilt when the file of a stored tournament was modified
+    or removed, as its rows cannot be replaced in place.
+    Tournaments are loaded in batches so the history never sits in memory at once.
+    The date and id of each file are remembered with its size and modification
+    time, so that only new or modified files are read to find the new tournaments.
+    Concurrent updates of the same store are serialized by a lock file.
+    """
+    _use_data_collection_modules()
+    from cache_manager import file_lock
+
+    with file_lock(os.path.join(store_dir, ".lock")):
+        # Open the store under the lock: another process may have committed rows since
+        return _update_store(CardCountStore(store_dir), store_dir, data_dir, batch_size)
+
+def _update_store(store, store_dir, data_dir, batch_size):
+    known = set(store.meta["tournaments"])
+    signatures = store.meta.get("files", {})
+
+    # First pass: only keep the date and path of each tournament
+    candidates = []
+    files = {}
+    stale = False
+    for path in list_tournament_files(data_dir):
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = signatures.get(name)
+        if not entry or entry["signature"] != [stat.st_mtime_ns, stat.st_size]:
+            stale = stale or bool(entry and entry["tournament_id"] in known)
+            tournament = load_tournament(path)
+            if not tournament or not tournament.get("date"):
+                continue
+            entry = {"signature": [stat.st_mtime_ns, stat.st_size], "date": tournament["date"],
+                     "tournament_id": tournament.get("tournament_id")}
+        files[name] = entry
+        candidates.append((entry["date"], entry["tournament_id"] in known, path))
+    candidates.sort()
+    stale = stale or any(name not in files and entry["tournament_id"] in known
+                         for name, entry in signatures.items())
+
+    new = [path for _, is_known, path in candidates if not is_known]
+    last_date = store.date_range()[1]
+    if stale:
+        logger.info("Stored tournaments were modified or removed. Rebuilding the card store.")
+        store.clear()
+        new = [path for _, _, path in candidates]
+    elif new and last_date and min(d for d, is_known, _ in candidates if not is_known) < last_date:
+        logger.info("Tournaments older than the stored history found. Rebuilding the card store.")
+        store.clear()
+        new = [path for _, _, path in candidates]
+
+    added = 0
+    for i in range(0, len(new), batch_size):
+        batch = [t for t in (load_tournament(path) for path in new[i:i + batch_size]) if t]
+        added += store.append(batch)
+
+    if store.meta.get("files") != files:
+        store.meta["files"] = files
+        os.makedirs(store_dir, exist_ok=True)
+        store._save_meta()
+    return store, added
+
+def main():
+    """Update the card store of a format from its processed data."""
+    configure_logging()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Update the memory-mapped deck-by-card store of a format")
+    parser.add_argument("--format", required=True, help="Format to update")
+    parser.add_argument("--store-dir", help="Store directory (default: data/card-store/<format>)")
+    args = parser.parse_args()
+
+    store_dir = args.store_dir or os.path.join(base_dir, "data", "card-store", args.format.lower())
+    store, added = update_store(store_dir, processed_data_dir(base_dir, args.format))
+    first, last = store.date_range()
+    logger.info(f"Added {added} decks. Store holds {store.rows} decks, "
+                f"{len(store.meta['cards'])} cards, from {first} to {last}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
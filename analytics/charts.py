@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chart rendering stage for the MTG Analytics pipeline.
+Renders the report images (metagame breakdown, matchup matrix, per-archetype
+matchups and rolling trends) from the report sections with matplotlib's
+non-interactive Agg backend, in a process pool since charts are independent.
+
+Rendered charts are cached under the hash of the data they draw, so unchanged
+charts are linked from the cache instead of being drawn again. In "auto"
+format both PNG and SVG are drawn and the smaller file is kept.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from analytics.report_engine import _canonical_json, _link_or_copy
+
+logger = logging.getLogger('analytics.charts')
+
+CHART_VERSION = 1
+IMAGE_FORMATS = ("auto", "png", "svg")
+DEFAULT_TOP_ARCHETYPES = 8
+
+def _slug(name):
+    """Return a file-name friendly version of an archetype name.
+
+    A short hash of the name keeps names that read alike (e.g. "U-W Control"
+    and "U/W Control") from sharing a chart file.
+    """
+    readable = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "unknown"
+    return f"{readable}_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+def chart_jobs(sections, trends=None, top_archetypes=DEFAULT_TOP_ARCHETYPES):
+    """Describe the charts of a report; each job carries only the data it draws."""
+    jobs = []
+    metagame = sections.get("metagame")
+    if metagame and metagame["archetypes"]:
+        jobs.append({"name": "metagame_breakdown", "kind": "metagame", "title": "Metagame Breakdown",
+                     "data": metagame["archetypes"][:20]})
+
+    matchups = sections.get("matchups")
+    if matchups and matchups["archetypes"]:
+        shown = matchups["archetypes"][:15]
+        jobs.append({"name": "matchup_matrix", "kind": "matchups", "title": "Matchup Matrix", "data": {
+            "archetypes": shown,
+            "win_rates": [row[:len(shown)] for row in matchups["win_rates"][:len(shown)]]
+        }})
+
+        for i, archetype in enumerate(matchups["archetypes"][:top_archetypes]):
+            opponents = [j for j, count in enumerate(matchups["matches"][i]) if count and j != i]
+            if not opponents:
+                continue
+            intervals = matchups.get("intervals")
+            jobs.append({"name": f"archetype_{_slug(archetype)}", "kind": "archetype",
+                         "title": f"{archetype} Matchups", "data": {
+                "archetype": archetype,
+                "opponents": [matchups["archetypes"][j] for j in opponents],
+                "win_rates": [matchups["win_rates"][i][j] for j in opponents],
+                "intervals": [intervals[i][j] for j in opponents] if intervals else None,
+                "matches": [matchups["matches"][i][j] for j in opponents]
+            }})
+
+    if trends and trends.get("dates"):
+        for window, series in trends["windows"].items():
+            jobs.append({"name": f"trends_{window}d", "kind": "trends",
+                         "title": f"Metagame Share ({window}-day window)", "data": {
+                "dates": trends["dates"],
+                "archetypes": trends["archetypes"],
+                "share": series["share"]
+            }})
+    return jobs
+
+def chart_digest(job):
+    """Hash the data and drawing version of a chart."""
+    content = _canonical_json({"version": CHART_VERSION, "kind": job["kind"], "title": job["title"], "data": job["data"]})
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+def _init_worker():
+    """Select the non-interactive backend in a rendering process."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _draw_metagame(figure, title, data):
+    """Draw archetype shares as horizontal bars."""
+    axes = figure.subplots()
+    names = [entry["name"] for entry in reversed(data)]
+    shares = [100 * entry["share"] for entry in reversed(data)]
+    axes.barh(names, shares, color="#3498db")
+    axes.set_xlabel("Share of decks (%)")
+    axes.set_title(title)
+
+def _draw_matchups(figure, title, data):
+    """Draw the matchup win rates as a heatmap."""
+    import numpy as np
+    axes = figure.subplots()
+    rates = np.array([[np.nan if rate is None else rate for rate in row] for row in data["win_rates"]], dtype=float)
+    image = axes.imshow(rates, cmap="RdYlGn", vmin=0, vmax=1)
+    axes.set_xticks(range(len(data["archetypes"])), data["archetypes"], rotation=60, ha="right", fontsize=8)
+    axes.set_yticks(range(len(data["archetypes"])), data["archetypes"], fontsize=8)
+    for (row, column), rate in np.ndenumerate(rates):
+        if not np.isnan(rate):
+            axes.text(column, row, f"{100 * rate:.0f}", ha="center", va="center", fontsize=7)
+    figure.colorbar(image, ax=axes, label="Win rate")
+    axes.set_title(title)
+
+def _draw_archetype(figure, title, data):
+    """Draw an archetype's win rate against each opponent with its intervals."""
+    axes = figure.subplots()
+    positions = range(len(data["opponents"]))
+    rates = [rate or 0.0 for rate in data["win_rates"]]
+    axes.barh(positions, rates, color="#3498db")
+    if data["intervals"]:
+        # The observed rate can fall outside a Beta-posterior interval on tiny samples
+        low = [max(0.0, rate - interval[0]) if interval else 0 for rate, interval in zip(rates, data["intervals"])]
+        high = [max(0.0, interval[1] - rate) if interval else 0 for rate, interval in zip(rates, data["intervals"])]
+        axes.errorbar(rates, positions, xerr=[low, high], fmt="none", ecolor="#2c3e50", capsize=3)
+    axes.set_yticks(positions, [f"{name} ({count})" for name, count in zip(data["opponents"], data["matches"])], fontsize=8)
+    axes.axvline(0.5, color="#7f8c8d", linestyle="--", linewidth=1)
+    axes.set_xlim(0, 1)
+    axes.set_xlabel("Win rate")
+    axes.set_title(title)
+
+def _draw_trends(figure, title, data):
+    """Draw rolling archetype shares over time."""
+    axes = figure.subplots()
+    positions = range(len(data["dates"]))
+    for archetype, shares in zip(data["archetypes"], data["share"]):
+        axes.plot(positions, [float("nan") if share is None else 100 * share for share in shares], label=archetype)
+    step = max(1, len(data["dates"]) // 8)
+    axes.set_xticks(positions[::step], data["dates"][::step], rotation=30, ha="right", fontsize=8)
+    axes.set_ylabel("Share of decks (%)")
+    axes.legend(fontsize=7, ncol=2)
+    axes.set_title(title)
+
+DRAWERS = {
+    "metagame": _draw_metagame,
+    "matchups": _draw_matchups,
+    "archetype": _draw_archetype,
+    "trends": _draw_trends
+}
+
+def render_chart(job, base_path, image_format="auto"):
+    """Draw a chart to base_path.png and/or base_path.svg and return the file kept."""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 7), layout="constrained")
+    DRAWERS[job["kind"]](figure, job["title"], job["data"])
+
+    formats = ("png", "svg") if image_format == "auto" else (image_format,)
+    paths = []
+    for extension in formats:
+        path = f"{base_path}.{extension}"
+        # Concurrent builds share the render cache: one temporary file per writer
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        figure.savefig(tmp_path, format=extension, dpi=110)
+        os.replace(tmp_path, path)
+        paths.append(path)
+
+    kept = min(paths, key=os.path.getsize)
+    for path in paths:
+        if path != kept:
+            os.remove(path)
+    return kept
+
+class ChartRenderer:
+    """Renders report charts in parallel, reusing cached charts whose data did not change."""
+
+    def __init__(self, cache_dir, image_format="auto", max_workers=None):
+        """Initialize the renderer with its cache directory."""
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+        self.cache_dir = os.path.join(cache_dir, "charts")
+        self.image_format = image_format
+        self.max_workers = max_workers
+        self.stats = {"rendered_charts": 0, "cached_charts": 0}
+
+    def _cached_path(self, base_path):
+        """Return the cached file of a chart, or None if it was never rendered."""
+        extensions = ("png", "svg") if self.image_format == "auto" else (self.image_format,)
+        for extension in extensions:
+            if os.path.exists(f"{base_path}.{extension}"):
+                return f"{base_path}.{extension}"
+        return None
+
+    def render(self, jobs, output_dir):
+        """Render the charts into output_dir, write charts.json and return its entries."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+        files = {}
+        pending = []
+        for job in jobs:
+            base_path = os.path.join(self.cache_dir, f"{job['name']}-{chart_digest(job)}")
+            cached_path = self._cached_path(base_path)
+            if cached_path:
+                files[job["name"]] = cached_path
+                self.stats["cached_charts"] += 1
+            else:
+                pending.append((job, base_path))
+
+        if len(pending) > 1 and self.max_workers != 1:
+            workers = min(len(pending), self.max_workers or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {
+                    job["name"]: pool.submit(render_chart, job, base_path, self.image_format)
+                    for job, base_path in pending
+                }
+                for name, future in futures.items():
+                    files[name] = future.result()
+        else:
+            if pending:
+                _init_worker()
+            for job, base_path in pending:
+                files[job["name"]] = render_chart(job, base_path, self.image_format)
+        self.stats["rendered_charts"] += len(pending)
+
+        charts = []
+        for job in jobs:
+            file_name = job["name"] + os.path.splitext(files[job["name"]])[1]
+            _link_or_copy(files[job["name"]], os.path.join(output_dir, file_name))
+            charts.append({"file": file_name, "title": job["title"], "kind": job["kind"]})
+
+        with open(os.path.join(output_dir, "charts.json"), 'w', encoding='utf-8') as f:
+            json.dump(charts, f, indent=2)
+
+        logger.info(
+            f"Charts rendered: {self.stats['rendered_charts']} drawn, {self.stats['cached_charts']} from cache."
+        )
+        return charts
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Win-rate confidence intervals for the MTG Analytics pipeline.
+Computes Beta-posterior and bootstrap intervals for archetype win rates and
+pairwise matchups from the unified match results, vectorized over every
+archetype pair at once.
+
+The [wins, losses, draws] counts of the aggregates are sufficient statistics
+of the match rows: resampling the decided matches of a pair with replacement
+is a binomial draw on its counts, so the bootstrap draws every resample of
+every pair in batched NumPy calls instead of looping over match rows.
+"""
+
+import numpy as np
+
+from analytics import aggregates
+
+DEFAULT_LEVEL = 0.95
+DEFAULT_RESAMPLES = 2000
+METHODS = ("beta", "bootstrap")
+
+def record_arrays(aggregate, archetypes):
+    """Return (wins, losses) matrices of the row archetype against the column archetype."""
+    column = {name: i for i, name in enumerate(archetypes)}
+    wins = np.zeros((len(archetypes), len(archetypes)), dtype=np.int64)
+    losses = np.zeros_like(wins)
+    for archetype, opponents in aggregate["matchups"].items():
+        if archetype not in column:
+            continue
+        for opponent, (won, lost, _) in opponents.items():
+            if opponent in column:
+                wins[column[archetype], column[opponent]] = won
+                losses[column[archetype], column[opponent]] = lost
+    return wins, losses
+
+def beta_intervals(wins, losses, level=DEFAULT_LEVEL, prior=(1.0, 1.0), samples=20000, seed=1):
+    """Return (low, high) equal-tailed Beta-posterior intervals for arrays of win/loss counts.
+
+    Uses the exact Beta quantiles when scipy is installed, and Monte Carlo
+    quantiles of posterior draws otherwise.
+    """
+    wins = np.asarray(wins, dtype=np.float64)
+    losses = np.asarray(losses, dtype=np.float64)
+    alpha = wins + prior[0]
+    beta = losses + prior[1]
+    tail = (1 - level) / 2
+
+    try:
+        from scipy.special import betaincinv
+    except ImportError:
+        betaincinv = None
+
+    if betaincinv is not None:
+        return betaincinv(alpha, beta, tail), betaincinv(alpha, beta, 1 - tail)
+
+    rng = np.random.default_rng(seed)
+    flat_alpha, flat_beta = alpha.ravel(), beta.ravel()
+    low = np.empty(flat_alpha.shape)
+    high = np.empty(flat_alpha.shape)
+    batch = max(1, 4_000_000 // samples)
+    for first in range(0, len(flat_alpha), batch):
+        last = first + batch
+        draws = rng.beta(flat_alpha[first:last], flat_beta[first:last], size=(samples, len(flat_alpha[first:last])))
+        low[first:last], high[first:last] = np.quantile(draws, [tail, 1 - tail], axis=0)
+    return low.reshape(alpha.shape), high.reshape(alpha.shape)
+
+def bootstrap_intervals(wins, losses, level=DEFAULT_LEVEL, resamples=DEFAULT_RESAMPLES, seed=1, batch_size=4_000_000):
+    """Return (low, high) percentile bootstrap intervals for arrays of win/loss counts.
+
+    Counts with no decided match get NaN bounds.
+    """
+    wins = np.asarray(wins, dtype=np.int64)
+    decided = wins + np.asarray(losses, dtype=np.int64)
+    flat_wins, flat_decided = wins.ravel(), decided.ravel()
+    tail = (1 - level) / 2
+
+    rng = np.random.default_rng(seed)
+    low = np.full(flat_wins.shape, np.nan)
+    high = np.full(flat_wins.shape, np.nan)
+    played = np.flatnonzero(flat_decided)
+    batch = max(1, batch_size // resamples)
+
+    for first in range(0, len(played), batch):
+        cells = played[first:first + batch]
+        n = flat_decided[cells]
+        resampled = rng.binomial(n, flat_wins[cells] / n, size=(resamples, len(cells))) / n
+        low[cells], high[cells] = np.quantile(resampled, [tail, 1 - tail], axis=0)
+    return low.reshape(wins.shape), high.reshape(wins.shape)
+
+def _interval_lists(low, high, decided):
+    """Convert interval bounds to rounded [low, high] pairs, None where nothing was decided."""
+    return [
+        [round(float(l), 4), round(float(h), 4)] if n else None
+        for l, h, n in zip(low, high, decided)
+    ]
+
+def matchup_intervals(aggregate, archetypes, method="beta", level=DEFAULT_LEVEL, resamples=DEFAULT_RESAMPLES, seed=1):
+    """Return confidence intervals of the matchup cells and of each archetype's overall win rate.
+
+    Mirror matches are recorded from both decks, so their cells hold every
+    match twice at an even record: their interval is undefined (None), and
+    overall win rates leave them out.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interval method: {method}")
+
+    wins, losses = record_arrays(aggregate, archetypes)
+    mirror = np.eye(len(archetypes), dtype=bool)
+    wins = np.where(mirror, 0, wins)
+    losses = np.where(mirror, 0, losses)
+    overall_wins = wins.sum(axis=1)
+    overall_losses = losses.sum(axis=1)
+
+    # Compute the matchup cells and the overall win rates in a single batch
+    all_wins = np.concatenate((wins.ravel(), overall_wins))
+    all_losses = np.concatenate((losses.ravel(), overall_losses))
+    if method == "beta":
+        low, high = beta_intervals(all_wins, all_losses, level, seed=seed)
+    else:
+        low, high = bootstrap_intervals(all_wins, all_losses, level, resamples, seed)
+
+    decided = all_wins + all_losses
+    cells = len(archetypes) * len(archetypes)
+    cell_intervals = _interval_lists(low[:cells], high[:cells], decided[:cells])
+
+    overall = []
+    for i, name in enumerate(archetypes):
+        n = int(decided[cells + i])
+        overall.append({
+            "archetype": name,
+            "win_rate": round(int(overall_wins[i]) / n, 4) if n else None,
+            "matches": n,
+            "interval": _interval_lists(low[cells + i:cells + i + 1], high[cells + i:cells + i + 1], [n])[0]
+        })
+
+    return {
+        "intervals": [cell_intervals[i * len(archetypes):(i + 1) * len(archetypes)] for i in range(len(archetypes))],
+        "overall": overall,
+        "interval_method": method,
+        "interval_level": level
+    }
+
+def matchup_matrix_with_intervals(aggregate, archetypes=None, method="beta", level=DEFAULT_LEVEL, **options):
+    """Return the matchup matrix of an aggregate with confidence intervals for every cell."""
+    payload = aggregates.matchup_matrix(aggregate, archetypes)
+    payload.update(matchup_intervals(aggregate, payload["archetypes"], method, level, **options))
+    return payload
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Access to processed tournament data for the MTG Analytics pipeline.
+Processed tournaments are stored in unified format under data/processed/<format>/,
+as plain JSON or as zstd-compressed JSON (.json.zst) written by the cache manager.
+"""
+
+import os
+import sys
+import json
+import logging
+
+logger = logging.getLogger('analytics.dataset')
+
+TOURNAMENT_EXTENSIONS = (".json", ".json.zst")
+
+def processed_data_dir(base_dir, format_name=None, config=None):
+    """Return the processed data directory, optionally for a single format."""
+    storage = (config or {}).get("data_storage", {})
+    data_dir = os.path.join(base_dir, storage.get("processed_data", os.path.join("data", "processed")))
+    if format_name:
+        data_dir = os.path.join(data_dir, format_name.lower())
+    return data_dir
+
+def list_tournament_files(data_dir):
+    """List tournament files in a processed data directory, sorted by name."""
+    if not os.path.isdir(data_dir):
+        return []
+    return sorted(
+        os.path.join(data_dir, name)
+        for name in os.listdir(data_dir)
+        if name.endswith(TOURNAMENT_EXTENSIONS) and not name.startswith(".")
+    )
+
+def _use_data_collection_modules():
+    """Make the modules of the data-collection directory importable."""
+    data_collection_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data-collection")
+    if data_collection_dir not in sys.path:
+        sys.path.insert(0, data_collection_dir)
+
+def _read_compressed(path):
+    """Decode a compressed tournament file with the reader of the data-collection cache manager."""
+    _use_data_collection_modules()
+    from cache_manager import read_json
+    return read_json(path)
+
+def configure_logging(stream=None):
+    """Configure the logging of an analytics entry point with the pipeline's shared setup."""
+    _use_data_collection_modules()
+    from log_setup import configure_logging as configure
+    configure(stream)
+
+def load_tournament(path):
+    """Load a single tournament file, returning None if it cannot be read."""
+    try:
+        if path.endswith(".zst"):
+            return _read_compressed(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError, ImportError) as e:
+        logger.warning(f"Skipping unreadable tournament file {path}: {e}")
+        return None
+
+def in_date_range(date, start_date=None, end_date=None):
+    """Check an ISO date string against an inclusive date range."""
+    if not date:
+        return False
+    if start_date and date < start_date:
+        return False
+    if end_date and date > end_date:
+        return False
+    return True
+
+def load_tournaments(data_dir, start_date=None, end_date=None):
+    """Load every tournament of a directory whose date falls in the range."""
+    tournaments = []
+    for path in list_tournament_files(data_dir):
+        tournament = load_tournament(path)
+        if tournament and in_date_range(tournament.get("date"), start_date, end_date):
+            tournaments.append(tournament)
+    return tournaments
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent player index for the MTG Analytics pipeline.
+Maps normalized player names to the decks they played in a format, with
+their source, archetype, rank and match record, so that the history of a
+player or the best pilots of a format are read without scanning the
+tournament files.
+
+Results are kept in shards selected by a hash of the player key: a player
+query reads a single shard. meta.json holds the per-player totals used by
+top-pilot queries and the stat signature of every ingested tournament file;
+updates only read the files that are new, changed or removed since the last
+update, rewrite the shards they touch, then commit by writing meta.json.
+Updates hold the lock of the index directory; readers such as the query
+service never update the index and reload meta.json when it was committed again.
+
+Example:
+  python -m analytics.player_index --format modern --player "Some Player"
+  python -m analytics.player_index --format modern --top 20
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import unicodedata
+
+from analytics.dataset import (
+    processed_data_dir, list_tournament_files, load_tournament, configure_logging, _use_data_collection_modules
+)
+
+logger = logging.getLogger('analytics.player_index')
+
+INDEX_VERSION = 1
+SHARD_COUNT = 256
+
+WHITESPACE = re.compile(r"\s+")
+
+def player_key(name):
+    """Return the normalized key of a player name: without accents, case folded, whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return WHITESPACE.sub(" ", stripped).strip().casefold()
+
+def _shard_name(key):
+    return f"{int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) % SHARD_COUNT:02x}.json"
+
+def _write_json(path, payload):
+    """Write a JSON file atomically, through a temporary file unique to the writer."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def deck_results(tournament):
+    """Yield (player key, result) for every deck of a tournament with a player name."""
+    for deck in tournament.get("decks", []):
+        key = player_key(deck.get("player_name"))
+        if not key:
+            continue
+        record = [0, 0, 0]
+        for match in deck.get("matches", []):
+            result = match.get("result")
+            record[0 if result == "win" else 1 if result == "loss" else 2] += 1
+        yield key, {
+            "deck_id": deck.get("deck_id"),
+            "player_name": deck.get("player_name"),
+            "tournament_id": tournament.get("tournament_id"),
+            "date": tournament.get("date"),
+            "source": tournament.get("source"),
+            "archetype": deck.get("archetype"),
+            "rank": deck.get("rank"),
+            "wins": record[0],
+            "losses": record[1],
+            "draws": record[2]
+        }
+
+def _totals(results):
+    """Return the summary of a player's results."""
+    latest = max(results, key=lambda result: result.get("date") or "")
+    totals = {"name": latest["player_name"], "decks": len(results), "wins": 0, "losses": 0, "draws": 0,
+              "last_date": latest.get("date")}
+    for result in results:
+        totals["wins"] += result["wins"]
+        totals["losses"] += result["losses"]
+        totals["draws"] += result["draws"]
+    return totals
+
+class PlayerIndex:
+    """Player index of one format, stored in index_dir."""
+
+    def __init__(self, index_dir):
+        """Open the index in index_dir (empty if it does not exist yet)."""
+        self.index_dir = index_dir
+        self._meta_signature = None
+        self.meta = self._load_meta()
+
+    def _meta_stat(self):
+        try:
+            stat = os.stat(os.path.join(self.index_dir, "meta.json"))
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _load_meta(self):
+        self._meta_signature = self._meta_stat()
+        try:
+            with open(os.path.join(self.index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("version") == INDEX_VERSION:
+                return meta
+            logger.warning(f"Ignoring player index with unsupported version in {self.index_dir}")
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable player index metadata in {self.index_dir}: {e}")
+        return {"version": INDEX_VERSION, "files": {}, "players": {}}
+
+    def refresh(self):
+        """Reload meta.json if another process committed an update since it was read."""
+        if self._meta_stat() != self._meta_signature:
+            self.meta = self._load_meta()
+
+    def _shard_path(self, shard):
+        return os.path.join(self.index_dir, "shards", shard)
+
+    def _load_shard(self, shard):
+        """Return {player key: {deck id: result}} of a shard."""
+        try:
+            with open(self._shard_path(shard), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update(self, data_dir):
+        """Ingest the tournaments added, changed or removed in a processed data directory since the last update.
+
+        Returns the number of tournament files ingested or removed.
+        """
+        _use_data_collection_modules()
+        from cache_manager import file_lock
+
+        with file_lock(os.path.join(self.index_dir, ".lock")):
+            # Another process may have committed an update since the index was opened
+            self.meta = self._load_meta()
+            return self._update(data_dir)
+
+    def _update(self, data_dir):
+        files = {}
+        for path in list_tournament_files(data_dir):
+            stat = os.stat(path)
+            files[os.path.basename(path)] = [stat.st_mtime_ns, stat.st_size]
+
+        known = self.meta["files"]
+        changed = [name for name, signature in files.items() if known.get(name, {}).get("signature") != signature]
+        removed = [name for name in known if name not in files]
+        if not changed and not removed:
+            return 0
+
+        # Results of changed and removed files are dropped, then changed files are read again
+        stale = {}
+        for name in changed + removed:
+            entry = known.pop(name, None)
+            if entry:
+                for key in entry["players"]:
+                    stale.setdefault(key, set()).add(entry["tournament_id"])
+
+        added = {}
+        for name in changed:
+            tournament = load_tournament(os.path.join(data_dir, name))
+            if not tournament:
+                continue
+            players = set()
+            for key, result in deck_results(tournament):
+                added.setdefault(key, []).append(result)
+                players.add(key)
+            known[name] = {"signature": files[name], "tournament_id": tournament.get("tournament_id"),
+                           "players": sorted(players)}
+
+        by_shard = {}
+        for key in set(stale) | set(added):
+            by_shard.setdefault(_shard_name(key), []).append(key)
+
+        os.makedirs(os.path.join(self.index_dir, "shards"), exist_ok=True)
+        for shard, keys in by_shard.items():
+            entries = self._load_shard(shard)
+            for key in keys:
+                results = entries.get(key, {})
+                tournaments = stale.get(key, ())
+                results = {deck_id: result for deck_id, result in results.items()
+                           if result["tournament_id"] not in tournaments}
+                for result in added.get(key, []):
+                    results[result["deck_id"] or f"{result['tournament_id']}-{key}"] = result
+                if results:
+                    entries[key] = results
+                    self.meta["players"][key] = _totals(list(results.values()))
+                else:
+                    entries.pop(key, None)
+                    self.meta["players"].pop(key, None)
+            _write_json(self._shard_path(shard), entries)
+
+        # meta.json is written last: it commits the update
+        _write_json(os.path.join(self.index_dir, "meta.json"), self.meta)
+        self._meta_signature = self._meta_stat()
+        return len(changed) + len(removed)
+
+    def player(self, name, start_date=None, end_date=None):
+        """Return the results of a player, most recent first, with their totals; None for unknown players."""
+        key = player_key(name)
+        results = self._load_shard(_shard_name(key)).get(key)
+        if not results:
+            return None
+        results = sorted(
+            (result for result in results.values()
+             if (not start_date or (result["date"] or "") >= start_date)
+             and (not end_date or (result["date"] or "") <= end_date)),
+            key=lambda result: (result["date"] or "", result["deck_id"] or ""),
+            reverse=True
+        )
+        totals = _totals(results) if results else None
+        archetypes = {}
+        for result in results:
+            archetype = result["archetype"] or "Unknown"
+            archetypes[archetype] = archetypes.get(archetype, 0) + 1
+        return {"player": key, "totals": totals, "archetypes": archetypes, "results": results}
+
+    def top_pilots(self, limit=20, min_matches=10):
+        """Return the players with the best match win rate (draws excluded) over at least min_matches matches."""
+        self.refresh()
+        pilots = []
+        for key, totals in self.meta["players"].items():
+            decided = totals["wins"] + totals["losses"]
+            if totals["wins"] + totals["losses"] + totals["draws"] < min_matches or not decided:
+                continue
+            pilots.append(dict(totals, player=key, win_rate=round(totals["wins"] / decided, 4)))
+        pilots.sort(key=lambda pilot: (-pilot["win_rate"], -pilot["wins"], pilot["player"]))
+        return pilots[:limit]
+
+def update_index(index_dir, data_dir):
+    """Bring the player index of a format up to date with its processed data directory."""
+    index = PlayerIndex(index_dir)
+    updated = index.update(data_dir)
+    return index, updated
+
+def main():
+    """Update the player index of a format and answer a player or top-pilot query."""
+    configure_logging()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Update and query the player index of a format")
+    parser.add_argument("--format", required=True, help="Format to index")
+    parser.add_argument("--index-dir", help="Index directory (default: data/player-index/<format>)")
+    parser.add_argument("--player", help="Print the results of a player")
+    parser.add_argument("--start", help="First date of the player's results (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date of the player's results (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, help="Print the best pilots of the format")
+    parser.add_argument("--min-matches", type=int, default=10, help="Minimum matches of a top pilot")
+    args = parser.parse_args()
+
+    index_dir = args.index_dir or os.path.join(base_dir, "data", "player-index", args.format.lower())
+    index, updated = update_index(index_dir, processed_data_dir(base_dir, args.format))
+    logger.info(f"Ingested {updated} tournament files. Index holds {len(index.meta['players'])} players.")
+
+    if args.player:
+        result = index.player(args.player, args.start, args.end)
+        if result is None:
+            logger.error(f"Unknown player: {args.player}")
+            return 1
+        print(json.dumps(result, indent=2))
+    if args.top:
+        print(json.dumps(index.top_pilots(args.top, args.min_matches), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Local HTTP query service for the MTG Analytics pipeline.
+Loads processed tournament aggregates once and answers metagame, matchup and
+card queries over any format and date range without running the pipeline.
+
+Examples:
+  python -m analytics.query_service --port 8765
+  curl "http://127.0.0.1:8765/metagame?format=modern&days=14"
+  curl "http://127.0.0.1:8765/matchups?format=standard&start=2025-07-01&end=2025-07-22"
+  curl "http://127.0.0.1:8765/player?format=modern&name=Some%20Player&days=90"
+  curl "http://127.0.0.1:8765/pilots?format=modern&limit=20&min_matches=10"
+  curl -X POST "http://127.0.0.1:8765/reload"
+"""
+
+import os
+import sys
+import json
+import bisect
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from analytics import aggregates
+from analytics.confidence import matchup_matrix_with_intervals
+from analytics.dataset import processed_data_dir, configure_logging
+from analytics.player_index import PlayerIndex
+from analytics.report_engine import ReportEngine
+
+logger = logging.getLogger('analytics.query_service')
+
+QUERIES = {
+    "metagame": aggregates.metagame_shares,
+    "matchups": matchup_matrix_with_intervals,
+    "cards": aggregates.card_stats
+}
+
+class QueryError(Exception):
+    """Invalid query parameters."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class MetagameStore:
+    """In-memory per-format aggregates, sorted by tournament date."""
+
+    def __init__(self, base_dir, config=None, cache_size=1024):
+        """Initialize the store for the project at base_dir."""
+        self.base_dir = base_dir
+        self.config = config or {}
+        self.cache_size = cache_size
+        self.formats = {}
+        self.player_indexes = {}
+        self._lock = threading.Lock()
+        self.query = self._cached_query(self.formats)
+
+    def _cached_query(self, formats):
+        """Return the LRU-cached query function of a set of loaded formats."""
+        return lru_cache(maxsize=self.cache_size)(partial(self._query, formats))
+
+    def load(self):
+        """Load (or reload) every format from the processed data directory."""
+        data_dir = processed_data_dir(self.base_dir, config=self.config)
+        analyses_dir = os.path.join(self.base_dir, self.config.get("data_storage", {}).get("analyses", "analyses"))
+        formats = {}
+        player_indexes = {}
+
+        if os.path.isdir(data_dir):
+            for format_name in sorted(os.listdir(data_dir)):
+                format_dir = os.path.join(data_dir, format_name)
+                if not os.path.isdir(format_dir):
+                    continue
+                engine = ReportEngine(format_dir, os.path.join(analyses_dir, ".report-cache", format_name))
+                tournaments = sorted(
+                    (aggregate for aggregate in engine.tournament_aggregates() if aggregate.get("date")),
+                    key=lambda aggregate: aggregate["date"]
+                )
+                formats[format_name] = {
+                    "dates": [aggregate["date"] for aggregate in tournaments],
+                    "aggregates": tournaments
+                }
+                logger.info(f"Loaded {len(tournaments)} {format_name} tournaments.")
+                # Read only: the index is updated by the pipeline runs, and re-read once they commit
+                player_indexes[format_name] = PlayerIndex(
+                    os.path.join(self.base_dir, "data", "player-index", format_name)
+                )
+
+        # The data and its query cache are swapped together: a query still running on the
+        # previous data fills the previous cache, which is discarded with it
+        query = self._cached_query(formats)
+        with self._lock:
+            self.formats = formats
+            self.player_indexes = player_indexes
+            self.query = query
+
+    def _select(self, formats, format_name, start_date, end_date):
+        """Return the aggregates of a format within an inclusive date range."""
+        data = formats.get(format_name)
+        if data is None:
+            raise QueryError(f"Unknown format: {format_name}", status=404)
+        low = bisect.bisect_left(data["dates"], start_date) if start_date else 0
+        high = bisect.bisect_right(data["dates"], end_date) if end_date else len(data["dates"])
+        return data["aggregates"][low:high]
+
+    def _player_index(self, format_name):
+        """Return the player index of a format."""
+        index = self.player_indexes.get(format_name)
+        if index is None:
+            raise QueryError(f"Unknown format: {format_name}", status=404)
+        return index
+
+    def player(self, format_name, name, start_date, end_date):
+        """Return the results of a player as serialized JSON."""
+        result = self._player_index(format_name).player(name, start_date, end_date)
+        if result is None:
+            raise QueryError(f"Unknown player: {name}", status=404)
+        result.update({"format": format_name, "start_date": start_date, "end_date": end_date})
+        return json.dumps(result, separators=(",", ":")).encode("utf-8")
+
+    def pilots(self, format_name, limit, min_matches):
+        """Return the best pilots of a format as serialized JSON."""
+        pilots = self._player_index(format_name).top_pilots(limit, min_matches)
+        return json.dumps({"format": format_name, "pilots": pilots}, separators=(",", ":")).encode("utf-8")
+
+    def _query(self, formats, kind, format_name, start_date, end_date):
+        """Compute a query result on loaded formats as serialized JSON (cached by the LRU wrapper)."""
+        merged = aggregates.merge_aggregates(self._select(formats, format_name, start_date, end_date))
+        payload = QUERIES[kind](merged)
+        payload.update({"format": format_name, "start_date": start_date, "end_date": end_date})
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+def resolve_date_range(params):
+    """Resolve start/end/days query parameters to an ISO date range."""
+    end_date = params.get("end")
+    start_date = params.get("start")
+    days = params.get("days")
+
+    try:
+        if end_date:
+            datetime.strptime(end_date, "%Y-%m-%d")
+        if start_date:
+            datetime.strptime(start_date, "%Y-%m-%d")
+        if days and not start_date:
+            end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
+            end_date = end.strftime("%Y-%m-%d")
+            start_date = (end - timedelta(days=int(days) - 1)).strftime("%Y-%m-%d")
+    except ValueError:
+        raise QueryError("Dates must use YYYY-MM-DD and days must be an integer.")
+
+    return start_date, end_date
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """HTTP handler answering queries from the server's MetagameStore."""
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        kind = url.path.strip("/")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        store = self.server.store
+
+        try:
+            if kind == "formats":
+                body = json.dumps({"formats": sorted(store.formats)}).encode("utf-8")
+            elif kind == "reload":
+                raise QueryError("Use POST /reload to reload the data.", status=405)
+            elif kind in QUERIES:
+                if not params.get("format"):
+                    raise QueryError("Missing 'format' parameter.")
+                start_date, end_date = resolve_date_range(params)
+                body = store.query(kind, params["format"].lower(), start_date, end_date)
+            elif kind in ("player", "pilots"):
+                if not params.get("format"):
+                    raise QueryError("Missing 'format' parameter.")
+                if kind == "player":
+                    if not params.get("name"):
+                        raise QueryError("Missing 'name' parameter.")
+                    start_date, end_date = resolve_date_range(params)
+                    body = store.player(params["format"].lower(), params["name"], start_date, end_date)
+                else:
+                    try:
+                        limit, min_matches = int(params.get("limit", 20)), int(params.get("min_matches", 10))
+                    except ValueError:
+                        raise QueryError("limit and min_matches must be integers.")
+                    body = store.pilots(params["format"].lower(), limit, min_matches)
+            else:
+                raise QueryError(f"Unknown endpoint: /{kind}", status=404)
+        except QueryError as e:
+            self._send(e.status, json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+
+        self._send(200, body)
+
+    def do_POST(self):
+        kind = urlparse(self.path).path.strip("/")
+        store = self.server.store
+        if kind != "reload":
+            self._send(404, json.dumps({"error": f"Unknown endpoint: POST /{kind}"}).encode("utf-8"))
+            return
+        try:
+            store.load()
+        except Exception as e:
+            # load() swaps the data in only once every format is read: the previous data keeps serving
+            logger.exception(f"Reload failed: {e}")
+            self._send(500, json.dumps({"error": f"Reload failed: {e}"}).encode("utf-8"))
+            return
+        self._send(200, json.dumps({"status": "reloaded", "formats": sorted(store.formats)}).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        # Formatted only when debug records are written
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+def create_server(store, host="127.0.0.1", port=8765):
+    """Create a threaded HTTP server bound to a loaded store."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.store = store
+    return server
+
+def main():
+    """Load the processed data and serve queries until interrupted."""
+    configure_logging()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="MTG Analytics local query service")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Number of query results kept in the LRU cache")
+    args = parser.parse_args()
+
+    config = {}
+    try:
+        with open(os.path.join(base_dir, "config", "sources.json"), 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Using default storage paths: {e}")
+
+    store = MetagameStore(base_dir, config, args.cache_size)
+    store.load()
+
+    server = create_server(store, args.host, args.port)
+    logger.info(f"Query service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Query service stopped.")
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental report engine for the MTG Analytics pipeline.
+Emits compact JSON data files (metagame shares, matchup matrix, card stats)
+and a single HTML page that renders them client-side.
+
+Per-tournament aggregates are cached by file size and modification time, and
+section files are content-addressed, so a daily report only parses the new
+tournaments and only writes the sections whose aggregates changed.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from html import escape
+
+from analytics import aggregates
+from analytics.confidence import matchup_matrix_with_intervals
+from analytics.dataset import list_tournament_files, load_tournament, in_date_range, _use_data_collection_modules
+
+logger = logging.getLogger('analytics.report_engine')
+
+CACHE_VERSION = 1
+
+IMAGE_FILES = (
+    ("matchup_matrix.png", "Matchup Matrix"),
+    ("metagame_breakdown.png", "Metagame Breakdown")
+)
+
+PAGE_FILES = (
+    ("trends.html", "Rolling Metagame Trends"),
+)
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>MTG Analytics Report - {title}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 40px; background-color: #f5f5f5; }}
+.container {{ max-width: 1200px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+h1 {{ color: #2c3e50; text-align: center; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
+.info-box {{ background-color: #ecf0f1; padding: 20px; border-radius: 5px; margin: 20px 0; }}
+.visualization {{ margin: 30px 0; overflow-x: auto; }}
+.visualization img {{ max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 5px; }}
+.bar-row {{ display: flex; align-items: center; margin: 2px 0; font-size: 0.9em; }}
+.bar-label {{ width: 220px; text-align: right; padding-right: 8px; }}
+.bar {{ background-color: #3498db; height: 16px; }}
+.bar-value {{ padding-left: 6px; color: #555; }}
+table {{ border-collapse: collapse; font-size: 0.8em; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 6px; text-align: center; }}
+th {{ background-color: #ecf0f1; }}
+.footer {{ text-align: center; margin-top: 40px; color: #7f8c8d; font-size: 0.9em; }}
+</style>
+</head>
+<body>
+<div class="container">
+<h1>MTG Analytics Report - {title} Format</h1>
+<div class="info-box">
+<h2>Analysis Details</h2>
+<p><strong>Format:</strong> {title}</p>
+<p><strong>Analysis Period:</strong> {start_date} to {end_date}</p>
+<p><strong>Generated:</strong> {generated}</p>
+<p><strong>Analysis ID:</strong> {analysis_id}</p>
+</div>
+<div class="visualization"><h2>Metagame Breakdown</h2><div id="metagame"></div></div>
+<div class="visualization"><h2>Matchup Matrix</h2><p>Win rate of the row archetype against the column archetype. Hover a cell for its confidence interval.</p><div id="matchups"></div></div>
+<div class="visualization"><h2>Most Played Cards</h2><div id="cards"></div></div>
+<div class="visualization" id="card-performance-box" style="display:none"><h2>Card Performance by Archetype</h2><p>Play rate and average copies of each card in its archetype, and the win rate of the archetype's decks with and without it.</p><div id="card_performance"></div></div>
+{images}
+{pages}
+<div class="footer"><p>Generated by MTG Analytics Pipeline</p><p>Analysis timestamp: {analysis_id}</p></div>
+</div>
+{data}
+<script>
+function section(name) {{ return JSON.parse(document.getElementById("data-" + name).textContent); }}
+function escapeHtml(text) {{
+  return String(text).replace(/[&<>"']/g, function (c) {{
+    return {{"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}}[c];
+  }});
+}}
+function pct(value) {{ return value === null ? "" : (100 * value).toFixed(1) + "%"; }}
+function cellColor(value) {{
+  if (value === null) return "#fff";
+  var red = Math.round(255 * Math.min(1, 2 * (1 - value))), green = Math.round(255 * Math.min(1, 2 * value));
+  return "rgba(" + red + "," + green + ",80,0.45)";
+}}
+function renderMetagame(data) {{
+  var html = "<p>" + data.total_decks + " decks from " + data.tournaments + " tournaments</p>";
+  var top = data.archetypes.length ? data.archetypes[0].share : 1;
+  data.archetypes.forEach(function (a) {{
+    html += '<div class="bar-row"><span class="bar-label">' + escapeHtml(a.name) + '</span><span class="bar" style="width:' +
+      (400 * a.share / top) + 'px"></span><span class="bar-value">' + pct(a.share) + " (" + a.decks + ")</span></div>";
+  }});
+  document.getElementById("metagame").innerHTML = html;
+}}
+function intervalText(matches, interval, level) {{
+  var text = matches + " matches";
+  if (interval) text += ", " + Math.round(100 * level) + "% interval " + pct(interval[0]) + " - " + pct(interval[1]);
+  return text;
+}}
+function renderMatchups(data) {{
+  var html = "<table><tr><th></th><th>Overall</th>";
+  data.archetypes.forEach(function (a) {{ html += "<th>" + escapeHtml(a) + "</th>"; }});
+  html += "</tr>";
+  data.archetypes.forEach(function (a, i) {{
+    var overall = data.overall[i];
+    html += "<tr><th>" + escapeHtml(a) + '</th><td title="' + intervalText(overall.matches, overall.interval, data.interval_level) +
+      '" style="background:' + cellColor(overall.win_rate) + '"><strong>' + pct(overall.win_rate) + "</strong></td>";
+    data.win_rates[i].forEach(function (rate, j) {{
+      var title = intervalText(data.matches[i][j], data.intervals[i][j], data.interval_level);
+      html += '<td title="' + title + '" style="background:' + cellColor(rate) + '">' + pct(rate) + "</td>";
+    }});
+    html += "</tr>";
+  }});
+  document.getElementById("matchups").innerHTML = html + "</table>";
+}}
+function renderCards(data) {{
+  var html = "<table><tr><th>Card</th><th>Main %</th><th>Avg main</th><th>Side %</th><th>Avg side</th></tr>";
+  data.cards.forEach(function (c) {{
+    html += "<tr><td>" + escapeHtml(c.card) + "</td><td>" + pct(c.main_rate) + "</td><td>" + c.main_copies +
+      "</td><td>" + pct(c.side_rate) + "</td><td>" + c.side_copies + "</td></tr>";
+  }});
+  document.getElementById("cards").innerHTML = html + "</table>";
+}}
+function signedPct(value) {{ return value === null ? "" : (value > 0 ? "+" : "") + pct(value); }}
+function renderCardPerformance(data) {{
+  var html = "";
+  data.archetypes.forEach(function (a) {{
+    html += "<h3>" + escapeHtml(a.archetype) + " (" + a.decks + " decks, " + pct(a.win_rate) + ")</h3>" +
+      "<table><tr><th>Card</th><th>Play %</th><th>Avg copies</th><th>Win % with</th><th>Win % without</th><th>Delta</th></tr>";
+    a.cards.forEach(function (c) {{
+      html += "<tr><td>" + escapeHtml(c.card) + "</td><td>" + pct(c.play_rate) + "</td><td>" + c.average_copies + '</td><td title="' +
+        c.matches_with + ' matches">' + pct(c.win_rate_with) + "</td><td>" + pct(c.win_rate_without) +
+        '</td><td style="background:' + cellColor(c.win_rate_delta === null ? null : Math.max(0, Math.min(1, 0.5 + 5 * c.win_rate_delta))) + '">' +
+        signedPct(c.win_rate_delta) + "</td></tr>";
+    }});
+    html += "</table>";
+  }});
+  document.getElementById("card_performance").innerHTML = html;
+  document.getElementById("card-performance-box").style.display = "";
+}}
+renderMetagame(section("metagame"));
+renderMatchups(section("matchups"));
+renderCards(section("cards"));
+if (document.getElementById("data-card_performance")) renderCardPerformance(section("card_performance"));
+</script>
+</body>
+</html>
+"""
+
+def _canonical_json(payload):
+    """Serialize a payload compactly and deterministically."""
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+def _write_text(path, content):
+    """Write text atomically through a per-writer temporary file, as concurrent builds share the cache."""
+    _use_data_collection_modules()
+    from cache_manager import atomic_write
+    atomic_write(path, content.encode("utf-8"), fsync=False)
+
+def _link_or_copy(src, dst):
+    """Hard-link src to dst, copying when linking is not possible."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def _image_files(output_dir):
+    """Return the (file, title) pairs of the charts rendered for a report."""
+    try:
+        with open(os.path.join(output_dir, "charts.json"), 'r', encoding='utf-8') as f:
+            return [(chart["file"], chart["title"]) for chart in json.load(f)]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        return IMAGE_FILES
+
+class ReportEngine:
+    """Builds analysis reports from cached per-tournament aggregates."""
+
+    def __init__(self, data_dir, cache_dir):
+        """Initialize the engine for a processed data directory."""
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.sections_dir = os.path.join(cache_dir, "sections")
+        self.aggregates_path = os.path.join(cache_dir, "aggregates.json")
+        self.stats = {"parsed_files": 0, "cached_files": 0, "written_sections": 0, "reused_sections": 0}
+        self._aggregates = None
+
+    def _load_aggregate_cache(self):
+        """Load cached per-tournament aggregates."""
+        try:
+            with open(self.aggregates_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache.get("files", {})
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {}
+
+    def _save_aggregate_cache(self, files):
+        """Persist per-tournament aggregates atomically."""
+        _write_text(self.aggregates_path, _canonical_json({"version": CACHE_VERSION, "files": files}))
+
+    def tournament_aggregates(self):
+        """Return the aggregate of every tournament, parsing only new or modified files."""
+        if self._aggregates is not None:
+            return self._aggregates
+        cached = self._load_aggregate_cache()
+        files = {}
+
+        for path in list_tournament_files(self.data_dir):
+            name = os.path.basename(path)
+            stat = os.stat(path)
+            entry = cached.get(name)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                files[name] = entry
+                self.stats["cached_files"] += 1
+                continue
+
+            tournament = load_tournament(path)
+            if tournament is None:
+                continue
+            files[name] = {
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "aggregate": aggregates.tournament_aggregate(tournament)
+            }
+            self.stats["parsed_files"] += 1
+
+        if self.stats["parsed_files"] or len(files) != len(cached):
+            self._save_aggregate_cache(files)
+        self._aggregates = [entry["aggregate"] for entry in files.values()]
+        return self._aggregates
+
+    def compute_sections(self, start_date=None, end_date=None):
+        """Compute the report sections for a date range."""
+        selected = [
+            aggregate for aggregate in self.tournament_aggregates()
+            if in_date_range(aggregate.get("date"), start_date, end_date)
+        ]
+        merged = aggregates.merge_aggregates(selected)
+        return {
+            "metagame": aggregates.metagame_shares(merged),
+            "matchups": matchup_matrix_with_intervals(merged),
+            "cards": aggregates.card_stats(merged)
+        }
+
+    def _write_section(self, name, payload, output_dir):
+        """Write a section data file, reusing the cached file when its content is unchanged."""
+        content = _canonical_json(payload)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        cached_path = os.path.join(self.sections_dir, f"{name}-{digest}.json")
+
+        if os.path.exists(cached_path):
+            self.stats["reused_sections"] += 1
+        else:
+            _write_text(cached_path, content)
+            self.stats["written_sections"] += 1
+
+        data_dir = os.path.join(output_dir, "data")
+        os.makedirs(data_dir, exist_ok=True)
+        _link_or_copy(cached_path, os.path.join(data_dir, f"{name}.json"))
+        return content, digest
+
+    def build(self, output_dir, format_name, start_date, end_date, analysis_id, extra_sections=None):
+        """Build the report data files and HTML page in output_dir and return the HTML path."""
+        sections = self.compute_sections(start_date, end_date)
+        sections.update(extra_sections or {})
+
+        manifest = {"format": format_name, "start_date": start_date, "end_date": end_date, "sections": {}}
+        data_tags = []
+        for name, payload in sections.items():
+            content, digest = self._write_section(name, payload, output_dir)
+            manifest["sections"][name] = {"file": f"data/{name}.json", "hash": digest}
+            # Escape "</" so card or archetype names cannot close the script tag
+            escaped = content.replace("</", "<\\/")
+            data_tags.append(f'<script type="application/json" id="data-{name}">{escaped}</script>')
+
+        # Chart titles are built from archetype names: every value is escaped
+        images = "\n".join(
+            f'<div class="visualization"><h2>{escape(title)}</h2>'
+            f'<img src="{escape(file_name, quote=True)}" alt="{escape(title, quote=True)}"></div>'
+            for file_name, title in _image_files(output_dir)
+            if os.path.exists(os.path.join(output_dir, file_name))
+        )
+        pages = "\n".join(
+            f'<div class="visualization"><h2>{escape(title)}</h2>'
+            f'<p><a href="{escape(file_name, quote=True)}">Open {escape(title.lower())}</a></p></div>'
+            for file_name, title in PAGE_FILES
+            if os.path.exists(os.path.join(output_dir, file_name))
+        )
+
+        html = HTML_TEMPLATE.format(
+            title=escape(format_name.title()),
+            start_date=escape(str(start_date)),
+            end_date=escape(str(end_date)),
+            generated=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            analysis_id=escape(str(analysis_id)),
+            images=images,
+            pages=pages,
+            data="\n".join(data_tags)
+        )
+
+        with open(os.path.join(output_dir, "report_manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        report_path = os.path.join(output_dir, "analysis_report.html")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+        logger.info(
+            f"Report built: {self.stats['parsed_files']} tournaments parsed, {self.stats['cached_files']} from cache, "
+            f"{self.stats['written_sections']} sections written, {self.stats['reused_sections']} reused."
+        )
+        return report_path
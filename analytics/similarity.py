@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deck similarity index for the MTG Analytics pipeline.
+MinHash signatures over the card sets of a DeckCardMatrix, bucketed with
+locality-sensitive hashing, find near-duplicate decks and cluster decks the
+archetype rules could not classify without comparing every pair of decks.
+
+Example:
+  python -m analytics.similarity --format modern --threshold 0.6
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+import numpy as np
+
+from analytics.card_matrix import DeckCardMatrix
+from analytics.dataset import processed_data_dir, load_tournaments, configure_logging
+
+logger = logging.getLogger('analytics.similarity')
+
+_MAX_HASH = np.iinfo(np.uint32).max
+_SHIFT = np.uint64(32)
+
+UNCLASSIFIED_ARCHETYPES = {None, "", "Other", "Unknown"}
+
+def _mix(values):
+    """Scramble 64-bit integers (splitmix64 finalizer) before multiply-shift hashing."""
+    values = values.copy()
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+class DeckSimilarityIndex:
+    """MinHash/LSH index over the card sets of decks."""
+
+    def __init__(self, num_perm=128, bands=32, seed=1, include_sideboard=False, chunk_size=4_000_000):
+        """Initialize the index.
+
+        num_perm must be a multiple of bands. With r = num_perm / bands rows per
+        band, two decks of Jaccard similarity s become candidates with
+        probability 1 - (1 - s^r)^bands.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.include_sideboard = include_sideboard
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions: odd 64-bit multipliers, wrapping arithmetic
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+        self.matrix = None
+        self.rows = None
+        self.signatures = None
+        self.band_keys = None
+
+    def _features(self, matrix, rows):
+        """Return the CSR pointer and card ids of the selected decks."""
+        starts = matrix.indptr[rows]
+        lengths = matrix.indptr[rows + 1] - starts
+        positions = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(lengths.sum())
+        indices = matrix.indices[positions]
+        if self.include_sideboard:
+            keep = np.ones(len(positions), dtype=bool)
+        else:
+            keep = matrix.main[positions] > 0
+
+        row_ids = np.repeat(np.arange(len(rows)), lengths)[keep]
+        pointer = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=len(rows)), out=pointer[1:])
+        return pointer, _mix(indices[keep].astype(np.uint64))
+
+    def _signatures(self, pointer, features):
+        """Compute MinHash signatures in chunks of decks."""
+        n = len(pointer) - 1
+        signatures = np.full((n, self.num_perm), _MAX_HASH, dtype=np.uint32)
+        if n == 0 or len(features) == 0:
+            return signatures
+
+        lengths = np.diff(pointer)
+        rows_per_chunk = max(1, self.chunk_size // (self.num_perm * int(lengths.max())))
+
+        for first in range(0, n, rows_per_chunk):
+            last = min(n, first + rows_per_chunk)
+            chunk_lengths = lengths[first:last]
+            non_empty = chunk_lengths > 0
+            if not non_empty.any():
+                continue
+            # Decks are padded to the longest deck of the chunk with their first card, which
+            # leaves their minimum unchanged: one dense reduction instead of a reduceat per deck
+            columns = np.arange(int(chunk_lengths.max()))
+            positions = pointer[first:last, None] + np.where(columns < chunk_lengths[:, None], columns, 0)
+            hashes = np.multiply(features[positions[non_empty]][..., None], self._a)
+            hashes += self._b
+            hashes >>= _SHIFT
+            block = signatures[first:last]
+            block[non_empty] = hashes.min(axis=1)
+        return signatures
+
+    def _band_keys(self, signatures):
+        """Combine the rows of each band into a single 64-bit bucket key."""
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        multiplier = np.uint64(1_000_003)
+        with np.errstate(over="ignore"):
+            for band in range(self.bands):
+                block = signatures[:, band * self.rows_per_band:(band + 1) * self.rows_per_band]
+                key = np.zeros(len(signatures), dtype=np.uint64)
+                for column in range(self.rows_per_band):
+                    key = key * multiplier + block[:, column].astype(np.uint64)
+                keys[:, band] = key
+        return keys
+
+    def fit(self, matrix, rows=None):
+        """Index the decks of a DeckCardMatrix (all rows, or the given row numbers)."""
+        rows = np.arange(matrix.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        pointer, features = self._features(matrix, rows)
+        self.matrix = matrix
+        self.rows = rows
+        self.signatures = self._signatures(pointer, features)
+        self.band_keys = self._band_keys(self.signatures)
+        self._empty = np.diff(pointer) == 0
+        return self
+
+    def estimated_similarity(self, left, right):
+        """Estimate the Jaccard similarity of pairs of indexed decks from their signatures.
+
+        Pairs are compared in chunks of about chunk_size signature values, so
+        millions of pairs never materialize their signatures at once.
+        """
+        left, right = np.asarray(left), np.asarray(right)
+        similarity = np.empty(len(left), dtype=np.float64)
+        pairs_per_chunk = max(1, self.chunk_size // self.num_perm)
+        for first in range(0, len(left), pairs_per_chunk):
+            last = first + pairs_per_chunk
+            matches = np.count_nonzero(self.signatures[left[first:last]] == self.signatures[right[first:last]], axis=1)
+            similarity[first:last] = matches / self.num_perm
+        return similarity
+
+    def candidate_pairs(self, complete=True, max_bucket_size=16):
+        """Return unique pairs of indexed decks sharing at least one LSH bucket.
+
+        With complete=True, every pair of a bucket is returned; in buckets of
+        more than max_bucket_size decks (e.g. copies of a popular list), each
+        deck is only paired with the next max_bucket_size - 1 decks of the
+        bucket. With complete=False, only consecutive members of each bucket
+        are paired: enough to connect the bucket, which is all clustering needs.
+        """
+        window = max_bucket_size - 1 if complete else 1
+        pairs = []
+        for band in range(self.bands):
+            keys = self.band_keys[:, band]
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            # Buckets are runs of the sorted keys: members k apart share a bucket
+            # only if members 1 to k - 1 apart do, so the scan stops at the largest bucket
+            for offset in range(1, window + 1):
+                same = sorted_keys[offset:] == sorted_keys[:-offset]
+                if not same.any():
+                    break
+                pairs.append(np.stack((order[:-offset][same], order[offset:][same]), axis=1))
+
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.concatenate(pairs)
+        pairs = pairs[~(self._empty[pairs[:, 0]] | self._empty[pairs[:, 1]])]
+        pairs.sort(axis=1)
+        # Deduplicate through a single integer code per pair, much faster than unique(axis=0)
+        n = np.int64(len(self.rows))
+        codes = np.unique(pairs[:, 0].astype(np.int64) * n + pairs[:, 1])
+        return np.stack((codes // n, codes % n), axis=1)
+
+    def near_duplicates(self, threshold=0.8, max_bucket_size=16):
+        """Return (deck_id, deck_id, estimated similarity) for pairs above threshold."""
+        pairs = self.candidate_pairs(complete=True, max_bucket_size=max_bucket_size)
+        if len(pairs) == 0:
+            return []
+        similarity = self.estimated_similarity(pairs[:, 0], pairs[:, 1])
+        keep = similarity >= threshold
+        deck_ids = self.matrix.deck_ids
+        return [
+            (deck_ids[self.rows[left]], deck_ids[self.rows[right]], float(score))
+            for (left, right), score in zip(pairs[keep], similarity[keep])
+        ]
+
+    def query(self, row, threshold=0.5):
+        """Return (deck_id, estimated similarity) of indexed decks similar to indexed deck row."""
+        candidates = np.flatnonzero((self.band_keys == self.band_keys[row]).any(axis=1))
+        candidates = candidates[candidates != row]
+        similarity = self.estimated_similarity(np.full(len(candidates), row), candidates)
+        keep = similarity >= threshold
+        order = np.argsort(-similarity[keep], kind="stable")
+        deck_ids = self.matrix.deck_ids
+        return [(deck_ids[self.rows[c]], float(s)) for c, s in zip(candidates[keep][order], similarity[keep][order])]
+
+    def cluster(self, threshold=0.6):
+        """Group indexed decks into clusters of similar decks; returns a label per indexed deck."""
+        n = len(self.rows)
+        pairs = self.candidate_pairs(complete=False)
+        if len(pairs):
+            pairs = pairs[self.estimated_similarity(pairs[:, 0], pairs[:, 1]) >= threshold]
+        return _connected_components(n, pairs)
+
+def _connected_components(n, pairs):
+    """Label the connected components of a graph given as an edge array."""
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        connected_components = None
+
+    if connected_components is not None:
+        graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+        return connected_components(graph, directed=False)[1]
+
+    parent = list(range(n))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for left, right in pairs.tolist():
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[root_right] = root_left
+
+    roots = [find(node) for node in range(n)]
+    _, labels = np.unique(roots, return_inverse=True)
+    return labels
+
+def cluster_unclassified_decks(matrix, threshold=0.6, min_size=2, **index_options):
+    """Cluster the decks without a recognized archetype.
+
+    Returns a list of clusters (largest first), each with its deck ids and the
+    cards shared by most of its decks.
+    """
+    rows = np.array([i for i, archetype in enumerate(matrix.archetypes) if archetype in UNCLASSIFIED_ARCHETYPES],
+                    dtype=np.int64)
+    if len(rows) == 0:
+        return []
+
+    index = DeckSimilarityIndex(**index_options).fit(matrix, rows)
+    labels = index.cluster(threshold)
+
+    clusters = []
+    for label in np.unique(labels):
+        members = rows[labels == label]
+        if len(members) < min_size:
+            continue
+        card_counts = np.bincount(
+            np.concatenate([matrix.row_cards(row) for row in members]),
+            minlength=len(matrix.cards)
+        )
+        core = np.flatnonzero(card_counts >= 0.8 * len(members))
+        core = core[np.argsort(-card_counts[core], kind="stable")]
+        clusters.append({
+            "size": int(len(members)),
+            "deck_ids": [matrix.deck_ids[row] for row in members],
+            "core_cards": [matrix.cards[card] for card in core[:15]]
+        })
+
+    clusters.sort(key=lambda cluster: -cluster["size"])
+    return clusters
+
+def main():
+    """Cluster unclassified decks of a format and print the clusters as JSON."""
+    configure_logging(sys.stderr)
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Cluster decks without a recognized archetype")
+    parser.add_argument("--format", required=True, help="Format to analyze")
+    parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Minimum Jaccard similarity within a cluster")
+    parser.add_argument("--min-size", type=int, default=2, help="Smallest cluster to report")
+    parser.add_argument("--include-sideboard", action="store_true", help="Compare sideboards as well")
+    args = parser.parse_args()
+
+    tournaments = load_tournaments(processed_data_dir(base_dir, args.format), args.start_date, args.end_date)
+    matrix = DeckCardMatrix.from_tournaments(tournaments)
+    logger.info(f"Built a {matrix.shape[0]} x {matrix.shape[1]} deck-by-card matrix.")
+
+    clusters = cluster_unclassified_decks(
+        matrix, args.threshold, args.min_size, include_sideboard=args.include_sideboard
+    )
+    logger.info(f"Found {len(clusters)} clusters of unclassified decks.")
+    print(json.dumps(clusters, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
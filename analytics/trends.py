@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rolling metagame trends for the MTG Analytics pipeline.
+Per-tournament aggregates are binned into per-day arrays, and every rolling
+window is a difference of two prefix sums, so a year of daily 7/14/30-day
+windows costs about as much as a single window.
+
+Example:
+  python -m analytics.trends --format modern --days 365 --windows 7 14 30
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import date, timedelta
+from html import escape
+
+import numpy as np
+
+from analytics.dataset import processed_data_dir, configure_logging
+from analytics.report_engine import ReportEngine
+
+logger = logging.getLogger('analytics.trends')
+
+DEFAULT_WINDOWS = (7, 14, 30)
+DEFAULT_TOP_ARCHETYPES = 12
+
+TRENDS_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>MTG Analytics Trends - {title}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 40px; background-color: #f5f5f5; }}
+.container {{ max-width: 1200px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+h1 {{ color: #2c3e50; text-align: center; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
+.controls {{ margin: 20px 0; }}
+.controls button {{ margin-right: 6px; padding: 4px 10px; border: 1px solid #3498db; background: white; border-radius: 4px; cursor: pointer; }}
+.controls button.active {{ background: #3498db; color: white; }}
+.legend span {{ display: inline-block; margin: 2px 10px 2px 0; font-size: 0.85em; }}
+.legend i {{ display: inline-block; width: 12px; height: 12px; margin-right: 4px; vertical-align: middle; }}
+.footer {{ text-align: center; margin-top: 40px; color: #7f8c8d; font-size: 0.9em; }}
+</style>
+</head>
+<body>
+<div class="container">
+<h1>Rolling Metagame Trends - {title} Format</h1>
+<p><strong>Period:</strong> {start_date} to {end_date}</p>
+<div class="controls" id="windows"></div>
+<div class="controls" id="metrics"></div>
+<svg id="chart" width="1140" height="460"></svg>
+<div class="legend" id="legend"></div>
+<div class="footer"><p>Generated by MTG Analytics Pipeline</p><p>Generated: {generated}</p></div>
+</div>
+<script type="application/json" id="data-trends">{data}</script>
+<script>
+var data = JSON.parse(document.getElementById("data-trends").textContent);
+var colors = ["#3498db", "#e74c3c", "#2ecc71", "#9b59b6", "#f39c12", "#1abc9c", "#34495e", "#e67e22",
+  "#16a085", "#c0392b", "#8e44ad", "#7f8c8d"];
+var state = {{ window: Object.keys(data.windows)[0], metric: "share" }};
+function escapeHtml(text) {{
+  return String(text).replace(/[&<>"']/g, function (c) {{
+    return {{"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}}[c];
+  }});
+}}
+function buttons(id, values, key) {{
+  var box = document.getElementById(id);
+  box.innerHTML = "";
+  values.forEach(function (v) {{
+    var b = document.createElement("button");
+    b.textContent = v[1];
+    if (state[key] === v[0]) b.className = "active";
+    b.onclick = function () {{ state[key] = v[0]; draw(); }};
+    box.appendChild(b);
+  }});
+}}
+function draw() {{
+  buttons("windows", Object.keys(data.windows).map(function (w) {{ return [w, w + "-day window"]; }}), "window");
+  buttons("metrics", [["share", "Metagame share"], ["win_rate", "Win rate"]], "metric");
+  var series = data.windows[state.window][state.metric], n = data.dates.length;
+  var svg = document.getElementById("chart"), w = 1080, h = 400, left = 50, top = 20;
+  var max = 0;
+  series.forEach(function (s) {{ s.forEach(function (v) {{ if (v !== null && v > max) max = v; }}); }});
+  if (state.metric === "win_rate") max = 1;
+  max = max || 1;
+  var x = function (i) {{ return left + (n > 1 ? w * i / (n - 1) : 0); }};
+  var y = function (v) {{ return top + h - h * v / max; }};
+  var html = '<line x1="' + left + '" y1="' + (top + h) + '" x2="' + (left + w) + '" y2="' + (top + h) + '" stroke="#999"/>';
+  for (var k = 0; k <= 4; k++) {{
+    var v = max * k / 4;
+    html += '<text x="' + (left - 6) + '" y="' + (y(v) + 4) + '" font-size="11" text-anchor="end">' + (100 * v).toFixed(0) + '%</text>';
+    html += '<line x1="' + left + '" y1="' + y(v) + '" x2="' + (left + w) + '" y2="' + y(v) + '" stroke="#eee"/>';
+  }}
+  var step = Math.max(1, Math.ceil(n / 12));
+  for (var i = 0; i < n; i += step) {{
+    html += '<text x="' + x(i) + '" y="' + (top + h + 16) + '" font-size="11" text-anchor="middle">' + data.dates[i] + '</text>';
+  }}
+  series.forEach(function (s, a) {{
+    var path = "", pen = false;
+    s.forEach(function (v, i) {{
+      if (v === null) {{ pen = false; return; }}
+      path += (pen ? "L" : "M") + x(i).toFixed(1) + "," + y(v).toFixed(1);
+      pen = true;
+    }});
+    html += '<path d="' + path + '" fill="none" stroke-width="2" stroke="' + colors[a % colors.length] + '"><title>' +
+      escapeHtml(data.archetypes[a]) + '</title></path>';
+  }});
+  svg.innerHTML = html;
+  document.getElementById("legend").innerHTML = data.archetypes.map(function (a, i) {{
+    return '<span><i style="background:' + colors[i % colors.length] + '"></i>' + escapeHtml(a) + "</span>";
+  }}).join("");
+}}
+draw();
+</script>
+</body>
+</html>
+"""
+
+def _parse_day(iso_date):
+    """Return the date of an ISO date or datetime string."""
+    return date.fromisoformat(iso_date[:10])
+
+def daily_arrays(tournament_aggregates, start_date, end_date, archetypes):
+    """Bin tournament aggregates into per-day arrays over an inclusive date range.
+
+    Returns (decks[day], archetype_decks[day, archetype], wins[day, archetype],
+    losses[day, archetype]). Mirror matches are left out of wins and losses.
+    """
+    first = _parse_day(start_date)
+    days = (_parse_day(end_date) - first).days + 1
+    column = {name: i for i, name in enumerate(archetypes)}
+
+    decks = np.zeros(days, dtype=np.int64)
+    archetype_decks = np.zeros((days, len(archetypes)), dtype=np.int64)
+    wins = np.zeros((days, len(archetypes)), dtype=np.int64)
+    losses = np.zeros((days, len(archetypes)), dtype=np.int64)
+
+    for aggregate in tournament_aggregates:
+        if not aggregate.get("date"):
+            continue
+        day = (_parse_day(aggregate["date"]) - first).days
+        if not 0 <= day < days:
+            continue
+        decks[day] += aggregate["decks"]
+        for archetype, count in aggregate["archetypes"].items():
+            if archetype in column:
+                archetype_decks[day, column[archetype]] += count
+        for archetype, opponents in aggregate["matchups"].items():
+            if archetype not in column:
+                continue
+            for opponent, (won, lost, _) in opponents.items():
+                if opponent != archetype:
+                    wins[day, column[archetype]] += won
+                    losses[day, column[archetype]] += lost
+
+    return decks, archetype_decks, wins, losses
+
+def rolling_sums(values, window):
+    """Sum values over a trailing window along the first axis using prefix sums."""
+    prefix = np.zeros((len(values) + 1,) + values.shape[1:], dtype=values.dtype)
+    np.cumsum(values, axis=0, out=prefix[1:])
+    ends = np.arange(1, len(values) + 1)
+    return prefix[ends] - prefix[np.maximum(ends - window, 0)]
+
+def _ratios(numerator, denominator):
+    """Return numerator / denominator per archetype and day, None where undefined."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.round(numerator / denominator, 4)
+    return [
+        [float(value) if count else None for value, count in zip(row, counts)]
+        for row, counts in zip(ratios.T, np.broadcast_to(denominator, numerator.shape).T)
+    ]
+
+def rolling_trends(tournament_aggregates, start_date=None, end_date=None, windows=DEFAULT_WINDOWS,
+                   top=DEFAULT_TOP_ARCHETYPES):
+    """Compute rolling archetype shares and win rates for every day of a date range.
+
+    The value of a day covers the window ending on that day, so the days before
+    start_date are included in the computation of the first windows.
+    """
+    aggregates = [aggregate for aggregate in tournament_aggregates if aggregate.get("date")]
+    windows = sorted(set(windows))
+    if not aggregates or not windows:
+        return {"start_date": start_date, "end_date": end_date, "dates": [], "archetypes": [], "windows": {}}
+
+    start_date = start_date or min(aggregate["date"] for aggregate in aggregates)[:10]
+    end_date = end_date or max(aggregate["date"] for aggregate in aggregates)[:10]
+    lead_in = (_parse_day(start_date) - timedelta(days=windows[-1] - 1)).isoformat()
+
+    totals = {}
+    for aggregate in aggregates:
+        if lead_in <= aggregate["date"][:10] <= end_date:
+            for archetype, count in aggregate["archetypes"].items():
+                totals[archetype] = totals.get(archetype, 0) + count
+    archetypes = [name for name, _ in sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:top]]
+
+    decks, archetype_decks, wins, losses = daily_arrays(aggregates, lead_in, end_date, archetypes)
+    skip = windows[-1] - 1
+    first = _parse_day(start_date)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(len(decks) - skip)]
+
+    series = {}
+    for window in windows:
+        window_decks = rolling_sums(decks, window)[skip:]
+        window_archetypes = rolling_sums(archetype_decks, window)[skip:]
+        window_wins = rolling_sums(wins, window)[skip:]
+        window_decided = window_wins + rolling_sums(losses, window)[skip:]
+        series[str(window)] = {
+            "decks": window_decks.tolist(),
+            "share": _ratios(window_archetypes, window_decks[:, None]),
+            "win_rate": _ratios(window_wins, window_decided),
+            "matches": window_decided.T.tolist()
+        }
+
+    return {"start_date": start_date, "end_date": end_date, "dates": dates, "archetypes": archetypes,
+            "windows": series}
+
+def build_trends(tournament_aggregates, output_dir, format_name, start_date=None, end_date=None,
+                 windows=DEFAULT_WINDOWS, top=DEFAULT_TOP_ARCHETYPES):
+    """Write trends.json and the trends.html chart in output_dir and return the trends."""
+    trends = rolling_trends(tournament_aggregates, start_date, end_date, windows, top)
+    trends["format"] = format_name
+
+    os.makedirs(output_dir, exist_ok=True)
+    content = json.dumps(trends, separators=(",", ":"), ensure_ascii=False)
+    with open(os.path.join(output_dir, "trends.json"), 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    html = TRENDS_TEMPLATE.format(
+        title=escape(format_name.title()),
+        start_date=escape(str(trends["start_date"])),
+        end_date=escape(str(trends["end_date"])),
+        generated=date.today().isoformat(),
+        # Escape "</" so archetype names cannot close the script tag
+        data=content.replace("</", "<\\/")
+    )
+    chart_path = os.path.join(output_dir, "trends.html")
+    with open(chart_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+    logger.info(f"Trends built: {len(trends['dates'])} days, windows {', '.join(trends['windows'])}.")
+    return trends
+
+def main():
+    """Build the rolling trends dataset and chart of a format."""
+    configure_logging(sys.stderr)
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Build rolling metagame trends")
+    parser.add_argument("--format", required=True, help="Format to analyze")
+    parser.add_argument("--end-date", help="Last day (YYYY-MM-DD, default: today)")
+    parser.add_argument("--days", type=int, default=365, help="Number of days to cover")
+    parser.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS), help="Window sizes in days")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_ARCHETYPES, help="Number of archetypes to chart")
+    parser.add_argument("--output", help="Output directory (default: analyses/trends_<format>)")
+    args = parser.parse_args()
+
+    format_name = args.format.lower()
+    end_date = args.end_date or date.today().isoformat()
+    start_date = (_parse_day(end_date) - timedelta(days=args.days - 1)).isoformat()
+    output_dir = args.output or os.path.join(base_dir, "analyses", f"trends_{format_name}")
+
+    engine = ReportEngine(
+        processed_data_dir(base_dir, format_name),
+        os.path.join(base_dir, "analyses", ".report-cache", format_name)
+    )
+    build_trends(engine.tournament_aggregates(), output_dir, format_name, start_date, end_date, args.windows, args.top)
+    print(os.path.join(output_dir, "trends.html"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
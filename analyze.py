@@ -7,16 +7,54 @@ This script provides a simplified interface to run analyses.
 """
 
 import sys
-import subprocess
+import argparse
 from datetime import datetime, timedelta
 
+FORMATS = ["standard", "modern", "pioneer", "legacy", "vintage", "pauper"]
+
+def parse_args():
+    """Parse optional arguments that skip the interactive prompts."""
+    parser = argparse.ArgumentParser(description="MTG Analytics Pipeline - Quick Launcher")
+    parser.add_argument("--format", choices=FORMATS, help="Format to analyze (skips the prompts)")
+    parser.add_argument("--days", type=int, help="Analyze the last N days")
+    parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="End date (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run the orchestrator headless (no browser, JSON summary on stdout)")
+    return parser.parse_args()
+
+def run_orchestrator(selected_format, start_date, end_date, headless):
+    """Run the orchestrator in-process and return its exit code."""
+    # Imported here so the prompts show up without waiting for the pipeline modules
+    from orchestrator import main as orchestrator_main
+    
+    argv = [
+        "--format", selected_format,
+        "--start-date", start_date,
+        "--end-date", end_date
+    ]
+    argv.append("--headless" if headless else "--verbose")
+    return orchestrator_main(argv)
+
 def main():
+    args = parse_args()
+    
+    if args.format:
+        # Non-interactive mode
+        today = datetime.now()
+        end_date = args.end_date or today.strftime("%Y-%m-%d")
+        if args.start_date:
+            start_date = args.start_date
+        else:
+            start_date = (today - timedelta(days=args.days or 7)).strftime("%Y-%m-%d")
+        sys.exit(run_orchestrator(args.format, start_date, end_date, args.headless))
+    
     print("🃏 MTG Analytics Pipeline - Quick Launcher")
     print("=" * 50)
     
     # Get format
     print("\nAvailable formats:")
-    formats = ["standard", "modern", "pioneer", "legacy", "vintage", "pauper"]
+    formats = FORMATS
     for i, fmt in enumerate(formats, 1):
         print(f"  {i}. {fmt.title()}")
     
@@ -91,20 +129,12 @@ def main():
     print("This may take several minutes depending on the amount of data to process.")
     
     try:
-        cmd = [
-            sys.executable, "orchestrator.py",
-            "--format", selected_format,
-            "--start-date", start_date,
-            "--end-date", end_date,
-            "--verbose"
-        ]
-        
-        result = subprocess.run(cmd, check=True)
+        exit_code = run_orchestrator(selected_format, start_date, end_date, headless=False)
+        if exit_code != 0:
+            print(f"\n❌ Analysis failed with exit code {exit_code}")
+            sys.exit(1)
         print("\n✅ Analysis completed successfully!")
         
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Analysis failed with exit code {e.returncode}")
-        sys.exit(1)
     except KeyboardInterrupt:
         print("\n\n⏹️ Analysis interrupted by user.")
         sys.exit(1)
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache maintenance for the MTG Analytics pipeline.
+The data_storage directories only grow: every collection adds tournament files
+and every analysis adds an analyses/<format>_<timestamp> folder. A maintenance
+pass applies the retention policy of each directory:
+
+- hot tier: tournaments of the last hot_days days stay as individual files;
+  older ones are compacted into monthly zip bundles under archive/. Off by
+  default: the external parser only reads individual files;
+- age eviction: tournaments (and whole monthly bundles) older than
+  max_age_days are deleted;
+- size eviction: the oldest bundles, then the oldest hot files, are deleted
+  while the directory exceeds max_size_mb;
+- analyses: the newest runs of each format are kept, older runs are deleted
+  by age and size, and unused report cache entries expire.
+
+Passes are incremental and cheap enough to run in the background after each
+analysis: tournament dates are read once per file and remembered in
+.maintenance.json, the work stops when the time budget is spent, and the next
+pass resumes from there.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import zipfile
+from datetime import datetime, timedelta
+
+from cache_manager import (
+    ARCHIVE_DIR, ARCHIVE_INDEX, COMPRESSED_SUFFIX, LOCK_NAME, append_manifest, atomic_write_json,
+    file_lock, is_cache_file, load_archive_index, read_json, storage_variant
+)
+from log_setup import configure_logging
+
+logger = logging.getLogger('cache_maintenance')
+
+STATE_NAME = ".maintenance.json"
+RUN_LOCK_NAME = ".maintenance.lock"
+
+DEFAULT_PATHS = {
+    "raw_cache": "data-collection/raw-cache",
+    "processed_cache": "data-collection/processed-cache",
+    "processed_data": "data/processed",
+    "analyses": "analyses"
+}
+
+DEFAULT_RETENTION = {
+    # The parser and the analytics read these directories file by file: archived
+    # tournaments would silently drop out of their runs, so nothing is compacted by default
+    "raw_cache": {"hot_days": None, "max_age_days": None, "max_size_mb": None},
+    "processed_cache": {"hot_days": None, "max_age_days": None, "max_size_mb": None},
+    "processed_data": {"hot_days": None, "max_age_days": None, "max_size_mb": None},
+    "analyses": {"keep": 20, "max_age_days": 90, "max_size_mb": None, "report_cache_days": 30}
+}
+
+# Analysis folders are named <format>_<YYYYmmdd_HHMMSS>
+ANALYSIS_DIR = re.compile(r"^(?P<format>.+)_(?P<timestamp>\d{8}_\d{6})$")
+
+def tournament_dirs(root):
+    """Return a tournament directory and its (per-format) subdirectories."""
+    if not os.path.isdir(root):
+        return []
+    directories = [root]
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not name.startswith(".") and name != ARCHIVE_DIR and os.path.isdir(path):
+            directories.append(path)
+    return directories
+
+def directory_size(path):
+    """Return the total size of the files under a directory."""
+    total = 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+class CacheMaintenance:
+    """Incremental maintenance of the directories listed in data_storage."""
+
+    def __init__(self, base_dir, config, budget_seconds=30, now=None):
+        """Initialize the maintenance with the retention policies of the configuration."""
+        self.base_dir = base_dir
+        self.storage = (config or {}).get("data_storage", {})
+        retention = self.storage.get("retention", {})
+        self.policies = {
+            kind: dict(defaults, **retention.get(kind, {}))
+            for kind, defaults in DEFAULT_RETENTION.items()
+        }
+        self.budget_seconds = budget_seconds
+        self.now = now or datetime.now()
+        self.deadline = None
+        self.stats = {
+            "scanned": 0, "archived": 0, "evicted": 0, "bundles_evicted": 0, "analyses_removed": 0,
+            "report_cache_removed": 0, "bytes_freed": 0, "complete": True
+        }
+
+    def _path(self, kind):
+        """Return the directory of a data_storage entry."""
+        return os.path.join(self.base_dir, self.storage.get(kind, DEFAULT_PATHS[kind]))
+
+    def _cutoff(self, days):
+        """Return the ISO date days days before now."""
+        return (self.now - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    def _over_budget(self):
+        """Check whether the time budget of the pass is spent; the next pass resumes the work."""
+        if time.monotonic() > self.deadline:
+            self.stats["complete"] = False
+            return True
+        return False
+
+    def run(self):
+        """Run one maintenance pass; return its statistics, or None if another pass is running."""
+        try:
+            with file_lock(os.path.join(self.base_dir, "data-collection", RUN_LOCK_NAME), blocking=False):
+                self.deadline = time.monotonic() + self.budget_seconds
+                for kind in ("raw_cache", "processed_cache", "processed_data"):
+                    for cache_dir in tournament_dirs(self._path(kind)):
+                        if self._over_budget():
+                            return self.stats
+                        self.maintain_tournaments(cache_dir, self.policies[kind])
+                if not self._over_budget() and os.path.isdir(self._path("analyses")):
+                    self.maintain_analyses(self._path("analyses"), self.policies["analyses"])
+        except BlockingIOError:
+            logger.info("Cache maintenance already running. Skipping.")
+            return None
+        return self.stats
+
+    def _scan(self, cache_dir):
+        """Return {name: {mtime, size, date}} for the hot files, reading only new or modified files."""
+        state_path = os.path.join(cache_dir, STATE_NAME)
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                known = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            known = {}
+
+        files = {}
+        for name in os.listdir(cache_dir):
+            if not is_cache_file(name):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = known.get(name)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                files[name] = entry
+                continue
+            if self._over_budget():
+                break
+            try:
+                date = read_json(path).get("date")
+            except (OSError, ValueError, ImportError) as e:
+                logger.warning(f"Cannot read the date of {path}: {e}")
+                date = None
+            files[name] = {"mtime": stat.st_mtime, "size": stat.st_size, "date": date}
+            self.stats["scanned"] += 1
+
+        atomic_write_json(state_path, {"files": files}, fsync=False)
+        return files
+
+    def maintain_tournaments(self, cache_dir, policy):
+        """Apply the age eviction, compaction and size eviction policies to a tournament directory."""
+        files = self._scan(cache_dir)
+        complete = self.stats["complete"]
+
+        if policy.get("max_age_days"):
+            cutoff = self._cutoff(policy["max_age_days"])
+            expired = [name for name, entry in files.items() if entry["date"] and entry["date"] < cutoff]
+            # A monthly bundle expires with the last day of its month
+            bundles = sorted({
+                bundle for bundle in load_archive_index(cache_dir).values() if bundle[:7] < cutoff[:7]
+            })
+            if expired or bundles:
+                self._evict(cache_dir, files, expired, bundles)
+
+        if policy.get("hot_days"):
+            cutoff = self._cutoff(policy["hot_days"])
+            months = {}
+            for name, entry in files.items():
+                if entry["date"] and entry["date"] < cutoff:
+                    months.setdefault(entry["date"][:7], []).append(name)
+            for month in sorted(months):
+                if self._over_budget():
+                    break
+                self._archive_month(cache_dir, month, months[month], files)
+
+        # Size eviction needs the whole directory, so it waits for a complete scan
+        if policy.get("max_size_mb") and complete:
+            self._evict_by_size(cache_dir, files, policy["max_size_mb"] * 1024 * 1024)
+
+        atomic_write_json(os.path.join(cache_dir, STATE_NAME), {"files": files}, fsync=False)
+
+    def _archive_month(self, cache_dir, month, names, files):
+        """Move the hot files of a month into the month's bundle."""
+        archive_dir = os.path.join(cache_dir, ARCHIVE_DIR)
+        bundle_name = f"{month}.zip"
+        bundle_path = os.path.join(archive_dir, bundle_name)
+        tmp_path = f"{bundle_path}.{os.getpid()}.tmp"
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # Collectors writing to the directory wait for the bundle to be installed
+        with file_lock(os.path.join(cache_dir, LOCK_NAME)):
+            replaced = set(names) | {storage_variant(name) for name in names}
+            with zipfile.ZipFile(tmp_path, 'w') as bundle:
+                if os.path.exists(bundle_path):
+                    with zipfile.ZipFile(bundle_path) as previous:
+                        for info in previous.infolist():
+                            if info.filename not in replaced:
+                                bundle.writestr(info, previous.read(info))
+                for name in names:
+                    # Compressed files are stored as they are
+                    compression = zipfile.ZIP_STORED if name.endswith(COMPRESSED_SUFFIX) else zipfile.ZIP_DEFLATED
+                    bundle.write(os.path.join(cache_dir, name), name, compress_type=compression)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, bundle_path)
+
+            # Until the hot files are removed, they shadow their archived copy
+            index = dict(load_archive_index(cache_dir))
+            for name in names:
+                index.pop(storage_variant(name), None)
+                index[name] = bundle_name
+            atomic_write_json(os.path.join(archive_dir, ARCHIVE_INDEX), index)
+            append_manifest(cache_dir, {"state": "archive", "names": sorted(names), "bundle": bundle_name})
+            for name in names:
+                os.remove(os.path.join(cache_dir, name))
+                del files[name]
+
+        self.stats["archived"] += len(names)
+        logger.info(f"Archived {len(names)} tournaments of {month} into {bundle_path}")
+
+    def _evict(self, cache_dir, files, names, bundles):
+        """Delete hot files and whole bundles of a tournament directory."""
+        archive_dir = os.path.join(cache_dir, ARCHIVE_DIR)
+        with file_lock(os.path.join(cache_dir, LOCK_NAME)):
+            for name in names:
+                self.stats["bytes_freed"] += files.pop(name)["size"]
+                os.remove(os.path.join(cache_dir, name))
+            if names:
+                append_manifest(cache_dir, {"state": "evict", "names": sorted(names)})
+
+            if bundles:
+                index = load_archive_index(cache_dir)
+                index = {name: bundle for name, bundle in index.items() if bundle not in bundles}
+                atomic_write_json(os.path.join(archive_dir, ARCHIVE_INDEX), index)
+                for bundle in bundles:
+                    self.stats["bytes_freed"] += os.path.getsize(os.path.join(archive_dir, bundle))
+                    os.remove(os.path.join(archive_dir, bundle))
+
+        self.stats["evicted"] += len(names)
+        self.stats["bundles_evicted"] += len(bundles)
+        logger.info(f"Evicted {len(names)} tournaments and {len(bundles)} bundles from {cache_dir}")
+
+    def _evict_by_size(self, cache_dir, files, max_bytes):
+        """Delete the oldest bundles, then the oldest hot files, until the directory fits in max_bytes."""
+        archive_dir = os.path.join(cache_dir, ARCHIVE_DIR)
+        bundles = sorted(set(load_archive_index(cache_dir).values()))
+        candidates = [(bundle[:7], 0, bundle, os.path.getsize(os.path.join(archive_dir, bundle))) for bundle in bundles]
+        # Undated files go last
+        candidates += [(entry["date"] or "9999", 1, name, entry["size"]) for name, entry in files.items()]
+        candidates.sort()
+
+        total = sum(candidate[3] for candidate in candidates)
+        names, expired = [], []
+        for _, is_file, name, size in candidates:
+            if total <= max_bytes:
+                break
+            (names if is_file else expired).append(name)
+            total -= size
+        if names or expired:
+            self._evict(cache_dir, files, names, expired)
+
+    def maintain_analyses(self, analyses_dir, policy):
+        """Delete old analysis runs, keeping the newest runs of each format, and expire report cache entries."""
+        runs = []
+        for name in os.listdir(analyses_dir):
+            match = ANALYSIS_DIR.match(name)
+            if match and os.path.isdir(os.path.join(analyses_dir, name)):
+                runs.append((match.group("timestamp"), match.group("format"), name))
+        runs.sort(reverse=True)
+
+        kept = {}
+        candidates = []
+        for timestamp, format_name, name in runs:
+            kept[format_name] = kept.get(format_name, 0) + 1
+            if kept[format_name] > (policy.get("keep") or 0):
+                candidates.append((timestamp, name))
+        # Oldest first
+        candidates.reverse()
+
+        removed = set()
+        if policy.get("max_age_days"):
+            cutoff = (self.now - timedelta(days=policy["max_age_days"])).strftime("%Y%m%d_%H%M%S")
+            removed.update(name for timestamp, name in candidates if timestamp < cutoff)
+        if policy.get("max_size_mb"):
+            sizes = {name: directory_size(os.path.join(analyses_dir, name)) for _, _, name in runs}
+            total = sum(size for name, size in sizes.items() if name not in removed)
+            for _, name in candidates:
+                if total <= policy["max_size_mb"] * 1024 * 1024:
+                    break
+                if name not in removed:
+                    removed.add(name)
+                    total -= sizes[name]
+
+        for name in sorted(removed):
+            path = os.path.join(analyses_dir, name)
+            self.stats["bytes_freed"] += directory_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+            self.stats["analyses_removed"] += 1
+        if removed:
+            logger.info(f"Removed {len(removed)} analyses from {analyses_dir}")
+
+        if policy.get("report_cache_days"):
+            self._expire_report_cache(os.path.join(analyses_dir, ".report-cache"), policy["report_cache_days"])
+
+    def _expire_report_cache(self, report_cache_dir, days):
+        """Delete cached report sections and charts that were not written for days days."""
+        if not os.path.isdir(report_cache_dir):
+            return
+        cutoff = time.time() - days * 86400
+        for format_name in os.listdir(report_cache_dir):
+            # aggregates.json is the incremental parse cache and is kept
+            for subdir in ("sections", "charts"):
+                directory = os.path.join(report_cache_dir, format_name, subdir)
+                if not os.path.isdir(directory):
+                    continue
+                for name in os.listdir(directory):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                        if stat.st_mtime < cutoff:
+                            os.remove(path)
+                            self.stats["bytes_freed"] += stat.st_size
+                            self.stats["report_cache_removed"] += 1
+                    except OSError:
+                        pass
+
+def main():
+    """Run a cache maintenance pass."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache eviction, retention and compaction")
+    parser.add_argument("--budget", type=float, default=30, help="Time budget of the pass in seconds")
+    parser.add_argument("--base-dir", help="Project root directory")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    base_dir = args.base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config_path = os.path.join(base_dir, "config", "sources.json")
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Cannot load configuration file {config_path}: {e}")
+        return 1
+
+    stats = CacheMaintenance(base_dir, config, args.budget).run()
+    if stats is not None:
+        logger.info(f"Maintenance pass {'completed' if stats['complete'] else 'interrupted by its budget'}: "
+                    f"{json.dumps(stats)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
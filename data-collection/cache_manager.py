@@ -0,0 +1,636 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache storage for the MTG Analytics data collection.
+Tournament files are written atomically (temporary file + rename) in batches:
+the temporary files of a batch are synced together, and a write-ahead
+manifest records the batch before and after its files are renamed into
+place. A crash can therefore never leave a truncated tournament file, and a
+batch interrupted between the two records is completed on the next open.
+
+Tournament files can be stored compressed with zstd (<name>.json.zst). Card
+names and keys repeat across every tournament, so the frames are compressed
+with a dictionary trained on the cache itself: the first writer opened on a
+cache holding enough tournaments trains it. Dictionaries are kept in the
+.dictionaries folder of the cache, named after their id; each frame records
+the id of its dictionary, so files written with an older dictionary remain
+readable after a new one is trained.
+
+Cache maintenance (cache_maintenance.py) compacts tournaments older than the
+hot tier into monthly zip bundles under archive/. is_cached, read_cached and
+iter_cache see archived tournaments as well as the files of the hot tier.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import zipfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from log_setup import configure_logging
+
+logger = logging.getLogger('cache_manager')
+
+MANIFEST_NAME = "manifest.jsonl"
+LOCK_NAME = ".manifest.lock"
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_INDEX = "index.json"
+
+COMPRESSED_SUFFIX = ".zst"
+DICTIONARY_DIR = ".dictionaries"
+CURRENT_DICTIONARY = "CURRENT"
+DEFAULT_COMPRESSION_LEVEL = 9
+DEFAULT_DICTIONARY_SIZE = 112640
+MIN_TRAINING_SAMPLES = 20
+
+# Unified-format fields recorded in the manifest with each tournament file
+METADATA_FIELDS = ("tournament_id", "source", "format", "date")
+
+# Days whose results may still be published are not recorded as covered
+DEFAULT_SETTLE_DAYS = 2
+
+# Dictionaries loaded for reading, by (dictionary directory, dictionary id)
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+# Archive indexes, by index path, with the mtime they were read at
+_archive_indexes = {}
+
+@contextmanager
+def file_lock(lock_path, blocking=True):
+    """Hold an exclusive lock on lock_path, shared by every process on the host.
+
+    Without blocking, BlockingIOError is raised if another process holds the lock.
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            except OSError as e:
+                raise BlockingIOError(str(e)) from e
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _fsync_directory(path):
+    """Persist the entries of a directory (renames), where the platform supports it."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _zstd():
+    """Import zstandard, an optional dependency only needed for compressed caches."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstandard is required for compressed cache files (pip install zstandard)") from e
+    return zstandard
+
+def is_cache_file(name):
+    """Check whether a directory entry is a tournament file, plain or compressed."""
+    return not name.startswith(".") and name.endswith((".json", ".json" + COMPRESSED_SUFFIX))
+
+def cache_file_path(cache_dir, name):
+    """Return the path of a cached file stored plain or compressed, or None if it is not cached."""
+    for candidate in (name + COMPRESSED_SUFFIX, name):
+        path = os.path.join(cache_dir, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _dictionary_path(cache_dir, dict_id):
+    """Return the file of a dictionary of a cache directory."""
+    return os.path.join(cache_dir, DICTIONARY_DIR, f"{dict_id}.zdict")
+
+def load_dictionary(cache_dir, dict_id=None):
+    """Load a dictionary of a cache directory (the current one by default), or None if it has none."""
+    zstd = _zstd()
+    if dict_id is None:
+        try:
+            with open(os.path.join(cache_dir, DICTIONARY_DIR, CURRENT_DICTIONARY), 'r') as f:
+                dict_id = int(f.read().strip())
+        except FileNotFoundError:
+            return None
+    with open(_dictionary_path(cache_dir, dict_id), 'rb') as f:
+        return zstd.ZstdCompressionDict(f.read())
+
+def _reading_dictionary(cache_dir, dict_id):
+    """Return a dictionary for decompression, loading each dictionary once per process."""
+    key = (os.path.abspath(cache_dir), dict_id)
+    with _dictionaries_lock:
+        if key not in _dictionaries:
+            _dictionaries[key] = load_dictionary(cache_dir, dict_id)
+        return _dictionaries[key]
+
+def _frame_dict_id(content):
+    """Return the dictionary id recorded in a zstd frame header (0 without dictionary)."""
+    return _zstd().get_frame_parameters(content).dict_id
+
+def decode_bytes(name, content, cache_dir):
+    """Decompress the content of a cache file of cache_dir if its name marks it as compressed."""
+    if not name.endswith(COMPRESSED_SUFFIX):
+        return content
+
+    zstd = _zstd()
+    try:
+        dict_id = _frame_dict_id(content)
+        if dict_id:
+            decompressor = zstd.ZstdDecompressor(dict_data=_reading_dictionary(cache_dir, dict_id))
+        else:
+            decompressor = zstd.ZstdDecompressor()
+        return decompressor.decompress(content)
+    except zstd.ZstdError as e:
+        raise ValueError(f"Corrupt compressed cache file {name} in {cache_dir}: {e}") from e
+
+def read_bytes(path):
+    """Read a cache file, decompressing it with the dictionary recorded in its frame if needed."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return decode_bytes(os.path.basename(path), content, os.path.dirname(path))
+
+def read_json(path):
+    """Read a JSON cache file, plain or compressed."""
+    return json.loads(read_bytes(path))
+
+def read_prefix(path, size):
+    """Read the first size bytes of a cache file, decompressing only what is needed."""
+    with open(path, 'rb') as f:
+        if not path.endswith(COMPRESSED_SUFFIX):
+            return f.read(size)
+        zstd = _zstd()
+        header = f.read(18)
+        f.seek(0)
+        try:
+            dict_id = _frame_dict_id(header)
+            if dict_id:
+                decompressor = zstd.ZstdDecompressor(dict_data=_reading_dictionary(os.path.dirname(path), dict_id))
+            else:
+                decompressor = zstd.ZstdDecompressor()
+            with decompressor.stream_reader(f) as reader:
+                return reader.read(size)
+        except zstd.ZstdError as e:
+            raise ValueError(f"Corrupt compressed cache file {path}: {e}") from e
+
+def tournament_metadata(payload):
+    """Return the metadata fields of a unified-format tournament, or None for other payloads."""
+    if not isinstance(payload, dict) or "tournament_id" not in payload:
+        return None
+    return {field: payload.get(field) for field in METADATA_FIELDS}
+
+def read_manifest(cache_dir):
+    """Return the manifest records of a cache directory, ignoring a torn last line."""
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    records = []
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring incomplete manifest record in {manifest_path}")
+    except FileNotFoundError:
+        pass
+    return records
+
+def append_manifest(cache_dir, record, fsync=True):
+    """Append a record to the manifest of a cache directory and make it durable.
+
+    The caller holds the lock of the cache directory.
+    """
+    with open(os.path.join(cache_dir, MANIFEST_NAME), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+def load_archive_index(cache_dir):
+    """Return {stored name: bundle file} for the tournaments archived in a cache directory."""
+    path = os.path.join(cache_dir, ARCHIVE_DIR, ARCHIVE_INDEX)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _archive_indexes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    _archive_indexes[path] = (mtime, index)
+    return index
+
+def is_cached(cache_dir, name):
+    """Check whether a tournament file is cached, in the hot tier or in an archive bundle."""
+    if cache_file_path(cache_dir, name):
+        return True
+    index = load_archive_index(cache_dir)
+    return name in index or name + COMPRESSED_SUFFIX in index
+
+def read_cached(cache_dir, name):
+    """Read a cached JSON tournament by file name from the hot tier or the archive; None if absent."""
+    path = cache_file_path(cache_dir, name)
+    if path:
+        return read_json(path)
+    index = load_archive_index(cache_dir)
+    for stored in (name + COMPRESSED_SUFFIX, name):
+        if stored in index:
+            with zipfile.ZipFile(os.path.join(cache_dir, ARCHIVE_DIR, index[stored])) as bundle:
+                return json.loads(decode_bytes(stored, bundle.read(stored), cache_dir))
+    return None
+
+def iter_cache(cache_dir):
+    """Yield (stored name, payload) for every tournament of a cache, hot files first, then bundles."""
+    hot = set()
+    for name in sorted(os.listdir(cache_dir)):
+        if is_cache_file(name):
+            hot.add(name)
+            hot.add(storage_variant(name))
+            yield name, read_json(os.path.join(cache_dir, name))
+
+    by_bundle = {}
+    for stored, bundle_name in load_archive_index(cache_dir).items():
+        # A tournament collected again after being archived is read from the hot tier
+        if stored not in hot:
+            by_bundle.setdefault(bundle_name, []).append(stored)
+    for bundle_name in sorted(by_bundle):
+        with zipfile.ZipFile(os.path.join(cache_dir, ARCHIVE_DIR, bundle_name)) as bundle:
+            for stored in sorted(by_bundle[bundle_name]):
+                yield stored, json.loads(decode_bytes(stored, bundle.read(stored), cache_dir))
+
+def train_dictionary(cache_dir, dict_size=DEFAULT_DICTIONARY_SIZE, max_samples=2000):
+    """Train a dictionary on the tournaments of a cache and make it the current one; return its id."""
+    zstd = _zstd()
+    names = sorted(name for name in os.listdir(cache_dir) if is_cache_file(name))
+    if len(names) < MIN_TRAINING_SAMPLES:
+        raise ValueError(f"At least {MIN_TRAINING_SAMPLES} tournaments are needed to train a dictionary, "
+                         f"found {len(names)} in {cache_dir}")
+
+    # Evenly spaced samples keep every source and period represented
+    step = max(1, len(names) // max_samples)
+    samples = [read_bytes(os.path.join(cache_dir, name)) for name in names[::step][:max_samples]]
+    dictionary = zstd.train_dictionary(dict_size, samples)
+    dict_id = dictionary.dict_id()
+
+    # Previous dictionaries are kept: the files compressed with them still refer to them
+    atomic_write(_dictionary_path(cache_dir, dict_id), dictionary.as_bytes())
+    atomic_write(os.path.join(cache_dir, DICTIONARY_DIR, CURRENT_DICTIONARY), str(dict_id).encode("ascii"))
+    logger.info(f"Trained dictionary {dict_id} on {len(samples)} tournaments of {cache_dir}")
+    return dict_id
+
+class ZstdCodec:
+    """zstd compression of cache files with the current dictionary of a cache."""
+
+    def __init__(self, cache_dir, level=DEFAULT_COMPRESSION_LEVEL):
+        """Load the current dictionary of the cache, if it has one."""
+        self.zstd = _zstd()
+        self.level = level
+        self.dictionary = load_dictionary(cache_dir)
+        if self.dictionary is not None:
+            self.dictionary.precompute_compress(level=level)
+        self._local = threading.local()
+
+    @property
+    def dict_id(self):
+        """Return the id of the dictionary used for compression (0 without dictionary)."""
+        return self.dictionary.dict_id() if self.dictionary is not None else 0
+
+    def compress(self, content):
+        """Compress bytes into a zstd frame; compressors are per thread as they are not thread-safe."""
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            if self.dictionary is not None:
+                compressor = self.zstd.ZstdCompressor(level=self.level, dict_data=self.dictionary)
+            else:
+                compressor = self.zstd.ZstdCompressor(level=self.level)
+            self._local.compressor = compressor
+        return compressor.compress(content)
+
+def storage_variant(name):
+    """Return the compressed name of a plain file name, and the plain name of a compressed one."""
+    if name.endswith(COMPRESSED_SUFFIX):
+        return name[:-len(COMPRESSED_SUFFIX)]
+    return name + COMPRESSED_SUFFIX
+
+def encode_json(payload):
+    """Serialize a cache payload."""
+    return json.dumps(payload, indent=2).encode("utf-8")
+
+def atomic_write(path, content, fsync=True):
+    """Write bytes to path atomically: readers see the old file or the new one, never a partial one."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_directory(directory)
+
+def atomic_write_json(path, payload, fsync=True):
+    """Write a JSON payload to path atomically."""
+    atomic_write(path, encode_json(payload), fsync)
+
+class CacheWriter:
+    """Batched, crash-safe writer of tournament files into a cache directory.
+
+    Usage:
+        with CacheWriter(output_dir) as writer:
+            writer.write_json("mtgo-123.json", unified_data)
+
+    With compression="zstd", files are stored as <name>.zst and compressed with
+    the current dictionary of the cache, trained on opening if the cache has
+    none yet and holds at least MIN_TRAINING_SAMPLES tournaments.
+    """
+
+    def __init__(self, cache_dir, batch_size=100, fsync=True, compression=None,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL, settle_days=DEFAULT_SETTLE_DAYS):
+        """Open the writer, completing any batch interrupted by a crash."""
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.settle_days = settle_days
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(cache_dir, LOCK_NAME)
+        self.pending = {}
+        self.stats = {"files": 0, "batches": 0, "bytes": 0, "raw_bytes": 0}
+        self._lock = threading.Lock()
+        self._batch_count = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.codec = None
+        if compression == "zstd":
+            try:
+                self.codec = ZstdCodec(cache_dir, compression_level)
+            except ImportError as e:
+                logger.warning(f"{e}. Writing uncompressed cache files.")
+            else:
+                if self.codec.dictionary is None:
+                    self._train_dictionary(compression_level)
+        elif compression:
+            raise ValueError(f"Unsupported cache compression: {compression}")
+        self.recover()
+
+    @classmethod
+    def from_config(cls, cache_dir, config, **kwargs):
+        """Create a writer using the compression settings of the data_storage configuration."""
+        storage = (config or {}).get("data_storage", {})
+        kwargs.setdefault("compression", storage.get("compression"))
+        kwargs.setdefault("compression_level", storage.get("compression_level", DEFAULT_COMPRESSION_LEVEL))
+        kwargs.setdefault("settle_days", storage.get("coverage_settle_days", DEFAULT_SETTLE_DAYS))
+        return cls(cache_dir, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def _train_dictionary(self, level):
+        """Train the first dictionary of the cache once it holds enough tournaments."""
+        if sum(1 for name in os.listdir(self.cache_dir) if is_cache_file(name)) < MIN_TRAINING_SAMPLES:
+            return
+        try:
+            with file_lock(self.lock_path):
+                # Another writer may have trained it while this one waited for the lock
+                if load_dictionary(self.cache_dir) is None:
+                    train_dictionary(self.cache_dir)
+        except (OSError, ValueError, self.codec.zstd.ZstdError) as e:
+            logger.warning(f"Cannot train a dictionary for {self.cache_dir}: {e}. Compressing without one.")
+            return
+        self.codec = ZstdCodec(self.cache_dir, level)
+
+    def _tmp_path(self, name, batch):
+        """Return the temporary file of a name within a batch."""
+        return os.path.join(self.cache_dir, f".{name}.{batch}.tmp")
+
+    def _install(self, name, batch):
+        """Move the temporary file of a batch into place, replacing the other storage of the name."""
+        os.replace(self._tmp_path(name, batch), os.path.join(self.cache_dir, name))
+        other = os.path.join(self.cache_dir, storage_variant(name))
+        if os.path.exists(other):
+            os.remove(other)
+
+    def _read_manifest(self):
+        """Return the manifest records, ignoring a torn last line."""
+        return read_manifest(self.cache_dir)
+
+    def _append_manifest(self, record):
+        """Append a record to the manifest and make it durable."""
+        append_manifest(self.cache_dir, record, self.fsync)
+
+    def recover(self):
+        """Complete the batches that were recorded but not committed, and remove stray temporary files."""
+        with file_lock(self.lock_path):
+            begun = {}
+            for record in self._read_manifest():
+                if record.get("state") == "begin":
+                    begun[record["batch"]] = record
+                elif record.get("state") == "commit":
+                    begun.pop(record.get("batch"), None)
+
+            for batch, record in begun.items():
+                # Temporary files were synced before the begin record, so they are complete
+                for entry in record["files"]:
+                    if os.path.exists(self._tmp_path(entry["name"], batch)):
+                        self._install(entry["name"], batch)
+                _fsync_directory(self.cache_dir)
+                self._append_manifest({"batch": batch, "state": "commit"})
+                logger.info(f"Recovered interrupted cache batch {batch} ({len(record['files'])} files).")
+
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(".") and name.endswith(".tmp"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def write(self, name, content, metadata=None):
+        """Queue bytes to be written to cache_dir/name; the batch is flushed when full."""
+        raw_size = len(content)
+        if self.codec is not None:
+            # Compressed in the calling thread, so concurrent collectors compress in parallel
+            name += COMPRESSED_SUFFIX
+            content = self.codec.compress(content)
+        with self._lock:
+            self.stats["raw_bytes"] += raw_size
+            # A name written twice in a batch keeps its last content
+            self.pending[name] = (content, metadata)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def write_json(self, name, payload):
+        """Queue a JSON payload to be written to cache_dir/name, recording its tournament metadata."""
+        self.write(name, encode_json(payload), tournament_metadata(payload))
+
+    def flush(self):
+        """Write the pending files as one batch."""
+        with self._lock, file_lock(self.lock_path):
+            if not self.pending:
+                return
+            # Batch ids are unique across the processes sharing the cache directory
+            self._batch_count += 1
+            batch = f"{os.getpid()}-{int(time.time() * 1000)}-{self._batch_count}"
+
+            entries = []
+            handles = []
+            try:
+                for name, (content, metadata) in self.pending.items():
+                    f = open(self._tmp_path(name, batch), 'wb')
+                    handles.append(f)
+                    f.write(content)
+                    entry = {
+                        "name": name,
+                        "size": len(content),
+                        "sha256": hashlib.sha256(content).hexdigest()
+                    }
+                    if metadata:
+                        entry["meta"] = metadata
+                    entries.append(entry)
+                # Sync the whole batch after writing it, letting the writes proceed together
+                for f in handles:
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+            finally:
+                for f in handles:
+                    f.close()
+
+            self._append_manifest({"batch": batch, "state": "begin", "files": entries})
+            for entry in entries:
+                self._install(entry["name"], batch)
+            if self.fsync:
+                _fsync_directory(self.cache_dir)
+            self._append_manifest({"batch": batch, "state": "commit"})
+
+            self.stats["files"] += len(entries)
+            self.stats["batches"] += 1
+            self.stats["bytes"] += sum(entry["size"] for entry in entries)
+            self.pending = {}
+
+    def record_coverage(self, source, format_name, start_date, end_date):
+        """Record that every tournament of a source and format from start_date to end_date was collected.
+
+        Dates are ISO strings; the last settle_days days are left out, as their
+        results may still be published.
+        """
+        settled = (datetime.now() - timedelta(days=self.settle_days)).strftime("%Y-%m-%d")
+        end_date = min(end_date, settled)
+        if start_date > end_date:
+            return
+        with file_lock(self.lock_path):
+            self._append_manifest({
+                "state": "coverage",
+                "source": source,
+                "format": format_name.lower(),
+                "start": start_date,
+                "end": end_date
+            })
+
+    def committed(self):
+        """Return {name: entry} for every file of a committed batch still in the hot tier (latest version wins)."""
+        begun = {}
+        files = {}
+        for record in self._read_manifest():
+            if record.get("state") == "begin":
+                begun[record["batch"]] = record["files"]
+            elif record.get("state") in ("archive", "evict"):
+                for name in record.get("names", []):
+                    files.pop(name, None)
+            elif record.get("state") == "commit":
+                for entry in begun.pop(record["batch"], []):
+                    files.pop(storage_variant(entry["name"]), None)
+                    files[entry["name"]] = dict(entry, batch=record["batch"])
+        return files
+
+    def verify(self):
+        """Return the names of committed files that are missing or differ from the manifest."""
+        damaged = []
+        for name, entry in self.committed().items():
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getsize(path) != entry["size"]:
+                    damaged.append(name)
+            except OSError:
+                damaged.append(name)
+        return damaged
+
+def compress_cache(cache_dir, level=DEFAULT_COMPRESSION_LEVEL, batch_size=100):
+    """Rewrite the files of a cache not compressed with its current dictionary; return their count."""
+    _zstd()
+    count = 0
+    with CacheWriter(cache_dir, batch_size, compression="zstd", compression_level=level) as writer:
+        for name in sorted(os.listdir(cache_dir)):
+            if not is_cache_file(name):
+                continue
+            path = os.path.join(cache_dir, name)
+            if name.endswith(COMPRESSED_SUFFIX):
+                with open(path, 'rb') as f:
+                    if _frame_dict_id(f.read(18)) == writer.codec.dict_id:
+                        continue
+                name = name[:-len(COMPRESSED_SUFFIX)]
+            content = read_bytes(path)
+            writer.write(name, content, tournament_metadata(json.loads(content)))
+            count += 1
+    if writer.stats["bytes"]:
+        logger.info(f"Compressed {count} files: {writer.stats['raw_bytes']} bytes -> {writer.stats['bytes']} bytes "
+                    f"({writer.stats['raw_bytes'] / writer.stats['bytes']:.1f}x)")
+    return count
+
+def main():
+    """Maintain a cache directory: train its compression dictionary, compress or verify its files."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache storage maintenance")
+    parser.add_argument("command", choices=["train", "compress", "verify"],
+                        help="train a dictionary, (re)compress the files with it, or check committed files")
+    parser.add_argument("cache_dir", help="Cache directory (e.g. data-collection/raw-cache)")
+    parser.add_argument("--dict-size", type=int, default=DEFAULT_DICTIONARY_SIZE, help="Dictionary size in bytes")
+    parser.add_argument("--samples", type=int, default=2000, help="Maximum number of training tournaments")
+    parser.add_argument("--level", type=int, default=DEFAULT_COMPRESSION_LEVEL, help="zstd compression level")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    try:
+        if args.command == "train":
+            train_dictionary(args.cache_dir, args.dict_size, args.samples)
+        elif args.command == "compress":
+            compress_cache(args.cache_dir, args.level)
+        else:
+            damaged = CacheWriter(args.cache_dir).verify()
+            for name in damaged:
+                logger.error(f"Damaged cache file: {name}")
+            return 1 if damaged else 0
+    except (ImportError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Card-name canonicalization for the MTG Analytics pipeline.
+MTGO, MTGMelee and Topdeck.gg spell the same card differently: split cards
+as "Fire/Ice" or "Fire // Ice", double-faced cards with or without their back
+face, names with or without accents, in any casing. The collectors normalize
+their unified-format tournaments before writing them, so that every later
+stage aggregates a single name per card:
+
+- a name is reduced to a lookup key (accents removed, case folded, apostrophes,
+  whitespace and face separators unified) and resolved through the local
+  card-name table, built from Scryfall bulk data;
+- split cards keep both halves ("Fire // Ice"); double-faced, adventure and
+  flip cards are named after their front face, as on MTGO;
+- names missing from the table keep their spelling, with whitespace and
+  separators cleaned;
+- entries of a deck that resolve to the same card are merged.
+
+Lookups are memoized per spelling, and a tournament resolves each of its
+distinct spellings once, however many decks play it.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+import unicodedata
+
+from cache_manager import COMPRESSED_SUFFIX, CacheWriter, atomic_write_json, is_cache_file, read_json, storage_variant
+from log_setup import configure_logging
+
+logger = logging.getLogger('card_names')
+
+TABLE_VERSION = 1
+DEFAULT_TABLE_PATH = os.path.join("data", "card-names.json")
+SCRYFALL_BULK_URL = "https://api.scryfall.com/bulk-data/oracle-cards"
+
+# Scryfall layouts whose cards are named after both halves; other multi-face cards use their front face
+SPLIT_LAYOUTS = {"split", "aftermath"}
+
+BOARDS = ("mainboard", "sideboard")
+
+FACE_SEPARATOR = re.compile(r"\s*/{1,2}\s*")
+WHITESPACE = re.compile(r"\s+")
+APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'", "´": "'"})
+# Ligatures that do not decompose into their letters
+LIGATURES = str.maketrans({"æ": "ae", "Æ": "Ae", "œ": "oe", "Œ": "Oe"})
+
+# Tables loaded by path, with the mtime they were read at
+_tables = {}
+_tables_lock = threading.Lock()
+
+def clean_name(name):
+    """Return a card name with its whitespace, apostrophes and face separators unified."""
+    name = WHITESPACE.sub(" ", name.translate(APOSTROPHES)).strip()
+    return FACE_SEPARATOR.sub(" // ", name)
+
+def name_key(name):
+    """Return the lookup key of a card name: cleaned, without accents, case folded."""
+    decomposed = unicodedata.normalize("NFKD", clean_name(name).translate(LIGATURES))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+class CardNameTable:
+    """Lookup of canonical card names by name key, memoized per spelling."""
+
+    def __init__(self, names=None):
+        self.names = names or {}
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def canonical(self, name):
+        """Return the canonical name of a card spelling."""
+        canonical = self._cache.get(name)
+        if canonical is None:
+            cleaned = clean_name(name)
+            canonical = self.names.get(name_key(cleaned), cleaned)
+            self._cache[name] = canonical
+        return canonical
+
+def build_table(cards):
+    """Build {name key: canonical name} from Scryfall card objects."""
+    names = {}
+    faces = []
+    for card in cards:
+        card_faces = [face["name"] for face in card.get("card_faces") or [] if face.get("name")]
+        if card.get("layout") in SPLIT_LAYOUTS or not card_faces:
+            canonical = card["name"]
+        else:
+            canonical = card_faces[0]
+        names[name_key(card["name"])] = canonical
+        faces.extend((face, canonical) for face in card_faces)
+    # A face named like another card never shadows that card
+    for face, canonical in faces:
+        names.setdefault(name_key(face), canonical)
+    return names
+
+def table_path(config=None, base_dir=None):
+    """Return the card-name table path of the data_storage configuration."""
+    base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = (config or {}).get("data_storage", {}).get("card_names", DEFAULT_TABLE_PATH)
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+def card_name_table(config=None, base_dir=None):
+    """Return the card-name table of the configuration, loaded once per process and reloaded when rebuilt."""
+    path = table_path(config, base_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        names = {}
+        if mtime is None:
+            logger.warning(f"Card-name table not found: {path}. Card names are only cleaned; "
+                           f"build the table with: python data-collection/card_names.py build")
+        else:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    names = json.load(f)["names"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Cannot read card-name table {path}: {e}")
+        table = CardNameTable(names)
+        _tables[path] = (mtime, table)
+        return table
+
+def normalize_tournament(tournament, table=None):
+    """Canonicalize the card names of every deck of a unified-format tournament, merging duplicates.
+
+    Entries without a card name are kept unchanged. The tournament is updated
+    in place and returned.
+    """
+    table = table if table is not None else card_name_table()
+    decks = tournament.get("decks") or []
+
+    # Each distinct spelling of the tournament is resolved once
+    spellings = {
+        card.get("card_name")
+        for deck in decks
+        for board in BOARDS
+        for card in deck.get(board) or []
+    }
+    spellings.discard(None)
+    resolved = {spelling: table.canonical(spelling) for spelling in spellings}
+
+    for deck in decks:
+        for board in BOARDS:
+            # Keyed by canonical name, or by position for the entries kept as they are
+            entries = {}
+            for position, card in enumerate(deck.get(board) or []):
+                name = resolved.get(card.get("card_name"))
+                if not name:
+                    entries[position] = card
+                    continue
+                if name in entries:
+                    entries[name]["quantity"] = (entries[name].get("quantity") or 0) + (card.get("quantity") or 0)
+                else:
+                    entries[name] = dict(card, card_name=name)
+            if board in deck:
+                deck[board] = list(entries.values())
+    return tournament
+
+def normalize_cache(cache_dir, config=None, table=None):
+    """Rewrite the hot files of a cache whose card names are not canonical; return their count."""
+    table = table if table is not None else card_name_table(config)
+    count = 0
+    with CacheWriter.from_config(cache_dir, config) as writer:
+        for name in sorted(os.listdir(cache_dir)):
+            if not is_cache_file(name):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                tournament = read_json(path)
+            except (OSError, ValueError, ImportError) as e:
+                logger.warning(f"Skipping unreadable tournament file {path}: {e}")
+                continue
+            before = json.dumps(tournament.get("decks"))
+            normalize_tournament(tournament, table)
+            if json.dumps(tournament.get("decks")) != before:
+                # The writer stores the file as configured, replacing the other storage variant
+                writer.write_json(storage_variant(name) if name.endswith(COMPRESSED_SUFFIX) else name, tournament)
+                count += 1
+    logger.info(f"Normalized card names of {count} tournaments in {cache_dir}")
+    return count
+
+def _load_scryfall(path=None):
+    """Return the Scryfall oracle cards, from a bulk data file or downloaded."""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    import requests
+    logger.info(f"Downloading Scryfall oracle cards from {SCRYFALL_BULK_URL}...")
+    bulk = requests.get(SCRYFALL_BULK_URL, timeout=30)
+    bulk.raise_for_status()
+    response = requests.get(bulk.json()["download_uri"], timeout=300)
+    response.raise_for_status()
+    return response.json()
+
+def main():
+    """Build the card-name table, look names up, or normalize the card names of a cache."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Card-name canonicalization")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the card-name table from Scryfall oracle cards")
+    build.add_argument("--scryfall", help="Scryfall oracle-cards bulk file (default: download it)")
+    lookup = subparsers.add_parser("lookup", help="Print the canonical name of card spellings")
+    lookup.add_argument("names", nargs="+", help="Card names")
+    normalize = subparsers.add_parser("normalize", help="Normalize the card names of a cache directory")
+    normalize.add_argument("cache_dir", help="Cache directory (e.g. data-collection/raw-cache)")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with open(os.path.join(base_dir, "config", "sources.json"), 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        config = {}
+
+    if args.command == "build":
+        try:
+            names = build_table(_load_scryfall(args.scryfall))
+        except Exception as e:
+            logger.error(f"Cannot load Scryfall oracle cards: {e}")
+            return 1
+        path = table_path(config, base_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_json(path, {"version": TABLE_VERSION, "names": names})
+        logger.info(f"Card-name table written to {path} ({len(names)} names)")
+    elif args.command == "lookup":
+        table = card_name_table(config, base_dir)
+        for name in args.names:
+            print(f"{name} -> {table.canonical(name)}")
+    else:
+        normalize_cache(args.cache_dir, config)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Collection coverage of the raw cache for the MTG Analytics pipeline.
+A (source, format, day) is covered when a collection run recorded it in the
+cache manifest after collecting every tournament of that day. Caches filled
+before coverage was recorded fall back to the tournaments themselves: before
+the first coverage record of a source and format, a day with a cached
+tournament of that source and format counts as covered.
+
+Tournament sources, formats and dates are taken from the metadata recorded in
+the manifest with each file. Files written without metadata are identified
+from their header: the unified format writes these fields before the decks,
+so only the first bytes of the file are read and no deck is ever parsed.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+from datetime import datetime, timedelta
+
+from cache_manager import (
+    METADATA_FIELDS, atomic_write_json, is_cache_file, read_manifest, read_prefix, storage_variant
+)
+
+logger = logging.getLogger('coverage')
+
+# Collection sources, by the "source" field of their unified-format files
+SOURCES = {"MTGO": "mtgo", "MTGMelee": "mtgmelee", "Topdeck": "topdeck"}
+
+STATE_NAME = ".coverage.json"
+HEADER_BYTES = 4096
+HEADER_FIELD = re.compile(r'"(%s)"\s*:\s*("(?:[^"\\]|\\.)*"|null)' % "|".join(METADATA_FIELDS))
+
+def source_id(source):
+    """Return the collection source id of a unified-format source name."""
+    return SOURCES.get(source, (source or "").lower())
+
+def read_header(path):
+    """Read the metadata fields of a tournament file from its first bytes."""
+    text = read_prefix(path, HEADER_BYTES).decode("utf-8", errors="ignore")
+    # Fields after the decks (if any) belong to decks, not to the tournament
+    decks = text.find('"decks"')
+    if decks >= 0:
+        text = text[:decks]
+    metadata = {}
+    for field, value in HEADER_FIELD.findall(text):
+        metadata.setdefault(field, json.loads(value))
+    return metadata
+
+def manifest_metadata(cache_dir):
+    """Return ({name: metadata} of the cached tournaments, coverage records) from the manifest.
+
+    Archived tournaments stay in the result; evicted ones are removed.
+    """
+    begun = {}
+    files = {}
+    coverage = []
+    for record in read_manifest(cache_dir):
+        state = record.get("state")
+        if state == "begin":
+            begun[record["batch"]] = record["files"]
+        elif state == "commit":
+            for entry in begun.pop(record["batch"], []):
+                # A file rewritten without metadata (e.g. recompressed) keeps its previous metadata
+                previous = files.pop(storage_variant(entry["name"]), None)
+                files[entry["name"]] = entry.get("meta") or files.get(entry["name"]) or previous
+        elif state == "evict":
+            for name in record.get("names", []):
+                files.pop(name, None)
+        elif state == "coverage":
+            coverage.append(record)
+    return files, coverage
+
+def cached_tournaments(cache_dir):
+    """Return {name: metadata} for every tournament of a cache, reading headers only where needed."""
+    files, _ = manifest_metadata(cache_dir)
+    state_path = os.path.join(cache_dir, STATE_NAME)
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            known = json.load(f)
+    except (OSError, ValueError):
+        known = {}
+
+    headers = {}
+    for name in os.listdir(cache_dir):
+        if not is_cache_file(name) or files.get(name):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+            entry = known.get(name)
+            if not (entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size):
+                entry = {"mtime": stat.st_mtime, "size": stat.st_size, "meta": read_header(path)}
+        except (OSError, ValueError, ImportError) as e:
+            logger.warning(f"Cannot read the header of {path}: {e}")
+            continue
+        headers[name] = entry
+        files[name] = entry["meta"]
+
+    if headers != known:
+        atomic_write_json(state_path, headers, fsync=False)
+    return {name: metadata for name, metadata in files.items() if metadata}
+
+def collection_period(days=7, start_date=None, end_date=None):
+    """Return the (start, end) datetimes to collect: the last days, or an explicit inclusive date range."""
+    now = datetime.now()
+    if not start_date:
+        return now - timedelta(days=days), now
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else now
+    return start, min(end, now)
+
+def covered_range(start, end):
+    """Return the first and last whole days (ISO dates) of a collected period."""
+    first = start.date() if start.time() == datetime.min.time() else start.date() + timedelta(days=1)
+    last = end.date() - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+def _days(start_date, end_date):
+    """Return the ISO dates from start_date to end_date inclusive."""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+
+def covered_days(cache_dir):
+    """Return {(source, format): set of covered days} for a cache directory.
+
+    Days are covered by the coverage records of completed collections. The
+    days of cached tournaments only count before the first coverage record of
+    their (source, format), for caches written before coverage was recorded:
+    a later interrupted collection saves tournaments without covering their day.
+    """
+    covered = {}
+    if not os.path.isdir(cache_dir):
+        return covered
+    _, records = manifest_metadata(cache_dir)
+    recorded_since = {}
+    for record in records:
+        key = (record["source"], record["format"])
+        covered.setdefault(key, set()).update(_days(record["start"], record["end"]))
+        recorded_since[key] = min(record["start"], recorded_since.get(key, record["start"]))
+    for metadata in cached_tournaments(cache_dir).values():
+        if metadata.get("date") and metadata.get("format"):
+            key = (source_id(metadata.get("source")), metadata["format"].lower())
+            day = metadata["date"][:10]
+            if key not in recorded_since or day < recorded_since[key]:
+                covered.setdefault(key, set()).add(day)
+    return covered
+
+def missing_days(cache_dir, sources, format_name, start_date, end_date):
+    """Return the sorted (source, format, day) triples of the period that are not covered."""
+    format_name = format_name.lower()
+    # Days that have not happened yet cannot be collected
+    end_date = min(end_date, datetime.now().strftime("%Y-%m-%d"))
+    if start_date > end_date:
+        return []
+    covered = covered_days(cache_dir)
+    days = _days(start_date, end_date)
+    return [
+        (source, format_name, day)
+        for source in sources
+        for day in days
+        if day not in covered.get((source, format_name), ())
+    ]
+
+def gap_ranges(missing):
+    """Group missing (source, format, day) triples into {source: [(start, end), ...]} contiguous ranges."""
+    ranges = {}
+    for source, _, day in sorted(missing):
+        source_ranges = ranges.setdefault(source, [])
+        previous = (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+        if source_ranges and source_ranges[-1][1] == previous:
+            source_ranges[-1] = (source_ranges[-1][0], day)
+        else:
+            source_ranges.append((day, day))
+    return ranges
+
+def main():
+    """Print the coverage gaps of a format over a period."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Collection coverage of the raw cache")
+    parser.add_argument("--format", required=True, help="Game format (standard, modern, etc.)")
+    parser.add_argument("--start-date", required=True, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", required=True, help="End date (YYYY-MM-DD)")
+    parser.add_argument("--sources", default=",".join(SOURCES.values()), help="Comma-separated sources")
+    parser.add_argument("--cache-dir", help="Raw cache directory")
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw-cache")
+    missing = missing_days(cache_dir, args.sources.split(","), args.format, args.start_date, args.end_date)
+    print(json.dumps({source: ranges for source, ranges in gap_ranges(missing).items()}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Logging configuration shared by every entry point of the MTG Analytics pipeline.
+configure_logging() replaces the per-script logging.basicConfig calls:
+
+- records are put on an in-memory queue by the logging call and written by a
+  background listener thread, so collector threads never block on stdout or
+  stderr; messages logged with %-style arguments (or lazy() values) are only
+  formatted by the listener;
+- repetitive debug and info messages are rate limited per call site: the
+  first `burst` records of a call site in each `interval` seconds are kept,
+  then one in `sample_every`; the next record kept reports how many were
+  dropped, and counts still pending are written when logging shuts down.
+  Warnings and errors are always written: their f-string messages differ
+  even when they come from the same call site;
+- records are written as text, as before, or as one JSON object per line,
+  with any `extra` fields of the call.
+
+Settings come from the "logging" section of config/sources.json and can be
+overridden with the MTG_LOG_FORMAT and MTG_LOG_LEVEL environment variables,
+which subprocesses of the orchestrator inherit.
+"""
+
+import os
+import sys
+import json
+import atexit
+import logging
+import threading
+from queue import SimpleQueue
+from datetime import datetime, timezone
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_SETTINGS = {
+    "level": "INFO",
+    "format": "text",
+    "burst": 20,
+    "interval": 60,
+    "sample_every": 100
+}
+
+# Attributes of every LogRecord; other attributes come from the `extra` argument of the call
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "suppressed"}
+
+_state = {"listener": None, "handler": None, "filter": None, "registered": False}
+_lock = threading.Lock()
+
+class lazy:
+    """Value computed only if its record is written.
+
+    Example: logger.debug("Body: %.200s", lazy(getattr, response, "text"))
+    """
+
+    __slots__ = ("function", "args")
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def __str__(self):
+        return str(self.function(*self.args))
+
+class RateLimitFilter(logging.Filter):
+    """Keep the first `burst` records of a call site per `interval` seconds, then one in `sample_every`.
+
+    Only records below WARNING are limited.
+    """
+
+    def __init__(self, burst=20, interval=60, sample_every=100):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sample_every = sample_every
+        self.windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.burst or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            # Window of a call site: [start time, records seen, records dropped]
+            window = self.windows.get(key)
+            if window is None or record.created - window[0] >= self.interval:
+                window = self.windows[key] = [record.created, 0, window[2] if window else 0]
+            window[1] += 1
+            excess = window[1] - self.burst
+            if excess > 0 and not (self.sample_every and excess % self.sample_every == 0):
+                window[2] += 1
+                return False
+            if window[2]:
+                record.suppressed = window[2]
+                window[2] = 0
+        return True
+
+    def pending(self):
+        """Return and reset the (pathname, lineno, dropped count) of the call sites with dropped records."""
+        with self._lock:
+            pending = [(key[0], key[1], window[2]) for key, window in self.windows.items() if window[2]]
+            for window in self.windows.values():
+                window[2] = 0
+        return pending
+
+class TextFormatter(logging.Formatter):
+    """The pipeline's text format, noting the similar messages dropped before a record."""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} [{suppressed} similar messages suppressed]" if suppressed else text
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the `extra` fields of the logging call."""
+
+    def format(self, record):
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "location": f"{record.module}:{record.lineno}"
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if getattr(record, "suppressed", 0):
+            payload["suppressed"] = record.suppressed
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+def _settings(config=None):
+    """Return the logging settings of a configuration, or of config/sources.json."""
+    if config is None:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            with open(os.path.join(base_dir, "config", "sources.json"), 'r') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            config = {}
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get("logging", {}))
+    return settings
+
+def _set_root_handler(handler):
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+def configure_logging(stream=None, level=None, log_format=None, config=None):
+    """Route the logging of the process to stream (default: stdout) through a background thread.
+
+    Arguments take precedence over the environment variables, which take
+    precedence over the configuration. Calling it again replaces the previous setup.
+    """
+    from logging.handlers import QueueHandler, QueueListener
+
+    settings = _settings(config)
+    level = level or os.environ.get("MTG_LOG_LEVEL") or settings["level"]
+    log_format = log_format or os.environ.get("MTG_LOG_FORMAT") or settings["format"]
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter(LOG_FORMAT))
+
+    queue = SimpleQueue()
+    queue_handler = QueueHandler(queue)
+    # Records are consumed in this process: keep them as logged, the listener formats them
+    queue_handler.prepare = lambda record: record
+    rate_limit = RateLimitFilter(settings["burst"], settings["interval"], settings["sample_every"])
+    queue_handler.addFilter(rate_limit)
+
+    with _lock:
+        if _state["listener"]:
+            _state["listener"].stop()
+            _write_pending()
+        _set_root_handler(queue_handler)
+        logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+        listener = QueueListener(queue, handler, respect_handler_level=True)
+        listener.start()
+        _state.update(listener=listener, handler=handler, filter=rate_limit)
+        if not _state["registered"]:
+            atexit.register(shutdown_logging)
+            # A forked child has no listener thread: it writes directly
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=_direct_logging)
+            _state["registered"] = True
+
+def _direct_logging():
+    """Write records synchronously with the configured handler, without the listener thread."""
+    _state["listener"] = None
+    if _state["handler"]:
+        _set_root_handler(_state["handler"])
+
+def _write_pending():
+    """Write the counts of records dropped since the last record of their call site."""
+    if not (_state["filter"] and _state["handler"]):
+        return
+    for pathname, lineno, count in _state["filter"].pending():
+        message = f"{count} similar messages from {os.path.basename(pathname)}:{lineno} suppressed since the last one"
+        record = logging.LogRecord("log_setup", logging.INFO, pathname, lineno, message, None, None)
+        _state["handler"].handle(record)
+
+def shutdown_logging():
+    """Write the queued records and stop the listener; later records are written directly."""
+    with _lock:
+        if _state["listener"]:
+            _state["listener"].stop()
+            _write_pending()
+        _direct_logging()
@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Central collection scheduler for the MTG Analytics pipeline.
+The collectors of each source handle one format at a time, so collecting
+several formats left most of the rate budget of a host unused while another
+host was busy. The scheduler collects every (source, format, period) target
+of a run at once:
+
+- each source host has its own priority queue and a pool of workers sized to
+  the rate_limit of the source, and every pool works in parallel;
+- listing jobs run first and queue one fetch job per tournament they find;
+- fetch jobs are served most recent first, then largest first, so that an
+  interrupted run has collected the most useful events.
+
+A target is recorded as covered once its listing and all of its fetches have
+succeeded, exactly as the single-source collectors do.
+
+With --plan, the targets are only listed: the tournaments left to fetch are
+counted, and the requests, time and disk space their collection would take
+under the rate limits of each source are estimated.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import queue
+import logging
+import itertools
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+from cache_manager import CacheWriter, is_cached
+from coverage import (
+    SOURCES, cached_tournaments, collection_period, covered_days, covered_range, gap_ranges, missing_days, source_id
+)
+from log_setup import configure_logging
+
+logger = logging.getLogger('scheduler')
+
+SCRAPER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper")
+
+# Workers per request/second of rate_limit: a request spends about this many
+# seconds in flight, so fewer workers would leave the rate budget unused
+WORKERS_PER_RATE = 2
+
+# Job priorities; listings come first since they feed the fetch jobs
+LISTING = 0
+FETCH = 1
+STOP = 2
+
+# MTGO listings give no player counts: events are ranked by type, or by the size in their name
+MTGO_EVENT_SIZES = {"showcase": 128, "challenge": 64, "preliminary": 24, "league": 8}
+EVENT_SIZE = re.compile(r"\b(\d{2,3})\b")
+
+def rate_limited_seconds(requests, rate_limiter):
+    """Return the shortest time to send requests within the minute, hour and interval limits of a rate limiter."""
+    if requests <= 0:
+        return 0.0
+    per_minute = rate_limiter.requests_per_minute
+    if rate_limiter.min_interval:
+        per_minute = min(per_minute, 60 / rate_limiter.min_interval)
+    per_hour = rate_limiter.requests_per_hour
+    # Each hour lets per_hour requests through at the minute rate, then waits for the hour to end
+    hour_seconds = max(3600.0, per_hour / per_minute * 60)
+    full_hours, rest = divmod(requests, per_hour)
+    if rest == 0:
+        full_hours, rest = full_hours - 1, per_hour
+    return full_hours * hour_seconds + rest / per_minute * 60
+
+def cache_history(cache_dir):
+    """Return {(source, format): [tournaments, bytes, covered days]} of a cache, the basis of storage estimates."""
+    history = {}
+    if not os.path.isdir(cache_dir):
+        return history
+    for (source, format_name), days in covered_days(cache_dir).items():
+        history[(source, format_name)] = [0, 0, len(days)]
+    for name, metadata in cached_tournaments(cache_dir).items():
+        path = os.path.join(cache_dir, name)
+        if not metadata.get("format") or not os.path.exists(path):
+            continue
+        entry = history.setdefault((source_id(metadata.get("source")), metadata["format"].lower()), [0, 0, 0])
+        entry[0] += 1
+        entry[1] += os.path.getsize(path)
+    return history
+
+def _add(totals, key, value):
+    """Add value to totals[key]; an unknown (None) value makes the total unknown."""
+    totals[key] = None if value is None or totals[key] is None else totals[key] + value
+
+def log_plan(plan, plan_logger=None):
+    """Log the estimates of a collection plan, one line per source, then the totals."""
+    plan_logger = plan_logger or logger
+    for source, estimate in plan.items():
+        tournaments = "?" if estimate["tournaments"] is None else estimate["tournaments"]
+        size = "unknown size" if estimate["bytes"] is None else f"{estimate['bytes'] / 1e6:.1f} MB"
+        plan_logger.info(f"{source}: {tournaments} tournaments to fetch ({estimate['cached']} already cached), "
+                         f"{estimate['requests']} requests, {estimate['seconds'] / 3600:.2f} h at the current rate "
+                         f"limits, {size}; {estimate['listing_requests']} listing requests, "
+                         f"{estimate['listing_failures']} listing failures, "
+                         f"{estimate['truncated']} truncated listings.")
+    requests = sum(estimate["requests"] for estimate in plan.values())
+    # Sources are collected in parallel: the slowest one sets the duration
+    seconds = max((estimate["seconds"] for estimate in plan.values()), default=0)
+    sizes = [estimate["bytes"] for estimate in plan.values()]
+    size = "unknown size" if None in sizes else f"{sum(sizes) / 1e6:.1f} MB"
+    plan_logger.info(f"Total: {requests} requests, {seconds / 3600:.2f} h, {size}.")
+
+def _date_priority(date):
+    """Return the sort key placing recent dates first and unknown dates last."""
+    try:
+        return -datetime.strptime((date or "")[:10], "%Y-%m-%d").toordinal()
+    except ValueError:
+        return 0
+
+class Target:
+    """A (source, format, period) to collect; pending counts its listing and fetch jobs."""
+
+    def __init__(self, source, format_name, start_date, end_date):
+        self.source = source
+        self.format_name = format_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.pending = 1
+        self.failed = False
+        # A listing may be truncated, leaving tournaments out of the period
+        self.complete = True
+
+    def __repr__(self):
+        return f"{self.source}/{self.format_name} {self.start_date:%Y-%m-%d} to {self.end_date:%Y-%m-%d}"
+
+class MTGOSource:
+    """Listing and fetch jobs of MTGO; one listing serves every format of a period."""
+
+    name = "mtgo"
+
+    def __init__(self, refresh=False):
+        sys.path.insert(0, os.path.join(SCRAPER_DIR, "mtgo"))
+        from mtgo_client import MTGOClient
+        self.client = MTGOClient()
+
+    def listing_groups(self, targets):
+        """Group the targets sharing a period, which share their listing pages."""
+        groups = {}
+        for target in targets:
+            groups.setdefault((target.start_date, target.end_date), []).append(target)
+        return list(groups.values())
+
+    def list(self, targets):
+        """Return {target: fetch jobs} for a group of targets of the same period."""
+        events, failed = self.client.list_events(targets[0].start_date, targets[0].end_date)
+        jobs = {}
+        for target in targets:
+            # Listing pages that could not be read leave the period uncovered
+            target.failed = target.failed or bool(failed)
+            jobs[target] = [
+                {"name": self.client.output_name(event), "date": event["date"], "size": self._size(event),
+                 "run": lambda writer, event=event: self.fetch(event, writer)}
+                for event in self.client.filter_events(events, target.format_name)
+            ]
+        return jobs
+
+    @property
+    def rate_limiter(self):
+        return self.client.http.rate_limiter
+
+    def fetch_requests(self, job):
+        """Return the requests of a fetch job: its event page."""
+        return 1
+
+    def _size(self, event):
+        """Estimate the number of players of an event from its name."""
+        name = event["name"].lower()
+        match = EVENT_SIZE.search(name)
+        if match:
+            return int(match.group(1))
+        return next((size for kind, size in MTGO_EVENT_SIZES.items() if kind in name), 0)
+
+    def fetch(self, event, writer):
+        """Fetch and save an event; return (saved, skipped, failed) counts."""
+        event_data = self.client.get_event_data(event)
+        if event_data and self.client.save_event_data(event_data, writer=writer):
+            return 1, 0, 0
+        logger.error(f"Failed to retrieve event {event['url']}.")
+        return 0, 0, 1
+
+class MTGMeleeSource:
+    """Listing and fetch jobs of MTGMelee."""
+
+    name = "mtgmelee"
+
+    def __init__(self, refresh=False):
+        sys.path.insert(0, os.path.join(SCRAPER_DIR, "mtgmelee"))
+        from mtgmelee_client import MTGMeleeClient
+        self.client = MTGMeleeClient()
+        if not self.client.authenticate():
+            logger.warning("MTGMelee authentication failed. Using API without authentication.")
+
+    def listing_groups(self, targets):
+        return [[target] for target in targets]
+
+    def list(self, targets):
+        """Return {target: fetch jobs}, or None when the listing failed."""
+        target = targets[0]
+        tournaments, target.complete = self.client.list_tournaments(
+            target.format_name, target.start_date, target.end_date
+        )
+        if tournaments is None:
+            return None
+        return {target: [
+            {"name": f"mtgmelee-{tournament['id']}.json",
+             "date": tournament.get("startDate") or tournament.get("date"),
+             "size": tournament.get("playerCount") or tournament.get("players") or 0,
+             "run": lambda writer, tournament_id=tournament["id"]: self.fetch(tournament_id, writer)}
+            for tournament in tournaments if tournament.get("id")
+        ]}
+
+    @property
+    def rate_limiter(self):
+        return self.client.http.rate_limiter
+
+    def fetch_requests(self, job):
+        """Return the requests of a fetch job: details, standings, pairings and decklist index, then each decklist."""
+        return 4 + job["size"]
+
+    def fetch(self, tournament_id, writer):
+        """Fetch and save a tournament; return (saved, skipped, failed) counts."""
+        tournament_data = self.client.get_tournament_data(tournament_id)
+        if tournament_data and self.client.save_tournament_data(tournament_data, writer=writer):
+            return 1, 0, 0
+        logger.error(f"Failed to retrieve tournament {tournament_id}.")
+        return 0, 0, 1
+
+class TopdeckSource:
+    """Page jobs of Topdeck.gg; the API returns whole tournaments, so a page is listed and fetched at once."""
+
+    name = "topdeck"
+
+    def __init__(self, refresh=False):
+        sys.path.insert(0, os.path.join(SCRAPER_DIR, "topdeck"))
+        from topdeck_client import TopdeckClient
+        self.client = TopdeckClient()
+        self.refresh = refresh
+
+    def listing_groups(self, targets):
+        return [[target] for target in targets]
+
+    def list(self, targets):
+        """Return {target: page jobs}, or None without an API key."""
+        if not self.client.api_key:
+            logger.error("Topdeck API key not available.")
+            return None
+        target = targets[0]
+        return {target: [
+            # Pages hold several tournaments, known only once streamed
+            {"name": None, "date": f"{page[1]:%Y-%m-%d}", "size": 0,
+             "run": lambda writer, page=page: self.client.collect_page(target.format_name, page, writer, self.refresh)}
+            for page in self.client.pages(target.start_date, target.end_date)
+        ]}
+
+    @property
+    def rate_limiter(self):
+        return self.client.http.rate_limiter
+
+    def fetch_requests(self, job):
+        """Return the requests of a page job: the page is streamed from a single request."""
+        return 1
+
+SOURCE_TYPES = {source.name: source for source in (MTGOSource, MTGMeleeSource, TopdeckSource)}
+
+class CollectionScheduler:
+    """Collect targets of several sources and formats through per-host prioritized worker pools."""
+
+    def __init__(self, output_dir, config, refresh=False):
+        self.output_dir = output_dir
+        self.config = config
+        self.refresh = refresh
+        self.targets = []
+        self.stats = {}
+        self.writer = None
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def add_target(self, source, format_name, start_date, end_date):
+        """Add a (source, format, period) to collect; dates are datetimes as returned by collection_period."""
+        if source not in SOURCE_TYPES:
+            raise ValueError(f"Unknown collection source: {source}")
+        self.targets.append(Target(source, format_name.lower(), start_date, end_date))
+
+    def host(self, source):
+        """Return the host a source is fetched from."""
+        return urlparse(self.config.get(source, {}).get("base_url", "")).netloc or source
+
+    def pool_size(self, source):
+        """Return the number of workers of a source, from its rate_limit in requests per second."""
+        scraping_config = self.config.get(source, {}).get("scraping_config", {})
+        if scraping_config.get("workers"):
+            return scraping_config["workers"]
+        return max(1, math.ceil((scraping_config.get("rate_limit") or 1) * WORKERS_PER_RATE))
+
+    def _submit(self, jobs, priority, job):
+        # The sequence number keeps equal priorities in submission order
+        jobs.put((priority, next(self._sequence), job))
+
+    def _count(self, source, key, value=1):
+        with self._lock:
+            stats = self.stats[source]
+            stats[key] += value
+
+    def _finish(self, target, failed=False):
+        """Account for a finished job of a target, recording its coverage after its last job."""
+        with self._lock:
+            target.pending -= 1
+            target.failed = target.failed or failed
+            done = target.pending == 0
+        if done and not target.failed and target.complete:
+            # Coverage is only recorded once the target's files are committed
+            self.writer.flush()
+            self.writer.record_coverage(target.source, target.format_name,
+                                        *covered_range(target.start_date, target.end_date))
+            self._count(target.source, "covered")
+
+    def _is_saved(self, job):
+        """Tell whether the tournament of a fetch job is in the cache; cached tournaments are final once published."""
+        return bool(job["name"]) and not self.refresh and is_cached(self.output_dir, job["name"])
+
+    def _list(self, source, targets):
+        """Return {target: fetch jobs} of a group of targets, or None when the listing failed."""
+        try:
+            return source.list(targets)
+        except (OSError, ValueError) as e:
+            logger.error(f"Listing failed for {targets}: {e}")
+            return None
+        except Exception as e:
+            logger.exception(f"Unexpected error listing {targets}: {e}")
+            return None
+
+    def _run_listing(self, jobs, source, targets):
+        """List a group of targets and queue their fetch jobs."""
+        listed = self._list(source, targets)
+        if listed is None:
+            self._count(source.name, "listing_failures")
+            for target in targets:
+                self._finish(target, failed=True)
+            return
+        if any(target.failed for target in targets):
+            self._count(source.name, "listing_failures")
+
+        for target in targets:
+            if not target.complete:
+                # Its tournaments are collected, but the period stays uncovered
+                self._count(source.name, "truncated")
+            fetches = []
+            for job in listed.get(target, []):
+                if self._is_saved(job):
+                    self._count(source.name, "skipped")
+                else:
+                    fetches.append(job)
+            with self._lock:
+                target.pending += len(fetches)
+            logger.info(f"{target}: {len(fetches)} jobs queued.")
+            for job in fetches:
+                self._submit(jobs, (FETCH, _date_priority(job["date"]), -job["size"]), ("fetch", target, job))
+            self._finish(target)
+
+    def _run_fetch(self, source, target, job):
+        """Run a fetch job of a target."""
+        try:
+            saved, skipped, failed = job["run"](self.writer)
+        except (OSError, ValueError) as e:
+            logger.error(f"Fetch failed for {target}: {e}")
+            saved, skipped, failed = 0, 0, 1
+        self._count(source.name, "saved", saved)
+        self._count(source.name, "skipped", skipped)
+        self._count(source.name, "failed", failed)
+        self._finish(target, failed=failed > 0)
+
+    def _work(self, jobs, sources):
+        """Serve the jobs of a host queue until stopped."""
+        while True:
+            _, _, (kind, item, job) = jobs.get()
+            try:
+                if kind == "stop":
+                    return
+                if kind == "listing":
+                    self._run_listing(jobs, sources[item[0].source], item)
+                else:
+                    self._run_fetch(sources[item.source], item, job)
+            except Exception as e:
+                # A worker must not die with jobs left in its queue; the job counts as failed
+                logger.exception(f"Unexpected error in collection job: {e}")
+                targets = item if kind == "listing" else [item]
+                for target in targets:
+                    target.failed = True
+                self._count(targets[0].source, "listing_failures" if kind == "listing" else "failed")
+            finally:
+                jobs.task_done()
+
+    def _targets_by_source(self):
+        by_source = {}
+        for target in self.targets:
+            by_source.setdefault(target.source, []).append(target)
+        return by_source
+
+    def plan(self):
+        """List every target and estimate the cost of collecting it, without fetching any tournament.
+
+        Returns {source: estimate}: the tournaments left to fetch and those
+        already cached, the requests spent listing, the fetch requests and the
+        seconds they take within the rate limits of the source, and the bytes
+        the new files would take, estimated from the cache (None without history).
+        Failed and truncated listings leave tournaments out of the estimates.
+        """
+        history = cache_history(self.output_dir)
+        plan = {}
+        for name, targets in self._targets_by_source().items():
+            source = SOURCE_TYPES[name](self.refresh)
+            estimate = {"targets": len(targets), "tournaments": 0, "cached": 0, "listing_failures": 0,
+                        "truncated": 0, "requests": 0, "seconds": 0.0, "bytes": 0}
+            for group in source.listing_groups(targets):
+                listed = self._list(source, group)
+                if listed is None or any(target.failed for target in group):
+                    estimate["listing_failures"] += 1
+                for target, jobs in (listed or {}).items():
+                    # A truncated listing leaves tournaments out of the estimate
+                    estimate["truncated"] += not target.complete
+                    fetches = [job for job in jobs if not self._is_saved(job)]
+                    estimate["cached"] += len(jobs) - len(fetches)
+                    estimate["requests"] += sum(source.fetch_requests(job) for job in fetches)
+                    tournaments = self._estimate_tournaments(target, fetches, history)
+                    file_bytes = self._estimate_file_bytes(target, history)
+                    _add(estimate, "tournaments", tournaments)
+                    _add(estimate, "bytes", None if tournaments is None or file_bytes is None
+                         else round(tournaments * file_bytes))
+            estimate["listing_requests"] = source.client.get_run_summary()["requests"]
+            estimate["seconds"] = round(rate_limited_seconds(estimate["requests"], source.rate_limiter))
+            plan[name] = estimate
+        return plan
+
+    def _estimate_tournaments(self, target, fetches, history):
+        """Return the tournaments of a target's fetch jobs, or None if unknown.
+
+        Page jobs hold an unknown number of tournaments: they are estimated from
+        the tournaments per day of the days the cache covers.
+        """
+        named = sum(1 for job in fetches if job["name"])
+        if named == len(fetches):
+            return named
+        tournaments, _, days = history.get((target.source, target.format_name), (0, 0, 0))
+        if not days:
+            return None
+        period_days = max(1, (target.end_date - target.start_date).days)
+        return named + round(tournaments / days * period_days)
+
+    def _estimate_file_bytes(self, target, history):
+        """Return the average size of a cached tournament of the target's source and format, or of its source."""
+        tournaments, size, _ = history.get((target.source, target.format_name), (0, 0, 0))
+        if not tournaments:
+            entries = [entry for (source, _), entry in history.items() if source == target.source]
+            tournaments, size = sum(entry[0] for entry in entries), sum(entry[1] for entry in entries)
+        return size / tournaments if tournaments else None
+
+    def run(self):
+        """Collect every target; return {source: stats}."""
+        by_source = self._targets_by_source()
+
+        sources = {}
+        for name, targets in by_source.items():
+            sources[name] = SOURCE_TYPES[name](self.refresh)
+            self.stats[name] = {"targets": len(targets), "covered": 0, "saved": 0, "skipped": 0, "failed": 0,
+                                "listing_failures": 0, "truncated": 0}
+
+        # Sources sharing a host share its queue and rate budget
+        pools = {}
+        for name in sources:
+            host = self.host(name)
+            jobs, size = pools.get(host, (None, 0))
+            pools[host] = (jobs or queue.PriorityQueue(), max(size, self.pool_size(name)))
+
+        with CacheWriter.from_config(self.output_dir, self.config) as writer:
+            self.writer = writer
+            for name, targets in by_source.items():
+                jobs = pools[self.host(name)][0]
+                for group in sources[name].listing_groups(targets):
+                    self._submit(jobs, (LISTING,), ("listing", group, None))
+
+            workers = []
+            for host, (jobs, size) in pools.items():
+                logger.info(f"{host}: {size} workers.")
+                for _ in range(size):
+                    worker = threading.Thread(target=self._work, args=(jobs, sources), daemon=True)
+                    worker.start()
+                    workers.append(worker)
+
+            # Listings queue their fetches before completing, so an empty queue means the host is done
+            for jobs, size in pools.values():
+                jobs.join()
+                for _ in range(size):
+                    self._submit(jobs, (STOP,), ("stop", None, None))
+            for worker in workers:
+                worker.join()
+
+        for name, source in sources.items():
+            self.stats[name]["requests"] = source.client.get_run_summary()
+        return self.stats
+
+def main():
+    """Collect several formats and sources in one scheduled run."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prioritized collection across formats and sources")
+    parser.add_argument("--formats", help="Comma-separated formats (default: every supported format)")
+    parser.add_argument("--sources", help="Comma-separated sources (default: every enabled source)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to retrieve")
+    parser.add_argument("--start-date", help="Retrieve a date range instead of the last days (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last day of the date range (YYYY-MM-DD, default: today)")
+    parser.add_argument("--targets", help="JSON list of [source, format, start_date, end_date] to collect instead")
+    parser.add_argument("--output-dir", help="Output directory for data")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Collect the whole period, overwriting tournaments already saved")
+    parser.add_argument("--json", action="store_true", help="Print the run statistics as JSON on stdout")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only list the targets and estimate the requests, time and storage of their collection")
+    args = parser.parse_args()
+
+    # With --json, stdout carries the statistics only
+    configure_logging(sys.stderr if args.json else sys.stdout)
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config_path = os.path.join(base_dir, "config", "sources.json")
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Cannot load configuration file {config_path}: {e}")
+        return 1
+    output_dir = args.output_dir or os.path.join(base_dir, "data-collection", "raw-cache")
+
+    scheduler = CollectionScheduler(output_dir, config, args.refresh)
+    if args.targets:
+        for source, format_name, start_date, end_date in json.loads(args.targets):
+            scheduler.add_target(source, format_name, *collection_period(start_date=start_date, end_date=end_date))
+    else:
+        formats = args.formats.split(",") if args.formats else list(config.get("formats_supported", {}))
+        sources = args.sources.split(",") if args.sources else [
+            source for source in SOURCES.values() if config.get(source, {}).get("status") != "disabled"
+        ]
+        start_date, end_date = collection_period(args.days, args.start_date, args.end_date)
+        first_day, last_day = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        for format_name in formats:
+            if args.refresh:
+                for source in sources:
+                    scheduler.add_target(source, format_name, start_date, end_date)
+                continue
+            # Only the days the cache does not cover yet are collected
+            missing = missing_days(output_dir, sources, format_name, first_day, last_day)
+            for source, ranges in gap_ranges(missing).items():
+                for range_start, range_end in ranges:
+                    scheduler.add_target(source, format_name,
+                                         *collection_period(start_date=range_start, end_date=range_end))
+
+    if not scheduler.targets:
+        logger.info("Cached data covers the whole period. Nothing to collect.")
+    if args.plan:
+        plan = scheduler.plan()
+        log_plan(plan)
+        if args.json:
+            print(json.dumps(plan))
+        return 1 if any(estimate["listing_failures"] or estimate["truncated"] for estimate in plan.values()) else 0
+
+    stats = scheduler.run()
+    for source, source_stats in stats.items():
+        logger.info(f"{source}: {source_stats['saved']} tournaments saved, {source_stats['skipped']} already saved, "
+                    f"{source_stats['failed']} failures, {source_stats['truncated']} truncated listings, "
+                    f"{source_stats['covered']}/{source_stats['targets']} targets covered.")
+    if args.json:
+        print(json.dumps(stats))
+
+    failed = any(source_stats["failed"] or source_stats["listing_failures"] or source_stats["truncated"]
+                 for source_stats in stats.values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
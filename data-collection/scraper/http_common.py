@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HTTP infrastructure shared by the MTG Analytics collectors.
+Rate limiting, retry policy, per-host circuit breaking and a thread-safe HTTP
+client, so that every source is fetched with the same concurrency, retry and
+rate-limit behavior.
+"""
+
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlparse
+
+# requests is imported by the methods that send HTTP calls, so that importing
+# a collector (e.g. for planning or --help) does not pay for it.
+logger = logging.getLogger('http_common')
+
+class RateLimiter:
+    """Rate limit manager, safe to share between threads."""
+
+    def __init__(self, requests_per_minute=60, requests_per_hour=1000, min_interval=0.0):
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_hour = requests_per_hour
+        self.min_interval = min_interval
+        self.minute_requests = []
+        self.hour_requests = []
+        self._lock = threading.Lock()
+
+    def _delay(self, current_time):
+        """Return how long to wait before the next request may be sent."""
+        self.minute_requests = [t for t in self.minute_requests if current_time - t < 60]
+        self.hour_requests = [t for t in self.hour_requests if current_time - t < 3600]
+
+        delay = 0.0
+        if self.minute_requests and self.min_interval:
+            delay = max(delay, self.min_interval - (current_time - self.minute_requests[-1]))
+        if len(self.minute_requests) >= self.requests_per_minute:
+            delay = max(delay, 60 - (current_time - self.minute_requests[-self.requests_per_minute]))
+        if len(self.hour_requests) >= self.requests_per_hour:
+            delay = max(delay, 3600 - (current_time - self.hour_requests[-self.requests_per_hour]))
+        return delay
+
+    def wait_if_needed(self):
+        """Wait if necessary to respect rate limits."""
+        with self._lock:
+            delay = self._delay(time.time())
+        if delay > 1:
+            logger.info(f"Rate limit reached. Waiting {delay:.2f} seconds.")
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_request(self):
+        """Record a request."""
+        with self._lock:
+            current_time = time.time()
+            self.minute_requests.append(current_time)
+            self.hour_requests.append(current_time)
+
+    def acquire(self):
+        """Wait for a free slot and claim it, so concurrent threads never exceed the limits."""
+        while True:
+            with self._lock:
+                current_time = time.time()
+                delay = self._delay(current_time)
+                if delay <= 0:
+                    self.minute_requests.append(current_time)
+                    self.hour_requests.append(current_time)
+                    return
+            time.sleep(delay)
+
+class RetryPolicy:
+    """Retry policy (status classification and backoff)."""
+
+    # Transient statuses worth retrying; any other 4xx is permanent
+    RETRYABLE_STATUSES = {408, 425, 429}
+
+    def __init__(self, base_delay=5, max_delay=60):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, status_code):
+        """Return True if a request failing with this status may succeed later."""
+        return status_code in self.RETRYABLE_STATUSES or status_code >= 500
+
+    def next_delay(self, previous_delay=None):
+        """Return the next wait time using decorrelated jitter."""
+        previous_delay = previous_delay or self.base_delay
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def retry_after(self, response):
+        """Return the delay requested by the server through Retry-After, if any."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(self.max_delay, max(0.0, float(value)))
+        except ValueError:
+            return None
+
+class CircuitBreaker:
+    """Per-host circuit breaker pausing requests to a failing source."""
+
+    def __init__(self, failure_threshold=5, recovery_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        return self.hosts.setdefault(host, {"failures": 0, "opened_at": None})
+
+    def allow_request(self, host):
+        """Return True if a request to the host may be sent."""
+        with self._lock:
+            state = self._state(host)
+            if state["opened_at"] is None:
+                return True
+            if time.time() - state["opened_at"] >= self.recovery_timeout:
+                # Half-open: let one trial request through
+                state["opened_at"] = time.time()
+                return True
+            return False
+
+    def is_open(self, host):
+        """Return True if the circuit for the host is currently open."""
+        with self._lock:
+            return self._state(host)["opened_at"] is not None
+
+    def record_success(self, host):
+        """Close the circuit after a successful request."""
+        with self._lock:
+            state = self._state(host)
+            state["failures"] = 0
+            state["opened_at"] = None
+
+    def record_failure(self, host):
+        """Record a failed request and open the circuit past the threshold."""
+        with self._lock:
+            state = self._state(host)
+            state["failures"] += 1
+            if state["failures"] >= self.failure_threshold and state["opened_at"] is None:
+                state["opened_at"] = time.time()
+                logger.warning(f"Circuit opened for {host} after {state['failures']} consecutive failures. "
+                               f"Pausing requests for {self.recovery_timeout} seconds.")
+
+def log_run_summary(client, log=logger):
+    """Log request statistics collected by a client during the run."""
+    summary = client.get_run_summary()
+    log.info(
+        f"Requests: {summary['requests']} sent, {summary['retries']} retries, "
+        f"{summary['fatal_errors']} non-retryable errors, {summary['short_circuited']} skipped by circuit breaker."
+    )
+    if summary["time_saved"]:
+        log.info(f"Time saved by retry classification and circuit breaker: {summary['time_saved']:.2f} seconds "
+                 f"of skipped retry waits and requests.")
+    if summary["open_circuits"]:
+        log.warning(f"Circuits still open at end of run: {', '.join(summary['open_circuits'])}")
+
+def rate_limiter_from_config(scraping_config):
+    """Build a rate limiter from a source's scraping_config (rate_limit in requests per second)."""
+    rate_limit = scraping_config.get("rate_limit") or 1
+    return RateLimiter(
+        requests_per_minute=max(1, int(rate_limit * 60)),
+        requests_per_hour=scraping_config.get("requests_per_hour", max(1, int(rate_limit * 3600))),
+        min_interval=1.0 / rate_limit
+    )
+
+class HttpClient:
+    """Thread-safe HTTP client applying a shared rate limiter, retry policy and circuit breaker."""
+
+    def __init__(self, rate_limiter, retry_policy=None, circuit_breaker=None, max_retries=3, timeout=30,
+                 headers=None):
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.request_stats = {
+            "requests": 0,
+            "retries": 0,
+            "fatal_errors": 0,
+            "short_circuited": 0,
+            "time_saved": 0.0
+        }
+
+    @classmethod
+    def from_config(cls, scraping_config, headers=None):
+        """Build a client from a source's scraping_config in sources.json."""
+        headers = dict(headers or {})
+        if scraping_config.get("user_agent"):
+            headers.setdefault("User-Agent", scraping_config["user_agent"])
+        breaker_config = scraping_config.get("circuit_breaker", {})
+        return cls(
+            rate_limiter_from_config(scraping_config),
+            RetryPolicy(scraping_config.get("retry_delay", 5), scraping_config.get("max_retry_delay", 60)),
+            CircuitBreaker(breaker_config.get("failure_threshold", 5), breaker_config.get("recovery_timeout", 60)),
+            scraping_config.get("retry_attempts", 3),
+            scraping_config.get("timeout", 30),
+            headers
+        )
+
+    def _session(self):
+        """Return the requests session of the current thread."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.request_stats[key] += value
+
+    def _skipped_retries(self, attempts, request_time):
+        """Return the time the given number of skipped attempts would have taken.
+
+        Each skipped attempt counts the minimum backoff wait before it plus
+        request_time, the duration of the request it would have sent.
+        """
+        return attempts * (self.retry_policy.base_delay + request_time)
+
+    def get(self, url, params=None, headers=None, stream=False):
+        """Send a GET request with retries; return the response, or None on failure."""
+        return self.request("GET", url, params=params, headers=headers, stream=stream)
+
+    def request(self, method, url, params=None, json=None, headers=None, stream=False, on_unauthorized=None):
+        """Send a request with retries; return the response, or None on failure.
+
+        on_unauthorized, if given, is called once when the server answers 401:
+        it returns the headers of renewed credentials, and the request is sent
+        again with them without using a retry attempt, or None to give up.
+        """
+        import requests
+        host = urlparse(url).netloc
+
+        if not self.circuit_breaker.allow_request(host):
+            # A full retry cycle against a failing host: every attempt timing out
+            self._count("short_circuited")
+            self._count("time_saved", self._skipped_retries(self.max_retries, self.timeout)
+                        - self.retry_policy.base_delay)
+            logger.warning(f"Circuit open for {host}. Skipping request to {url}.")
+            return None
+
+        delay = None
+        attempt = 0
+        while attempt < self.max_retries:
+            retry_after = None
+            try:
+                self.rate_limiter.acquire()
+                started = time.time()
+                response = self._session().request(method, url, params=params, json=json, headers=headers,
+                                                   timeout=self.timeout, stream=stream)
+                self._count("requests")
+
+                if response.status_code == 200:
+                    self.circuit_breaker.record_success(host)
+                    return response
+                response.close()
+                if response.status_code == 401 and on_unauthorized is not None:
+                    renewed = on_unauthorized()
+                    on_unauthorized = None
+                    if renewed is None:
+                        logger.error(f"Authentication failed for {url}.")
+                        return None
+                    headers = dict(headers or {}, **renewed)
+                    continue
+                if not self.retry_policy.is_retryable(response.status_code):
+                    # Permanent error (404, 403...): retrying cannot succeed
+                    logger.error(f"HTTP error {response.status_code} for {url}. Not retryable.")
+                    self.circuit_breaker.record_success(host)
+                    self._count("fatal_errors")
+                    self._count("time_saved", self._skipped_retries(self.max_retries - attempt - 1,
+                                                                    time.time() - started))
+                    return None
+                logger.error(f"HTTP error {response.status_code} for {url}.")
+                self.circuit_breaker.record_failure(host)
+                retry_after = self.retry_policy.retry_after(response)
+            except requests.RequestException as e:
+                logger.error(f"Request error for {url}: {str(e)}")
+                self.circuit_breaker.record_failure(host)
+
+            if self.circuit_breaker.is_open(host):
+                logger.warning(f"Circuit open for {host}. Abandoning retries for {url}.")
+                self._count("time_saved", self._skipped_retries(self.max_retries - attempt - 1, self.timeout))
+                return None
+
+            # Wait before retrying
+            if attempt < self.max_retries - 1:
+                delay = self.retry_policy.next_delay(delay)
+                wait_time = max(delay, retry_after or 0)
+                self._count("retries")
+                logger.info(f"Retrying {url} in {wait_time:.2f} seconds...")
+                time.sleep(wait_time)
+            attempt += 1
+
+        logger.error(f"Failed after {self.max_retries} attempts: {url}")
+        return None
+
+    def get_text(self, url, params=None, headers=None):
+        """Return the body of a GET request as text, or None on failure."""
+        response = self.get(url, params, headers)
+        return response.text if response is not None else None
+
+    def get_run_summary(self):
+        """Return request statistics for the current run."""
+        with self._stats_lock:
+            summary = dict(self.request_stats)
+        summary["time_saved"] = round(summary["time_saved"], 2)
+        summary["open_circuits"] = [
+            host for host in self.circuit_breaker.hosts if self.circuit_breaker.is_open(host)
+        ]
+        return summary
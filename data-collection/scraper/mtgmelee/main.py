@@ -3,32 +3,38 @@
 
 """
 Main script for collecting data from MTGMelee.
+With --plan, only lists the tournaments of the days the cache does not cover
+and estimates the requests, time and storage their collection would take.
 """
 
 import os
 import sys
 import argparse
 import logging
+from datetime import timedelta
 from mtgmelee_client import MTGMeleeClient
+from http_common import log_run_summary
+from cache_manager import CacheWriter
+from coverage import collection_period, covered_range, gap_ranges, missing_days
+from log_setup import configure_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger('mtgmelee_main')
 
 def main():
     parser = argparse.ArgumentParser(description="Data collection from MTGMelee")
     parser.add_argument("--format", help="Game format (standard, modern, etc.)")
     parser.add_argument("--days", type=int, default=7, help="Number of days to retrieve")
+    parser.add_argument("--start-date", help="Retrieve a date range instead of the last days (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last day of the date range (YYYY-MM-DD, default: today)")
     parser.add_argument("--tournament", type=int, help="Tournament ID to retrieve")
     parser.add_argument("--output-dir", help="Output directory for data")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only list the tournaments to collect and estimate the requests, time and storage")
     args = parser.parse_args()
     
+    # Configure logging
+    configure_logging()
+    
     # Determine output directory
     output_dir = args.output_dir
     if not output_dir:
@@ -37,6 +43,12 @@ def main():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
         output_dir = os.path.join(base_dir, "data-collection", "raw-cache")
     
+    if args.plan:
+        if not args.format:
+            logger.error("Please specify a format to plan.")
+            return 1
+        return plan_collection(args, output_dir)
+    
     # Create MTGMelee client
     client = MTGMeleeClient()
     
@@ -59,32 +71,42 @@ def main():
                 logger.error(f"Failed to save tournament {args.tournament}.")
         else:
             logger.error(f"Failed to retrieve tournament {args.tournament}.")
+            log_run_summary(client, logger)
             return 1
+        log_run_summary(client, logger)
     elif args.format:
-        logger.info(f"Retrieving {args.format} tournaments from the last {args.days} days...")
-        tournaments = client.get_recent_tournaments(args.format, args.days)
+        start_date, end_date = collection_period(args.days, args.start_date, args.end_date)
+        logger.info(f"Retrieving {args.format} tournaments from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}...")
+        tournaments, complete = client.list_tournaments(args.format, start_date, end_date)
         if tournaments:
             success_count = 0
             failure_count = 0
             
-            for tournament in tournaments:
-                tournament_id = tournament.get("id")
-                if tournament_id:
-                    logger.info(f"Retrieving tournament {tournament_id}...")
-                    tournament_data = client.get_tournament_data(tournament_id)
-                    if tournament_data:
-                        success = client.save_tournament_data(tournament_data, output_dir)
-                        if success:
-                            logger.info(f"Tournament {tournament_id} successfully saved.")
-                            success_count += 1
+            # Tournaments are written atomically in batches, committed to the cache manifest
+            with CacheWriter.from_config(output_dir, client.config) as writer:
+                for tournament in tournaments:
+                    tournament_id = tournament.get("id")
+                    if tournament_id:
+                        logger.info(f"Retrieving tournament {tournament_id}...")
+                        tournament_data = client.get_tournament_data(tournament_id)
+                        if tournament_data:
+                            success = client.save_tournament_data(tournament_data, writer=writer)
+                            if success:
+                                logger.info(f"Tournament {tournament_id} successfully saved.")
+                                success_count += 1
+                            else:
+                                logger.error(f"Failed to save tournament {tournament_id}.")
+                                failure_count += 1
                         else:
-                            logger.error(f"Failed to save tournament {tournament_id}.")
+                            logger.error(f"Failed to retrieve tournament {tournament_id}.")
                             failure_count += 1
-                    else:
-                        logger.error(f"Failed to retrieve tournament {tournament_id}.")
-                        failure_count += 1
+                
+                # A truncated listing may have left tournaments out of the period
+                if failure_count == 0 and complete:
+                    writer.record_coverage("mtgmelee", args.format, *covered_range(start_date, end_date))
             
             logger.info(f"Retrieval completed: {success_count} tournaments saved, {failure_count} failures.")
+            log_run_summary(client, logger)
             
             if failure_count > 0:
                 return 1
@@ -98,5 +120,25 @@ def main():
     
     return 0
 
+def plan_collection(args, output_dir):
+    """Estimate the collection of the days of the period the cache does not cover."""
+    from scheduler import CollectionScheduler, log_plan
+    
+    start_date, end_date = collection_period(args.days, args.start_date, args.end_date)
+    # An explicit period ends at midnight after its last day
+    last_day = end_date - timedelta(seconds=1)
+    missing = missing_days(output_dir, ["mtgmelee"], args.format, f"{start_date:%Y-%m-%d}", f"{last_day:%Y-%m-%d}")
+    
+    # The scheduler lists with its own authenticated client; this one only provides the configuration
+    scheduler = CollectionScheduler(output_dir, MTGMeleeClient().config)
+    for range_start, range_end in gap_ranges(missing).get("mtgmelee", []):
+        scheduler.add_target("mtgmelee", args.format, *collection_period(start_date=range_start, end_date=range_end))
+    if not scheduler.targets:
+        logger.info("Cached data covers the whole period. Nothing to collect.")
+    
+    plan = scheduler.plan()
+    log_plan(plan, logger)
+    return 1 if any(estimate["listing_failures"] or estimate["truncated"] for estimate in plan.values()) else 0
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
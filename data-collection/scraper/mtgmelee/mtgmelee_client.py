@@ -9,81 +9,142 @@ This module allows retrieving tournament data from the MTGMelee API.
 import os
 import sys
 import json
-import time
+import base64
 import logging
-import requests
+import threading
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 from urllib.parse import urljoin
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from http_common import RateLimiter, RetryPolicy, CircuitBreaker, HttpClient
+from cache_manager import CacheWriter, file_lock
+from card_names import card_name_table, normalize_tournament
+from log_setup import configure_logging, lazy
+
+# requests is imported by the methods that send HTTP calls, so that importing
+# this module (e.g. for planning or --help) does not pay for it.
 logger = logging.getLogger('mtgmelee_client')
 
-class RateLimiter:
-    """Rate limit manager for the MTGMelee API."""
-    
-    def __init__(self, requests_per_minute=60, requests_per_hour=1000):
-        self.requests_per_minute = requests_per_minute
-        self.requests_per_hour = requests_per_hour
-        self.minute_requests = []
-        self.hour_requests = []
-    
-    def wait_if_needed(self):
-        """Wait if necessary to respect rate limits."""
-        current_time = time.time()
-        
-        # Clean up old requests
-        self.minute_requests = [t for t in self.minute_requests if current_time - t < 60]
-        self.hour_requests = [t for t in self.hour_requests if current_time - t < 3600]
-        
-        # Check limits
-        if len(self.minute_requests) >= self.requests_per_minute:
-            sleep_time = 60 - (current_time - self.minute_requests[0])
-            if sleep_time > 0:
-                logger.info(f"Rate limit per minute reached. Waiting {sleep_time:.2f} seconds.")
-                time.sleep(sleep_time)
-        
-        if len(self.hour_requests) >= self.requests_per_hour:
-            sleep_time = 3600 - (current_time - self.hour_requests[0])
-            if sleep_time > 0:
-                logger.info(f"Rate limit per hour reached. Waiting {sleep_time:.2f} seconds.")
-                time.sleep(sleep_time)
-    
-    def record_request(self):
-        """Record a request."""
-        current_time = time.time()
-        self.minute_requests.append(current_time)
-        self.hour_requests.append(current_time)
+# Tournament listings are requested in pages of this size, up to max_listing_pages pages
+TOURNAMENTS_PAGE_SIZE = 100
+DEFAULT_MAX_LISTING_PAGES = 20
+
+def _decode_token_claims(token):
+    """Decode the payload of a JWT without verifying it (used only to read exp)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload.encode("ascii")))
+    except (AttributeError, IndexError, ValueError, UnicodeDecodeError):
+        return {}
 
 class AuthManager:
     """Authentication manager for the MTGMelee API."""
     
-    def __init__(self, login_url, token_refresh_url):
+    # One in-process lock per cache file, so threads sharing a cache refresh once
+    _thread_locks = {}
+    _thread_locks_guard = threading.Lock()
+    
+    def __init__(self, login_url, token_refresh_url, cache_path=None, refresh_margin=300):
         self.login_url = login_url
         self.token_refresh_url = token_refresh_url
         self.token = None
         self.token_expiry = None
+        self.cache_path = cache_path
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._username = None
+        self._password = None
+        self._rejected_token = None
     
-    def authenticate(self, username, password):
-        """Authenticate the user and retrieve a token."""
+    @contextmanager
+    def _single_flight(self):
+        """Serialize token renewal across threads and processes sharing the cache."""
+        if not self.cache_path:
+            yield
+            return
+        
+        with AuthManager._thread_locks_guard:
+            thread_lock = AuthManager._thread_locks.setdefault(self.cache_path, threading.Lock())
+        with thread_lock, file_lock(f"{self.cache_path}.lock"):
+            yield
+    
+    def _token_expiry_from(self, token, data):
+        """Compute the token expiry from its claims, falling back to the response or 24 hours."""
+        claims = _decode_token_claims(token)
+        if isinstance(claims.get("exp"), (int, float)):
+            return datetime.fromtimestamp(claims["exp"])
+        if isinstance(data.get("expires_in"), (int, float)):
+            return datetime.now() + timedelta(seconds=data["expires_in"])
+        return datetime.now() + timedelta(hours=24)
+    
+    def _set_token(self, token, expiry):
+        self.token = token
+        self.token_expiry = expiry
+    
+    def _token_is_fresh(self):
+        """Return True if the token is set and not within the refresh margin of its expiry."""
+        return bool(self.token and self.token_expiry
+                    and datetime.now() + self.refresh_margin < self.token_expiry)
+    
+    def _load_cached_token(self):
+        """Adopt the token from the shared cache if it is valid for the current user."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable token cache {self.cache_path}: {e}")
+            return False
+        
+        if cached.get("username") != self._username or not cached.get("token"):
+            return False
+        if cached["token"] == self._rejected_token:
+            return False
+        
+        expiry = datetime.fromtimestamp(cached.get("expiry", 0))
+        if datetime.now() + self.refresh_margin >= expiry:
+            return False
+        
+        self._set_token(cached["token"], expiry)
+        return True
+    
+    def _save_cached_token(self):
+        """Persist the current token to the shared cache (owner-only permissions)."""
+        if not self.cache_path:
+            return
+        
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    "username": self._username,
+                    "token": self.token,
+                    "expiry": self.token_expiry.timestamp()
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Unable to write token cache {self.cache_path}: {e}")
+    
+    def _login(self):
+        """Request a new token from the login endpoint."""
+        import requests
         try:
             response = requests.post(
                 self.login_url,
-                json={"username": username, "password": password},
+                json={"username": self._username, "password": self._password},
                 timeout=10
             )
             
             if response.status_code == 200:
                 data = response.json()
-                self.token = data.get("token")
-                # Assume token expires in 24 hours
-                self.token_expiry = datetime.now() + timedelta(hours=24)
+                token = data.get("token")
+                self._set_token(token, self._token_expiry_from(token, data))
+                self._save_cached_token()
                 logger.info("Authentication successful.")
                 return True
             else:
@@ -93,12 +154,13 @@ class AuthManager:
             logger.error(f"Error during authentication: {str(e)}")
             return False
     
-    def refresh_token(self):
-        """Refresh the token if necessary."""
+    def _refresh(self):
+        """Exchange the current token for a new one at the refresh endpoint."""
         if not self.token or not self.token_expiry or datetime.now() >= self.token_expiry:
             logger.info("Token expired or not set. New authentication required.")
             return False
         
+        import requests
         try:
             response = requests.post(
                 self.token_refresh_url,
@@ -108,9 +170,9 @@ class AuthManager:
             
             if response.status_code == 200:
                 data = response.json()
-                self.token = data.get("token")
-                # Assume token expires in 24 hours
-                self.token_expiry = datetime.now() + timedelta(hours=24)
+                token = data.get("token")
+                self._set_token(token, self._token_expiry_from(token, data))
+                self._save_cached_token()
                 logger.info("Token refreshed successfully.")
                 return True
             else:
@@ -120,12 +182,57 @@ class AuthManager:
             logger.error(f"Error during token refresh: {str(e)}")
             return False
     
+    def authenticate(self, username, password):
+        """Authenticate the user, reusing a valid token from the shared cache when possible."""
+        self._username = username
+        self._password = password
+        
+        with self._single_flight():
+            if self._load_cached_token():
+                logger.info("Using cached authentication token.")
+                return True
+            return self._login()
+    
+    def refresh_token(self):
+        """Refresh the token, adopting one renewed by another worker if available."""
+        self._rejected_token = self.token
+        with self._single_flight():
+            if self._load_cached_token():
+                logger.info("Token already refreshed by another worker.")
+                return True
+            return self._refresh()
+    
+    def ensure_valid_token(self):
+        """Renew the token proactively when it is about to expire."""
+        if not self.token or self._token_is_fresh():
+            return bool(self.token)
+        
+        with self._single_flight():
+            # Another worker may have renewed the token while we waited for the lock
+            if self._load_cached_token():
+                return True
+            if self._refresh():
+                return True
+            if self._username and self._password:
+                return self._login()
+            return False
+    
     def get_headers(self):
         """Return authentication headers."""
+        self.ensure_valid_token()
         if self.token:
             return {"Authorization": f"Bearer {self.token}"}
         return {}
 
+def _format_ids(formats):
+    """Return {lowercase format name: API format id} of the configured formats.
+
+    The configuration lists format names, which the API accepts as ids, or maps names to ids.
+    """
+    if isinstance(formats, dict):
+        return {name.lower(): format_id for name, format_id in formats.items()}
+    return {name.lower(): name for name in formats}
+
 class MTGMeleeClient:
     """Client for the MTGMelee API."""
     
@@ -141,19 +248,46 @@ class MTGMeleeClient:
         auth_config = api_config.get("auth", {})
         self.auth_manager = AuthManager(
             auth_config.get("login_url"),
-            auth_config.get("token_refresh_url")
+            auth_config.get("token_refresh_url"),
+            self._resolve_path(auth_config.get("token_cache", "data-collection/.auth-cache/mtgmelee_token.json")),
+            auth_config.get("refresh_margin", 300)
         )
         
         rate_limit_config = self.config.get("mtgmelee", {}).get("api_config", {}).get("rate_limit", {})
-        self.rate_limiter = RateLimiter(
+        rate_limiter = RateLimiter(
             rate_limit_config.get("requests_per_minute", 60),
             rate_limit_config.get("requests_per_hour", 1000)
         )
         
-        self.formats = self.config.get("mtgmelee", {}).get("formats", {})
+        self.formats = _format_ids(self.config.get("mtgmelee", {}).get("formats", {}))
         self.max_retries = self.config.get("mtgmelee", {}).get("api_config", {}).get("max_retries", 3)
         self.retry_delay = self.config.get("mtgmelee", {}).get("api_config", {}).get("retry_delay", 5)
         self.timeout = self.config.get("mtgmelee", {}).get("api_config", {}).get("timeout", 30)
+        self.max_listing_pages = self.config.get("mtgmelee", {}).get("api_config", {}).get(
+            "max_listing_pages", DEFAULT_MAX_LISTING_PAGES
+        )
+        
+        retry_policy = RetryPolicy(
+            self.retry_delay,
+            self.config.get("mtgmelee", {}).get("api_config", {}).get("max_retry_delay", 60)
+        )
+        
+        breaker_config = self.config.get("mtgmelee", {}).get("api_config", {}).get("circuit_breaker", {})
+        circuit_breaker = CircuitBreaker(
+            breaker_config.get("failure_threshold", 5),
+            breaker_config.get("recovery_timeout", 60)
+        )
+        
+        # Shared HTTP infrastructure of the collectors; scheduler workers share the client
+        self.http = HttpClient(rate_limiter, retry_policy, circuit_breaker, self.max_retries, self.timeout)
+    
+    def _resolve_path(self, path):
+        """Resolve a path from the configuration relative to the project root."""
+        if not path or os.path.isabs(path):
+            return path
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+        return os.path.join(base_dir, path)
     
     def _load_config(self, config_path=None):
         """Load configuration from sources.json file."""
@@ -206,69 +340,40 @@ class MTGMeleeClient:
         
         return self.auth_manager.authenticate(username, password)
     
+    def _reauthenticate(self):
+        """Renew the token after a 401 answer; return the new authentication headers, or None."""
+        # Token expired: refresh it, or authenticate again
+        if self.auth_manager.refresh_token() or self.authenticate():
+            return self.auth_manager.get_headers()
+        logger.error("Authentication failed after token expiration.")
+        return None
+    
     def _make_request(self, endpoint, method="GET", params=None, data=None):
-        """Make a request to the MTGMelee API with error handling and rate limiting."""
+        """Make a request to the MTGMelee API; return the decoded JSON response, or None on failure."""
         if not self.base_url:
             logger.error("MTGMelee API base URL not defined.")
             return None
+        if method not in ("GET", "POST"):
+            logger.error(f"Unsupported method: {method}")
+            return None
         
-        url = urljoin(self.base_url, endpoint)
-        headers = self.auth_manager.get_headers()
-        
-        for attempt in range(self.max_retries):
-            try:
-                # Wait if necessary to respect rate limits
-                self.rate_limiter.wait_if_needed()
-                
-                # Make the request
-                if method == "GET":
-                    response = requests.get(url, headers=headers, params=params, timeout=self.timeout)
-                elif method == "POST":
-                    response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
-                else:
-                    logger.error(f"Unsupported method: {method}")
-                    return None
-                
-                # Record the request
-                self.rate_limiter.record_request()
-                
-                # Check the response
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 401:
-                    # Token expired, try to refresh
-                    if self.auth_manager.refresh_token():
-                        headers = self.auth_manager.get_headers()
-                        continue
-                    else:
-                        # Try to authenticate again
-                        if self.authenticate():
-                            headers = self.auth_manager.get_headers()
-                            continue
-                        else:
-                            logger.error("Authentication failed after token expiration.")
-                            return None
-                else:
-                    logger.error(f"API error: {response.status_code} - {response.text}")
-                    
-                    # Wait before retrying
-                    if attempt < self.max_retries - 1:
-                        wait_time = self.retry_delay * (2 ** attempt)  # Exponential backoff
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-            except requests.RequestException as e:
-                logger.error(f"Request error: {str(e)}")
-                
-                # Wait before retrying
-                if attempt < self.max_retries - 1:
-                    wait_time = self.retry_delay * (2 ** attempt)  # Exponential backoff
-                    logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-        
-        logger.error(f"Failed after {self.max_retries} attempts.")
-        return None
+        response = self.http.request(
+            method, urljoin(self.base_url, endpoint), params=params, json=data,
+            headers=self.auth_manager.get_headers(), on_unauthorized=self._reauthenticate
+        )
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.error(f"Invalid JSON response for {endpoint}: {e}")
+            return None
+    
+    def get_run_summary(self):
+        """Return request statistics for the current run."""
+        return self.http.get_run_summary()
     
-    def get_tournaments(self, format_id=None, start_date=None, end_date=None, page=1, page_size=100):
+    def get_tournaments(self, format_id=None, start_date=None, end_date=None, page=1, page_size=TOURNAMENTS_PAGE_SIZE):
         """Get the list of tournaments."""
         endpoint = self.endpoints.get("tournaments")
         if not endpoint:
@@ -335,17 +440,40 @@ class MTGMeleeClient:
     
     def get_recent_tournaments(self, format_name=None, days=7):
         """Get recent tournaments for a given format."""
+        end_date = datetime.now()
+        return self.get_tournaments_between(format_name, end_date - timedelta(days=days), end_date)
+    
+    def get_tournaments_between(self, format_name, start_date, end_date):
+        """Get the tournaments of a format between two datetimes."""
+        return self.list_tournaments(format_name, start_date, end_date)[0]
+    
+    def list_tournaments(self, format_name, start_date, end_date):
+        """List the tournaments of a format between two datetimes, page by page.
+        
+        Returns (tournaments, complete): complete is False when the listing
+        stopped at max_listing_pages full pages, leaving tournaments out.
+        tournaments is None when a page could not be read.
+        """
         format_id = None
         if format_name:
             format_id = self.formats.get(format_name.lower())
             if not format_id:
                 logger.error(f"Unrecognized format: {format_name}")
-                return None
-        
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        return self.get_tournaments(format_id=format_id, start_date=start_date, end_date=end_date)
+                return None, False
+        
+        tournaments = []
+        for page in range(1, self.max_listing_pages + 1):
+            listed = self.get_tournaments(format_id=format_id, start_date=start_date, end_date=end_date, page=page)
+            if listed is None:
+                return None, False
+            tournaments.extend(listed)
+            # A short page is the last one
+            if len(listed) < TOURNAMENTS_PAGE_SIZE:
+                return tournaments, True
+        
+        logger.warning(f"Tournament listing truncated at {self.max_listing_pages} pages "
+                       f"({len(tournaments)} tournaments) from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}.")
+        return tournaments, False
     
     def get_tournament_data(self, tournament_id):
         """Get all data for a tournament (details, standings, pairings, decklists)."""
@@ -473,10 +601,16 @@ class MTGMeleeClient:
                 "matches": matches
             })
         
-        return unified_data
+        # Every source spells a card the same way once normalized
+        return normalize_tournament(unified_data, card_name_table(self.config))
     
-    def save_tournament_data(self, tournament_data, output_dir=None):
-        """Save tournament data in unified format."""
+    def save_tournament_data(self, tournament_data, output_dir=None, writer=None):
+        """Save tournament data in unified format.
+        
+        With a CacheWriter the file is written atomically with the writer's next
+        batch; otherwise it is written atomically right away, compressed as
+        configured in data_storage.
+        """
         if not tournament_data:
             logger.error("No tournament data to save.")
             return False
@@ -486,21 +620,24 @@ class MTGMeleeClient:
             logger.error("Failed to convert to unified format.")
             return False
         
-        if not output_dir:
+        if writer is not None:
+            output_dir = writer.cache_dir
+        elif not output_dir:
             # Go up two levels from the script directory
             script_dir = os.path.dirname(os.path.abspath(__file__))
             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
             output_dir = os.path.join(base_dir, "data-collection", "raw-cache")
         
-        os.makedirs(output_dir, exist_ok=True)
-        
         tournament_id = unified_data.get("tournament_id")
-        output_file = os.path.join(output_dir, f"{tournament_id}.json")
+        file_name = f"{tournament_id}.json"
         
         try:
-            with open(output_file, 'w') as f:
-                json.dump(unified_data, f, indent=2)
-            logger.info(f"Data saved to {output_file}")
+            if writer is not None:
+                writer.write_json(file_name, unified_data)
+            else:
+                with CacheWriter.from_config(output_dir, self.config) as single_writer:
+                    single_writer.write_json(file_name, unified_data)
+            logger.info(f"Data saved to {os.path.join(output_dir, file_name)}")
             return True
         except Exception as e:
             logger.error(f"Error saving data: {str(e)}")
@@ -510,6 +647,8 @@ class MTGMeleeClient:
 if __name__ == "__main__":
     import argparse
     
+    configure_logging()
+    
     parser = argparse.ArgumentParser(description="MTGMelee API Client")
     parser.add_argument("--format", help="Game format (standard, modern, etc.)")
     parser.add_argument("--days", type=int, default=7, help="Number of days to retrieve")
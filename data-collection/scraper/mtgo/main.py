@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Main script for collecting data from MTGO.
+"""
+
+import os
+import sys
+import argparse
+import logging
+from mtgo_client import MTGOClient
+from http_common import log_run_summary
+from cache_manager import CacheWriter, is_cached
+from coverage import collection_period, covered_range
+from log_setup import configure_logging
+
+logger = logging.getLogger('mtgo_main')
+
+def main():
+    parser = argparse.ArgumentParser(description="Data collection from MTGO")
+    parser.add_argument("--format", required=True, help="Game format (standard, modern, etc.)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to retrieve")
+    parser.add_argument("--start-date", help="Retrieve a date range instead of the last days (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last day of the date range (YYYY-MM-DD, default: today)")
+    parser.add_argument("--output-dir", help="Output directory for data")
+    parser.add_argument("--workers", type=int, default=4, help="Number of pages fetched concurrently")
+    parser.add_argument("--refresh", action="store_true", help="Retrieve events already saved in the output directory")
+    args = parser.parse_args()
+
+    # Configure logging
+    configure_logging()
+
+    # Determine output directory
+    output_dir = args.output_dir
+    if not output_dir:
+        # Go up two levels from the script directory
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+        output_dir = os.path.join(base_dir, "data-collection", "raw-cache")
+
+    client = MTGOClient(max_workers=args.workers)
+
+    start_date, end_date = collection_period(args.days, args.start_date, args.end_date)
+    logger.info(f"Retrieving {args.format} events from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}...")
+    events = client.get_events(args.format, start_date, end_date)
+    if events is None:
+        log_run_summary(client, logger)
+        return 1
+    if not events:
+        logger.warning(f"No {args.format} events found from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}.")
+
+    # Events already in the output directory are final once published
+    if not args.refresh:
+        cached = [event for event in events if is_cached(output_dir, client.output_name(event))]
+        if cached:
+            logger.info(f"Skipping {len(cached)} events already saved.")
+        events = [event for event in events if event not in cached]
+
+    success_count = 0
+    failure_count = 0
+    # Events are written atomically in batches, committed to the cache manifest
+    with CacheWriter.from_config(output_dir, client.config) as writer:
+        # Each event is saved as soon as its page arrives
+        for event, event_data in client.iter_events_data(events):
+            if event_data and client.save_event_data(event_data, writer=writer):
+                success_count += 1
+            else:
+                logger.error(f"Failed to retrieve event {event['url']}.")
+                failure_count += 1
+
+        # Listing pages that could not be read leave the period uncovered
+        if failure_count == 0 and not client.listing_failures:
+            writer.record_coverage("mtgo", args.format, *covered_range(start_date, end_date))
+
+    logger.info(f"Retrieval completed: {success_count} events saved, {failure_count} failures.")
+    log_run_summary(client, logger)
+
+    return 1 if failure_count > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MTGO decklist client for the MTG Analytics pipeline.
+This module retrieves the published MTGO events (challenges, preliminaries,
+leagues, showcases) and their decklists from mtgo.com.
+
+Listing pages are fetched concurrently through a shared rate limiter and
+parsed with lxml. Event pages embed their decklists, standings and brackets
+as a JSON object assigned in a script; it is decoded straight from the page
+text, without building a DOM for the (large) event pages.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from http_common import HttpClient
+from cache_manager import CacheWriter
+from card_names import card_name_table, normalize_tournament
+
+logger = logging.getLogger('mtgo_client')
+
+# Script assignment holding the event data on decklist pages
+EMBEDDED_DATA_MARKERS = ("window.MTGO.decklists.data =", "window.MTGO.decklists.data=")
+
+# Event page slugs end with the date and the event id, e.g. modern-challenge-32-2024-07-2112345678
+EVENT_SLUG = re.compile(r"(\d{4}-\d{2}-\d{2})(\d+)$")
+
+def extract_embedded_json(html, markers=EMBEDDED_DATA_MARKERS):
+    """Decode the JSON object assigned after one of the markers in a page, or None."""
+    decoder = json.JSONDecoder()
+    for marker in markers:
+        position = html.find(marker)
+        if position < 0:
+            continue
+        start = html.find("{", position + len(marker))
+        if start < 0:
+            continue
+        try:
+            data, _ = decoder.raw_decode(html, start)
+            return data
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid embedded decklist JSON: {e}")
+            return None
+    return None
+
+def parse_event_links(html, base_url):
+    """Return the events listed on a decklists listing page."""
+    from lxml import html as lxml_html
+
+    document = lxml_html.fromstring(html)
+    events = []
+    for link in document.xpath("//a[contains(@href, '/decklist/')]"):
+        url = urljoin(base_url, link.get("href"))
+        slug = url.rstrip("/").rsplit("/", 1)[-1]
+        match = EVENT_SLUG.search(slug)
+        times = link.xpath(".//time/@datetime")
+        date = times[0][:10] if times else (match.group(1) if match else None)
+        name = " ".join((link.xpath("string(.//h3)") or link.text_content()).split())
+        events.append({
+            "url": url,
+            "slug": slug,
+            "event_id": match.group(2) if match else slug,
+            "name": name,
+            "date": date
+        })
+    return events
+
+def tournament_id(event):
+    """Return the tournament id of a listed event, which also names its file in the cache."""
+    return f"mtgo-{event['event_id']}"
+
+def _format_name(code, known_formats):
+    """Return the format name of an MTGO format code such as CMODERN."""
+    if not code:
+        return None
+    name = code.lower()
+    if name not in known_formats and name[1:] in known_formats:
+        name = name[1:]
+    return name.title()
+
+def _card_name(card):
+    """Return the name of a card entry of the embedded decklist data."""
+    attributes = card.get("card_attributes") or {}
+    return attributes.get("card_name") or card.get("card_name") or card.get("name")
+
+def _quantity(card):
+    """Return the quantity of a card entry as an integer."""
+    try:
+        return int(card.get("qty") or card.get("quantity") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+class MTGOClient:
+    """Client for the MTGO decklists website."""
+
+    def __init__(self, config_path=None, max_workers=4):
+        """Initialize the MTGO client."""
+        self.config = self._load_config(config_path)
+        mtgo_config = self.config.get("mtgo", {})
+
+        self.base_url = mtgo_config.get("base_url", "https://www.mtgo.com/decklists")
+        self.endpoints = mtgo_config.get("api_endpoints", {})
+        self.formats = [name.lower() for name in mtgo_config.get("formats", [])]
+        self.tournament_types = [name.lower() for name in mtgo_config.get("tournament_types", [])]
+        self.max_workers = max_workers
+        self.listing_failures = 0
+        self.http = HttpClient.from_config(mtgo_config.get("scraping_config", {}))
+
+    def _load_config(self, config_path=None):
+        """Load configuration from sources.json file."""
+        if not config_path:
+            # Go up two levels from the script directory
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+            config_path = os.path.join(base_dir, "config", "sources.json")
+
+        try:
+            with open(config_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.error(f"Configuration file not found: {config_path}")
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"JSON format error in configuration file: {config_path}")
+            return {}
+
+    def get_run_summary(self):
+        """Return request statistics for the current run."""
+        return self.http.get_run_summary()
+
+    def _listing_urls(self, start_date, end_date):
+        """Return the monthly listing pages covering a date range."""
+        listing_url = self.endpoints.get("decklists", self.base_url).rstrip("/")
+        urls = []
+        month = start_date.replace(day=1)
+        while month <= end_date:
+            urls.append(f"{listing_url}/{month.year}/{month.month:02d}")
+            month = (month + timedelta(days=32)).replace(day=1)
+        return urls
+
+    def _fetch_all(self, function, items):
+        """Apply function to items concurrently, preserving their order."""
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(function, items))
+
+    def _matches_filters(self, event, format_name):
+        """Check an event name against the format and the configured tournament types."""
+        name = event["name"].lower() or event["slug"].lower()
+        if format_name and format_name.lower() not in name:
+            return False
+        if self.tournament_types and not any(kind in name for kind in self.tournament_types):
+            return False
+        return True
+
+    def get_recent_events(self, format_name=None, days=7):
+        """Get the events of a format published over the last days."""
+        end_date = datetime.now()
+        return self.get_events(format_name, end_date - timedelta(days=days), end_date)
+
+    def list_events(self, start_date, end_date):
+        """Return the events of every format published between two datetimes, and the listing pages that failed."""
+        listing_urls = self._listing_urls(start_date, end_date)
+
+        events = {}
+        failed = []
+        for url, html in zip(listing_urls, self._fetch_all(self.http.get_text, listing_urls)):
+            if html is None:
+                logger.error(f"Unable to retrieve listing page {url}")
+                failed.append(url)
+                continue
+            for event in parse_event_links(html, url):
+                if event["date"] and not start_date.strftime("%Y-%m-%d") <= event["date"] <= end_date.strftime("%Y-%m-%d"):
+                    continue
+                events[event["url"]] = event
+
+        return sorted(events.values(), key=lambda event: (event["date"] or "", event["url"])), failed
+
+    def filter_events(self, events, format_name):
+        """Return the events of a format among listed events."""
+        return [event for event in events if self._matches_filters(event, format_name)]
+
+    def get_events(self, format_name, start_date, end_date):
+        """Get the events of a format published between two datetimes."""
+        if format_name and self.formats and format_name.lower() not in self.formats:
+            logger.error(f"Unrecognized format: {format_name}")
+            return None
+
+        events, failed = self.list_events(start_date, end_date)
+        self.listing_failures += len(failed)
+        return self.filter_events(events, format_name)
+
+    def get_event_data(self, event):
+        """Get the embedded decklist data of an event page."""
+        html = self.http.get_text(event["url"])
+        if html is None:
+            return None
+        data = extract_embedded_json(html)
+        if data is None:
+            logger.error(f"No decklist data found on {event['url']}")
+            return None
+        return {"event": event, "data": data}
+
+    def iter_events_data(self, events):
+        """Yield (event, event data) in order while the next event pages are fetched concurrently.
+
+        Only a few pages are fetched ahead, so events can be saved as they
+        arrive instead of holding every page of the period in memory.
+        """
+        if not events:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(events))) as pool:
+            pending = deque()
+            for event in events:
+                pending.append((event, pool.submit(self.get_event_data, event)))
+                if len(pending) > 2 * self.max_workers:
+                    done_event, future = pending.popleft()
+                    yield done_event, future.result()
+            while pending:
+                done_event, future = pending.popleft()
+                yield done_event, future.result()
+
+    def convert_to_unified_format(self, event_data):
+        """Convert MTGO event data to unified format."""
+        if not event_data or "data" not in event_data:
+            logger.error("Invalid event data.")
+            return None
+
+        event = event_data["event"]
+        data = event_data["data"]
+        # The id known from the listing, so that saved events are recognized before fetching them
+        event_tournament_id = tournament_id(event)
+
+        # Standings give the rank of each player
+        ranks = {}
+        for standing in data.get("standings") or []:
+            player = standing.get("login_name") or standing.get("player")
+            if player:
+                ranks[player] = standing.get("rank")
+
+        def deck_id(player):
+            return f"{event_tournament_id}-{player}"
+
+        # Only the top 8 brackets publish individual match results
+        matches = {}
+        for bracket in data.get("brackets") or []:
+            for match in bracket.get("matches") or []:
+                players = match.get("players") or []
+                if len(players) != 2:
+                    continue
+                first, second = players
+                first_name, second_name = first.get("player"), second.get("player")
+                if not first_name or not second_name:
+                    continue
+                first_wins, second_wins = int(first.get("wins") or 0), int(second.get("wins") or 0)
+                result = "win" if first_wins > second_wins else "loss" if first_wins < second_wins else "draw"
+                opposite = {"win": "loss", "loss": "win", "draw": "draw"}[result]
+                round_name = bracket.get("index", bracket.get("name"))
+                matches.setdefault(first_name, []).append(
+                    {"opponent_id": deck_id(second_name), "result": result, "round": round_name}
+                )
+                matches.setdefault(second_name, []).append(
+                    {"opponent_id": deck_id(first_name), "result": opposite, "round": round_name}
+                )
+
+        starttime = data.get("starttime") or data.get("publish_date") or ""
+        unified_data = {
+            "tournament_id": event_tournament_id,
+            "source": "MTGO",
+            "name": data.get("description") or data.get("name") or event["name"],
+            "format": _format_name(data.get("format"), self.formats),
+            "date": starttime[:10] or event["date"],
+            "url": event["url"],
+            "decks": []
+        }
+
+        for index, decklist in enumerate(data.get("decklists") or []):
+            player = decklist.get("player") or decklist.get("login_name") or f"Player{index + 1}"
+            unified_data["decks"].append({
+                "deck_id": deck_id(player),
+                "player_name": player,
+                "rank": ranks.get(player),
+                "mainboard": [
+                    {"card_name": _card_name(card), "quantity": _quantity(card)}
+                    for card in decklist.get("main_deck") or []
+                ],
+                "sideboard": [
+                    {"card_name": _card_name(card), "quantity": _quantity(card)}
+                    for card in decklist.get("sideboard_deck") or []
+                ],
+                "matches": matches.get(player, [])
+            })
+
+        # Every source spells a card the same way once normalized
+        return normalize_tournament(unified_data, card_name_table(self.config))
+
+    def output_name(self, event):
+        """Return the unified-format file name of an event."""
+        return f"{tournament_id(event)}.json"
+
+    def save_event_data(self, event_data, output_dir=None, writer=None):
+        """Save event data in unified format, through the writer's next batch if given."""
+        unified_data = self.convert_to_unified_format(event_data)
+        if not unified_data:
+            logger.error("Failed to convert to unified format.")
+            return False
+
+        file_name = self.output_name(event_data["event"])
+        try:
+            if writer is not None:
+                writer.write_json(file_name, unified_data)
+            else:
+                with CacheWriter.from_config(output_dir, self.config) as single_writer:
+                    single_writer.write_json(file_name, unified_data)
+            logger.info(f"Data saved to {file_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving data: {str(e)}")
+            return False
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Main script for collecting data from Topdeck.gg.
+"""
+
+import os
+import sys
+import argparse
+import logging
+from topdeck_client import TopdeckClient
+from http_common import log_run_summary
+from coverage import collection_period
+from log_setup import configure_logging
+
+logger = logging.getLogger('topdeck_main')
+
+def main():
+    parser = argparse.ArgumentParser(description="Data collection from Topdeck.gg")
+    parser.add_argument("--format", required=True, help="Game format (standard, modern, etc.)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to retrieve")
+    parser.add_argument("--start-date", help="Retrieve a date range instead of the last days (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last day of the date range (YYYY-MM-DD, default: today)")
+    parser.add_argument("--output-dir", help="Output directory for data")
+    parser.add_argument("--workers", type=int, default=4, help="Number of pages streamed concurrently")
+    parser.add_argument("--page-days", type=int, default=7, help="Number of days covered by each API request")
+    parser.add_argument("--refresh", action="store_true", help="Overwrite tournaments already saved in the output directory")
+    args = parser.parse_args()
+
+    # Configure logging
+    configure_logging()
+
+    # Determine output directory
+    output_dir = args.output_dir
+    if not output_dir:
+        # Go up two levels from the script directory
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+        output_dir = os.path.join(base_dir, "data-collection", "raw-cache")
+
+    client = TopdeckClient(max_workers=args.workers, page_days=args.page_days)
+
+    start_date, end_date = collection_period(args.days, args.start_date, args.end_date)
+    logger.info(f"Retrieving {args.format} tournaments from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}...")
+    result = client.collect(args.format, start_date, end_date, output_dir, args.refresh)
+    if result is None:
+        return 1
+
+    logger.info(
+        f"Retrieval completed: {result['saved']} tournaments saved, {result['skipped']} already saved, "
+        f"{result['failed']} failures."
+    )
+    log_run_summary(client, logger)
+
+    return 1 if result["failed"] > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
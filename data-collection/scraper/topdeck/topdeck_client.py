@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Topdeck.gg API client for the MTG Analytics pipeline.
+This module retrieves tournament standings, decklists and rounds from the
+Topdeck.gg API and writes them in unified format.
+
+The requested period is split into pages of a few days, fetched concurrently
+through the shared HTTP infrastructure. Each page is a JSON array streamed
+from the response: tournaments are decoded and written one by one as their
+bytes arrive, so a page is never held in memory as a whole.
+"""
+
+import os
+import re
+import sys
+import json
+import codecs
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from http_common import HttpClient
+from cache_manager import CacheWriter, is_cached
+from card_names import card_name_table, normalize_tournament
+from coverage import covered_range
+
+logger = logging.getLogger('topdeck_client')
+
+DEFAULT_API_URL = "https://topdeck.gg/api/v2/tournaments"
+GAME = "Magic: The Gathering"
+COLUMNS = ["name", "id", "decklist", "deckObj", "wins", "losses", "draws"]
+
+# Characters that delimit the elements of a streamed JSON array
+STRUCTURE = re.compile(r'[\[\]{}"]')
+STRING_STOP = re.compile(r'["\\]')
+SCALAR_END = re.compile(r'[,\]\s]')
+
+def _element_end(buffer, scan, state):
+    """Scan an array element from scan; return (end of the element or None if incomplete, next scan position).
+
+    state is [nesting depth, inside a string], carried over while more data arrives.
+    """
+    while True:
+        if state[1]:
+            match = STRING_STOP.search(buffer, scan)
+            if not match:
+                return None, len(buffer)
+            if match.group() == "\\":
+                # An escape split across chunks is scanned again with the next chunk
+                if match.end() >= len(buffer):
+                    return None, match.start()
+                scan = match.end() + 1
+                continue
+            state[1] = False
+            scan = match.end()
+            if state[0] == 0:
+                return scan, scan
+            continue
+        if state[0] == 0 and buffer[scan] not in '{["':
+            # Number, true, false or null
+            match = SCALAR_END.search(buffer, scan)
+            return (match.start(), match.start()) if match else (None, scan)
+        match = STRUCTURE.search(buffer, scan)
+        if not match:
+            return None, len(buffer)
+        scan = match.end()
+        char = match.group()
+        if char == '"':
+            state[1] = True
+        elif char in "{[":
+            state[0] += 1
+        else:
+            state[0] -= 1
+            if state[0] == 0:
+                return scan, scan
+
+def iter_json_array(chunks):
+    """Yield the elements of a JSON array from an iterable of byte chunks as they complete.
+
+    The end of each element is found by scanning only the new bytes for
+    brackets and string delimiters; the element is then decoded once.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    scan = None
+    state = [0, False]
+    started = False
+
+    for chunk in chunks:
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        if scan is not None:
+            scan -= position
+        position = 0
+        while True:
+            if scan is None:
+                # Skip whitespace and separators up to the next element
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position >= len(buffer):
+                    break
+                if not started:
+                    if buffer[position] != "[":
+                        raise ValueError("Response is not a JSON array.")
+                    started = True
+                    position += 1
+                    continue
+                if buffer[position] == "]":
+                    return
+                scan = position
+                state = [0, False]
+            end, scan = _element_end(buffer, scan, state)
+            if end is None:
+                # Incomplete element: wait for more data
+                break
+            yield json.loads(buffer[position:end])
+            position = end
+            scan = None
+
+    raise ValueError("Truncated JSON array in response.")
+
+class TopdeckClient:
+    """Client for the Topdeck.gg API."""
+
+    def __init__(self, config_path=None, max_workers=4, page_days=7):
+        """Initialize the Topdeck client."""
+        self.config = self._load_config(config_path)
+        topdeck_config = self.config.get("topdeck", {})
+
+        self.api_url = topdeck_config.get("api_endpoints", {}).get("api", DEFAULT_API_URL)
+        self.api_key = self._load_api_key(topdeck_config.get("authentication", {}).get("api_key_file"))
+        self.max_workers = max_workers
+        self.page_days = page_days
+        self.http = HttpClient.from_config(topdeck_config.get("scraping_config", {}))
+
+    def _base_dir(self):
+        """Return the project root directory."""
+        # Go up two levels from the script directory
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+
+    def _load_config(self, config_path=None):
+        """Load configuration from sources.json file."""
+        if not config_path:
+            config_path = os.path.join(self._base_dir(), "config", "sources.json")
+
+        try:
+            with open(config_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.error(f"Configuration file not found: {config_path}")
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"JSON format error in configuration file: {config_path}")
+            return {}
+
+    def _load_api_key(self, api_key_file):
+        """Load the API key from the configured file."""
+        if not api_key_file:
+            logger.warning("Topdeck API key file not configured.")
+            return None
+        if not os.path.isabs(api_key_file):
+            api_key_file = os.path.join(self._base_dir(), api_key_file)
+
+        try:
+            with open(api_key_file, 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            logger.warning(f"Topdeck API key file not found: {api_key_file}")
+            return None
+
+    def get_run_summary(self):
+        """Return request statistics for the current run."""
+        return self.http.get_run_summary()
+
+    def pages(self, start_date, end_date):
+        """Split a period into (start, end) pages of page_days days."""
+        pages = []
+        page_start = start_date
+        while page_start < end_date:
+            page_end = min(end_date, page_start + timedelta(days=self.page_days))
+            pages.append((page_start, page_end))
+            page_start = page_end
+        return pages
+
+    def stream_tournaments(self, format_name, page_start, page_end):
+        """Yield the tournaments of a page as they are decoded from the response."""
+        body = {
+            "game": GAME,
+            "format": format_name.title(),
+            "start": int(page_start.timestamp()),
+            # Pages share their boundary, so each page stops one second before the next one starts
+            "end": int(page_end.timestamp()) - 1,
+            "columns": COLUMNS,
+            "rounds": True
+        }
+        response = self.http.request("POST", self.api_url, json=body, headers={"Authorization": self.api_key},
+                                     stream=True)
+        if response is None:
+            raise IOError(f"Unable to retrieve Topdeck tournaments from {page_start:%Y-%m-%d} to {page_end:%Y-%m-%d}")
+
+        with response:
+            yield from iter_json_array(response.iter_content(chunk_size=65536))
+
+    def convert_to_unified_format(self, tournament, format_name):
+        """Convert a Topdeck tournament to unified format."""
+        tournament_id = f"topdeck-{tournament.get('TID')}"
+
+        def deck_id(player):
+            return f"{tournament_id}-{player}"
+
+        # Rounds refer to players by name
+        player_keys = {}
+        for standing in tournament.get("standings") or []:
+            if standing.get("name"):
+                player_keys[standing["name"]] = standing.get("id") or standing["name"]
+
+        matches = {}
+        for round_data in tournament.get("rounds") or []:
+            for table in round_data.get("tables") or []:
+                players = [player.get("name") for player in table.get("players") or []]
+                if len(players) != 2 or not all(players):
+                    continue
+                winner = table.get("winner")
+                for player, opponent in (players, players[::-1]):
+                    result = "win" if winner == player else "loss" if winner == opponent else "draw"
+                    matches.setdefault(player, []).append({
+                        "opponent_id": deck_id(player_keys.get(opponent, opponent)),
+                        "result": result,
+                        "round": round_data.get("round")
+                    })
+
+        start = tournament.get("startDate")
+        unified_data = {
+            "tournament_id": tournament_id,
+            "source": "Topdeck",
+            "name": tournament.get("tournamentName"),
+            "format": format_name.title(),
+            "date": datetime.fromtimestamp(start).strftime("%Y-%m-%d") if start else None,
+            "url": f"https://topdeck.gg/event/{tournament.get('TID')}",
+            "decks": []
+        }
+
+        for rank, standing in enumerate(tournament.get("standings") or [], start=1):
+            deck = standing.get("deckObj") or {}
+            if not deck:
+                continue
+            name = standing.get("name") or f"Player{rank}"
+            unified_data["decks"].append({
+                "deck_id": deck_id(player_keys.get(name, name)),
+                "player_name": name,
+                "rank": rank,
+                "mainboard": [
+                    {"card_name": card, "quantity": entry.get("count")}
+                    for card, entry in (deck.get("Mainboard") or {}).items()
+                ],
+                "sideboard": [
+                    {"card_name": card, "quantity": entry.get("count")}
+                    for card, entry in (deck.get("Sideboard") or {}).items()
+                ],
+                "matches": matches.get(name, [])
+            })
+
+        # Every source spells a card the same way once normalized
+        return normalize_tournament(unified_data, card_name_table(self.config))
+
+    def collect_page(self, format_name, page, writer, refresh=False):
+        """Stream a page of tournaments to the cache writer; return (saved, skipped, failed) counts."""
+        counts = [0, 0, 0]
+        try:
+            for tournament in self.stream_tournaments(format_name, *page):
+                unified_data = self.convert_to_unified_format(tournament, format_name)
+                if not unified_data["decks"]:
+                    continue
+                file_name = f"{unified_data['tournament_id']}.json"
+                if not refresh and is_cached(writer.cache_dir, file_name):
+                    counts[1] += 1
+                    continue
+                writer.write_json(file_name, unified_data)
+                logger.info(f"Tournament {unified_data['tournament_id']} saved ({len(unified_data['decks'])} decks).")
+                counts[0] += 1
+        except (OSError, ValueError) as e:
+            logger.error(str(e))
+            counts[2] += 1
+        return counts
+
+    def collect(self, format_name, start_date, end_date, output_dir, refresh=False):
+        """Collect the tournaments between two datetimes, streaming pages concurrently.
+
+        When every page succeeds, the whole days of the period are recorded as covered.
+        """
+        if not self.api_key:
+            logger.error("Topdeck API key not available.")
+            return None
+
+        pages = self.pages(start_date, end_date)
+        totals = [0, 0, 0]
+        # Streamed tournaments are written atomically in batches, committed to the cache manifest
+        with CacheWriter.from_config(output_dir, self.config) as writer, \
+                ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pages)))) as pool:
+            futures = [pool.submit(self.collect_page, format_name, page, writer, refresh) for page in pages]
+            for future in futures:
+                totals = [total + count for total, count in zip(totals, future.result())]
+            if not totals[2]:
+                writer.record_coverage("topdeck", format_name, *covered_range(start_date, end_date))
+        return {"saved": totals[0], "skipped": totals[1], "failed": totals[2]}
@@ -11,21 +11,35 @@ import sys
 import json
 import argparse
 import logging
-import subprocess
-import webbrowser
+import time
 from datetime import datetime, timedelta
-from pathlib import Path
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Heavier modules (subprocess, webbrowser, analytics.*) are imported by the
+# stages that need them, so that --help and queue commands start instantly.
+
 logger = logging.getLogger('orchestrator')
 
+# Exit codes used in headless mode
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+
+# Collection sources, in reporting order
+COLLECTION_SOURCES = ("mtgo", "mtgmelee", "topdeck")
+
+# Beyond this many coverage gaps, a source collects one range spanning them
+MAX_COLLECTION_RANGES = 4
+
+# Warnings of runs whose outputs are incomplete
+OUTPUT_WARNINGS = {"trends_failed", "visualization_failed", "card_performance_failed", "report_failed"}
+
+# Seconds given to the connectivity checks of the preflight
+PREFLIGHT_DEADLINE = 10
+
+# Seconds without a heartbeat after which a running job is considered abandoned
+JOB_LEASE = 300
+
 class MTGAnalyticsOrchestrator:
     """Main orchestrator for the MTG Analytics pipeline."""
     
@@ -34,6 +48,8 @@ class MTGAnalyticsOrchestrator:
         self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
         self.config = self._load_config()
         self.analysis_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.run_summary = {}
+        self._report_engines = {}
         
     def _load_config(self):
         """Load configuration from sources.json."""
@@ -58,48 +74,49 @@ class MTGAnalyticsOrchestrator:
             logger.error(f"Invalid date format. Use YYYY-MM-DD format. Error: {e}")
             return None
     
+    def _use_data_collection_modules(self):
+        """Make the data-collection modules importable."""
+        data_collection_dir = os.path.join(self.base_dir, "data-collection")
+        if data_collection_dir not in sys.path:
+            sys.path.insert(0, data_collection_dir)
+    
+    def _raw_cache_dir(self):
+        """Return the raw cache directory shared by the collectors."""
+        return os.path.join(
+            self.base_dir, self.config.get("data_storage", {}).get("raw_cache", os.path.join("data-collection", "raw-cache"))
+        )
+    
     def _check_data_availability(self, format_name, start_date, end_date):
-        """Check if data is available in caches for the specified period."""
+        """Return the date ranges each source must collect; empty when the raw cache covers the period."""
         logger.info(f"Checking data availability for {format_name} from {start_date} to {end_date}...")
         
-        raw_cache_dir = os.path.join(self.base_dir, "data-collection", "raw-cache")
-        processed_cache_dir = os.path.join(self.base_dir, "data-collection", "processed-cache")
+        self._use_data_collection_modules()
+        from coverage import gap_ranges, missing_days
         
-        # Check if cache directories exist
-        if not os.path.exists(raw_cache_dir):
-            logger.info("Raw cache directory not found. Data collection needed.")
-            return False
+        raw_cache_dir = self._raw_cache_dir()
+        sources = [source for source in COLLECTION_SOURCES if self.config.get(source, {}).get("status") != "disabled"]
+        missing = missing_days(raw_cache_dir, sources, format_name, start_date, end_date)
+        ranges_by_source = gap_ranges(missing)
+        gaps = {source: ranges_by_source[source] for source in sources if source in ranges_by_source}
         
-        if not os.path.exists(processed_cache_dir):
-            logger.info("Processed cache directory not found. Data collection needed.")
-            return False
-        
-        # Simple check: if we have any recent data files, assume we have some data
-        # In a more sophisticated implementation, we would check date ranges and formats
-        raw_files = [f for f in os.listdir(raw_cache_dir) if f.endswith('.json')]
-        processed_files = [f for f in os.listdir(processed_cache_dir) if f.endswith('.json')]
-        
-        if len(raw_files) == 0 or len(processed_files) == 0:
-            logger.info("No data files found in caches. Data collection needed.")
-            return False
-        
-        logger.info(f"Found {len(raw_files)} raw files and {len(processed_files)} processed files.")
-        
-        # For now, assume we need fresh data if we're asking for recent data
-        # In a production system, we would implement more sophisticated date checking
-        days = self._calculate_days_between(start_date, end_date)
-        if days and days <= 30:  # If asking for data from last 30 days, collect fresh data
-            logger.info("Recent data requested. Will collect fresh data to ensure completeness.")
-            return False
+        if not gaps:
+            logger.info("Cached data covers the whole period. Skipping data collection.")
+            return {}
         
-        logger.info("Existing data found. Skipping data collection.")
-        return True
+        for source, ranges in gaps.items():
+            days = sum(1 for missing_source, _, _ in missing if missing_source == source)
+            logger.info(f"{source}: {days} days missing in {len(ranges)} ranges.")
+            # Collecting each of many small gaps would repeat the listing requests
+            if len(ranges) > MAX_COLLECTION_RANGES:
+                gaps[source] = [(ranges[0][0], ranges[-1][1])]
+        return gaps
     
     def _run_command(self, command, description, cwd=None):
         """Run a shell command and handle errors."""
         logger.info(f"Running: {description}")
         logger.debug(f"Command: {' '.join(command)}")
         
+        import subprocess
         try:
             result = subprocess.run(
                 command,
@@ -123,29 +140,116 @@ class MTGAnalyticsOrchestrator:
             logger.error(f"❌ Command not found: {e}")
             return False
     
-    def _collect_mtgo_data(self, format_name, days):
-        """Collect data from MTGO."""
-        logger.info(f"Collecting MTGO data for {format_name} (last {days} days)...")
+    def _run_preflight(self):
+        """Run the parallel connectivity check and return the set of unreachable sources."""
+        logger.info("Running connectivity preflight...")
         
-        mtgo_script = os.path.join(self.base_dir, "data-collection", "scraper", "mtgo", "main.py")
-        if not os.path.exists(mtgo_script):
-            logger.warning("MTGO scraper not found. Skipping MTGO data collection.")
-            return True
+        import subprocess
+        preflight_script = os.path.join(self.base_dir, "test_connections.py")
+        command = [sys.executable, preflight_script, "--json", "--probes", "2", "--deadline", str(PREFLIGHT_DEADLINE)]
+        try:
+            # The script stops its checks at the deadline; the margin covers its startup and report
+            result = subprocess.run(
+                command, cwd=self.base_dir, capture_output=True, text=True, timeout=PREFLIGHT_DEADLINE + 20
+            )
+            report = json.loads(result.stdout)
+        except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError) as e:
+            logger.warning(f"Preflight check could not run: {e}")
+            return set()
+        
+        unreachable = set()
+        for host, entry in report.get("hosts", {}).items():
+            if entry.get("reachable"):
+                latency = entry.get("latency", {})
+                logger.info(f"Preflight {host}: p50 {latency.get('p50', 0):.2f}s, p90 {latency.get('p90', 0):.2f}s")
+            else:
+                logger.warning(f"Preflight {host}: unreachable")
+                unreachable.add(entry.get("source"))
+        
+        logger.info(f"Preflight completed in {report.get('elapsed', 0):.2f}s")
+        return unreachable
+    
+    def _run_scheduler(self, format_name, gaps, *options):
+        """Run the collection scheduler on the missing date ranges of every source; return its JSON output and log.
         
-        command = ["python3", mtgo_script, "--format", format_name, "--days", str(days)]
-        return self._run_command(command, f"MTGO data collection for {format_name}")
+        The output is None if the scheduler could not run or did not print its statistics.
+        """
+        scheduler_script = os.path.join(self.base_dir, "data-collection", "scheduler.py")
+        targets = [
+            [source, format_name, range_start, range_end]
+            for source, ranges in gaps.items()
+            for range_start, range_end in ranges
+        ]
+        command = [sys.executable, scheduler_script, "--targets", json.dumps(targets), "--json", *options]
+        
+        import subprocess
+        try:
+            result = subprocess.run(command, cwd=self.base_dir, capture_output=True, text=True)
+        except OSError as e:
+            logger.error(f"❌ Command not found: {e}")
+            return None, ""
+        try:
+            # The statistics are the last line of stdout
+            return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+        except (IndexError, json.JSONDecodeError):
+            logger.error(f"❌ Collection scheduler for {format_name} failed with exit code {result.returncode}")
+            if result.stderr:
+                logger.error(f"Stderr: {result.stderr}")
+            return None, result.stderr
     
-    def _collect_mtgmelee_data(self, format_name, days):
-        """Collect data from MTGMelee."""
-        logger.info(f"Collecting MTGMelee data for {format_name} (last {days} days)...")
+    def _collect_data(self, format_name, gaps):
+        """Collect the missing date ranges of every source in one scheduled run; return the sources that failed."""
+        logger.info(f"Collecting {format_name} data from {', '.join(gaps)}...")
+        
+        if not os.path.exists(os.path.join(self.base_dir, "data-collection", "scheduler.py")):
+            logger.warning("Collection scheduler not found. Skipping data collection.")
+            return set()
+        
+        # The sources are collected in parallel, each within the rate limit of its host
+        stats, log = self._run_scheduler(format_name, gaps)
+        if stats is None:
+            return set(gaps)
+        
+        failed = set()
+        for source in gaps:
+            source_stats = stats.get(source, {})
+            logger.info(f"{source}: {source_stats.get('saved', 0)} tournaments saved, "
+                        f"{source_stats.get('failed', 0)} failures.")
+            # A truncated listing leaves tournaments of the period uncollected
+            if (source not in stats or source_stats["failed"] or source_stats["listing_failures"]
+                    or source_stats.get("truncated")):
+                failed.add(source)
+        if failed:
+            logger.debug(f"Collection log: {log}")
+        else:
+            logger.info(f"✅ Data collection for {format_name} completed successfully")
+        return failed
+    
+    def plan_collection(self, format_name, start_date, end_date):
+        """Estimate the collection of the days the cache does not cover, without fetching any tournament.
         
-        mtgmelee_script = os.path.join(self.base_dir, "data-collection", "scraper", "mtgmelee", "main.py")
-        if not os.path.exists(mtgmelee_script):
-            logger.warning("MTGMelee scraper not found. Skipping MTGMelee data collection.")
-            return True
+        Returns {source: estimate} as computed by the collection scheduler's
+        planner (tournaments, requests, seconds at the current rate limits,
+        bytes), or None if the planner failed.
+        """
+        if self._calculate_days_between(start_date, end_date) is None:
+            return None
+        gaps = self._check_data_availability(format_name, start_date, end_date)
+        if not gaps:
+            return {}
         
-        command = ["python3", mtgmelee_script, "--format", format_name, "--days", str(days)]
-        return self._run_command(command, f"MTGMelee data collection for {format_name}")
+        logger.info(f"Planning the collection of {format_name} data from {', '.join(gaps)}...")
+        plan, _ = self._run_scheduler(format_name, gaps, "--plan")
+        if plan is None:
+            return None
+        for source, estimate in plan.items():
+            size = "unknown size" if estimate["bytes"] is None else f"{estimate['bytes'] / 1e6:.1f} MB"
+            logger.info(f"{source}: {estimate['tournaments']} tournaments to fetch, {estimate['requests']} requests, "
+                        f"{estimate['seconds'] / 3600:.2f} h at the current rate limits, {size}")
+            if estimate["listing_failures"] or estimate.get("truncated"):
+                logger.warning(f"{source}: {estimate['listing_failures']} listing failures and "
+                               f"{estimate.get('truncated', 0)} truncated listings; the estimate is a lower bound.")
+        return plan
     
     def _process_data(self, format_name):
         """Process and categorize the collected data."""
@@ -156,138 +260,272 @@ class MTGAnalyticsOrchestrator:
             logger.warning("Data parser not found. Skipping data processing.")
             return True
         
-        command = ["python3", parser_script, "--format", format_name]
+        command = [sys.executable, parser_script, "--format", format_name]
         return self._run_command(command, f"Data processing for {format_name}")
     
-    def _generate_visualizations(self, format_name, output_dir):
-        """Generate visualizations and analysis."""
-        logger.info(f"Generating visualizations for {format_name}...")
+    def _update_player_index(self, format_name):
+        """Ingest the tournaments processed since the last run into the player index of the format."""
+        from analytics.dataset import processed_data_dir
+        from analytics.player_index import update_index
         
-        r_script = os.path.join(self.base_dir, "visualization", "r-analysis", "generate_matrix.R")
-        if not os.path.exists(r_script):
-            logger.warning("R visualization script not found. Skipping visualization generation.")
+        index_dir = os.path.join(self.base_dir, "data", "player-index", format_name.lower())
+        try:
+            index, updated = update_index(index_dir, processed_data_dir(self.base_dir, format_name, self.config))
+            if updated:
+                logger.info(f"Player index updated from {updated} tournament files ({len(index.meta['players'])} players)")
             return True
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to update the player index: {e}")
+            return False
+    
+    def _report_engine(self, format_name):
+        """Return the report engine of a format, shared by the visualization and report steps."""
+        from analytics.dataset import processed_data_dir
+        from analytics.report_engine import ReportEngine
+        
+        if format_name not in self._report_engines:
+            self._report_engines[format_name] = ReportEngine(
+                processed_data_dir(self.base_dir, format_name, self.config),
+                os.path.join(self._analyses_dir(), ".report-cache", format_name)
+            )
+        return self._report_engines[format_name]
+    
+    def _analyses_dir(self):
+        """Return the analyses directory."""
+        return os.path.join(self.base_dir, self.config.get("data_storage", {}).get("analyses", "analyses"))
+    
+    def _generate_visualizations(self, format_name, start_date, end_date, output_dir):
+        """Generate the trends and the report charts, rendering independent charts in parallel."""
+        logger.info(f"Generating visualizations for {format_name}...")
+        
+        from analytics.charts import ChartRenderer, chart_jobs
+        
+        engine = self._report_engine(format_name)
+        trends = self._create_trends(engine, format_name, end_date, output_dir)
         
-        command = ["Rscript", r_script, "--format", format_name, "--output", output_dir]
-        return self._run_command(command, f"Visualization generation for {format_name}")
+        analysis_config = self.config.get("analysis", {})
+        renderer = ChartRenderer(
+            os.path.join(self._analyses_dir(), ".report-cache", format_name),
+            analysis_config.get("chart_format", "auto"),
+            analysis_config.get("chart_workers")
+        )
+        
+        try:
+            renderer.render(chart_jobs(engine.compute_sections(start_date, end_date), trends), output_dir)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to render charts: {e}")
+            return False
     
     def _create_analysis_report(self, format_name, start_date, end_date, output_dir):
-        """Create an HTML analysis report."""
+        """Create the HTML analysis report and its JSON data files."""
         logger.info("Creating analysis report...")
         
-        report_content = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>MTG Analytics Report - {format_name.title()}</title>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            margin: 40px;
-            background-color: #f5f5f5;
-        }}
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background-color: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            color: #2c3e50;
-            text-align: center;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-        }}
-        .info-box {{
-            background-color: #ecf0f1;
-            padding: 20px;
-            border-radius: 5px;
-            margin: 20px 0;
-        }}
-        .visualization {{
-            text-align: center;
-            margin: 30px 0;
-        }}
-        .visualization img {{
-            max-width: 100%;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-        }}
-        .footer {{
-            text-align: center;
-            margin-top: 40px;
-            color: #7f8c8d;
-            font-size: 0.9em;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>MTG Analytics Report - {format_name.title()} Format</h1>
-        
-        <div class="info-box">
-            <h2>Analysis Details</h2>
-            <p><strong>Format:</strong> {format_name.title()}</p>
-            <p><strong>Analysis Period:</strong> {start_date} to {end_date}</p>
-            <p><strong>Generated:</strong> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            <p><strong>Analysis ID:</strong> {self.analysis_timestamp}</p>
-        </div>
-        
-        <div class="visualization">
-            <h2>Matchup Matrix</h2>
-            <p>This matrix shows win rates between different archetypes.</p>
-            <img src="matchup_matrix.png" alt="Matchup Matrix" style="max-width: 100%; height: auto;">
-        </div>
-        
-        <div class="visualization">
-            <h2>Metagame Breakdown</h2>
-            <p>This chart shows the popularity of each archetype in the format.</p>
-            <img src="metagame_breakdown.png" alt="Metagame Breakdown" style="max-width: 100%; height: auto;">
-        </div>
-        
-        <div class="info-box">
-            <h2>Data Sources</h2>
-            <ul>
-                <li>MTGO Tournament Results</li>
-                <li>MTGMelee Tournament Data</li>
-            </ul>
-        </div>
-        
-        <div class="footer">
-            <p>Generated by MTG Analytics Pipeline</p>
-            <p>Analysis timestamp: {self.analysis_timestamp}</p>
-        </div>
-    </div>
-</body>
-</html>
-        """
-        
-        report_path = os.path.join(output_dir, "analysis_report.html")
+        engine = self._report_engine(format_name)
+        card_performance = self._card_performance(format_name, start_date, end_date)
+        extra_sections = {"card_performance": card_performance} if card_performance else None
         try:
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(report_content)
+            report_path = engine.build(output_dir, format_name, start_date, end_date, self.analysis_timestamp,
+                                       extra_sections)
             logger.info(f"Analysis report created: {report_path}")
             return report_path
         except Exception as e:
             logger.error(f"Failed to create analysis report: {e}")
             return None
     
+    def _card_performance(self, format_name, start_date, end_date):
+        """Return the per-archetype card performance section of the report, or None if it cannot be computed."""
+        from analytics.dataset import processed_data_dir
+        from analytics.card_performance import (
+            card_performance_section, DEFAULT_MIN_DECKS, DEFAULT_MIN_MATCHES, DEFAULT_CARD_LIMIT
+        )
+        
+        analysis_config = self.config.get("analysis", {})
+        store_dir = os.path.join(self.base_dir, "data", "card-store", format_name.lower())
+        try:
+            return card_performance_section(
+                store_dir, processed_data_dir(self.base_dir, format_name, self.config), start_date, end_date,
+                min_decks=analysis_config.get("card_min_decks", DEFAULT_MIN_DECKS),
+                min_matches=analysis_config.get("card_min_matches", DEFAULT_MIN_MATCHES),
+                limit=analysis_config.get("card_limit", DEFAULT_CARD_LIMIT)
+            )
+        except Exception as e:
+            logger.error(f"Failed to compute card performance: {e}")
+            self.run_summary["warnings"].append("card_performance_failed")
+            return None
+    
+    def _create_trends(self, engine, format_name, end_date, output_dir):
+        """Create the rolling trends dataset and chart for the year ending on end_date."""
+        from analytics.trends import build_trends, DEFAULT_WINDOWS
+        
+        analysis_config = self.config.get("analysis", {})
+        trend_days = analysis_config.get("trend_days", 365)
+        windows = analysis_config.get("trend_windows", DEFAULT_WINDOWS)
+        start_date = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=trend_days - 1)).strftime("%Y-%m-%d")
+        
+        try:
+            trends = build_trends(engine.tournament_aggregates(), output_dir, format_name, start_date, end_date, windows)
+            logger.info(f"Trends chart created: {os.path.join(output_dir, 'trends.html')}")
+            return trends
+        except Exception as e:
+            logger.error(f"Failed to create trends: {e}")
+            self.run_summary["warnings"].append("trends_failed")
+            return None
+    
+    def _analysis_key(self, format_name, start_date, end_date):
+        """Return the memoization key of an analysis request and the fingerprints it is built from.
+        
+        The data fingerprint covers the name, size and mtime of the processed
+        tournament files and the raw cache batches committed with tournaments of
+        the format, so tournaments collected but not processed yet change it; the
+        rules fingerprint covers the archetype rules and the analysis settings.
+        Only file metadata and the cache manifest are read, so the key is cheap to compute.
+        """
+        import hashlib
+        from analytics.dataset import list_tournament_files, processed_data_dir
+        
+        data_hash = hashlib.sha256()
+        for path in list_tournament_files(processed_data_dir(self.base_dir, format_name, self.config)):
+            stat = os.stat(path)
+            data_hash.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        for batch in self._raw_cache_batches(format_name):
+            data_hash.update(f"raw:{batch}\n".encode("utf-8"))
+        
+        rules_hash = hashlib.sha256(json.dumps(self.config.get("analysis", {}), sort_keys=True).encode("utf-8"))
+        rules_dir = self.config.get("formats_supported", {}).get(format_name.title(), {}).get("archetype_rules")
+        if rules_dir and os.path.isdir(os.path.join(self.base_dir, rules_dir)):
+            for directory, _, names in sorted(os.walk(os.path.join(self.base_dir, rules_dir))):
+                for name in sorted(names):
+                    stat = os.stat(os.path.join(directory, name))
+                    relative = os.path.relpath(os.path.join(directory, name), self.base_dir)
+                    rules_hash.update(f"{relative}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        
+        fingerprints = {"data": data_hash.hexdigest()[:16], "rules": rules_hash.hexdigest()[:16]}
+        key = f"{format_name}:{start_date}:{end_date}:{fingerprints['data']}:{fingerprints['rules']}"
+        return key, fingerprints
+    
+    def _raw_cache_batches(self, format_name):
+        """Return the ids of the committed raw cache batches holding tournaments of a format (or of no known format)."""
+        self._use_data_collection_modules()
+        from cache_manager import read_manifest
+        
+        format_name = format_name.lower()
+        begun = {}
+        batches = []
+        for record in read_manifest(self._raw_cache_dir()):
+            if record.get("state") == "begin":
+                begun[record["batch"]] = record["files"]
+            elif record.get("state") == "commit" and record.get("batch") in begun:
+                formats = {((entry.get("meta") or {}).get("format") or "").lower() for entry in begun.pop(record["batch"])}
+                if format_name in formats or "" in formats:
+                    batches.append(record["batch"])
+        return batches
+    
+    def _memo_path(self, format_name):
+        """Return the file memoizing the analyses of a format."""
+        return os.path.join(self._analyses_dir(), ".report-cache", format_name, "memo.json")
+    
+    def _load_memo(self, format_name):
+        """Load the memoized analyses of a format."""
+        try:
+            with open(self._memo_path(format_name), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def _memoized_analysis(self, format_name, key):
+        """Return the memoized analysis of a key if its report still exists, or None."""
+        entry = self._load_memo(format_name).get(key)
+        if entry and entry.get("report_path") and os.path.exists(entry["report_path"]):
+            return entry
+        return None
+    
+    def _memoize_analysis(self, format_name, key, fingerprints, analysis_dir, report_path):
+        """Record a completed analysis under its key."""
+        memo = self._load_memo(format_name)
+        # Entries whose analysis was removed (e.g. by cache maintenance) are dropped
+        memo = {k: v for k, v in memo.items() if os.path.exists(v.get("report_path") or "")}
+        memo[key] = {
+            "analysis_dir": analysis_dir,
+            "report_path": report_path,
+            "analysis_id": self.analysis_timestamp,
+            "fingerprints": fingerprints
+        }
+        
+        memo_path = self._memo_path(format_name)
+        os.makedirs(os.path.dirname(memo_path), exist_ok=True)
+        tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(memo, f, indent=2)
+        os.replace(tmp_path, memo_path)
+    
+    def _reuse_analysis(self, entry, open_browser, started):
+        """Complete the run with a memoized analysis instead of rebuilding it."""
+        logger.info(f"♻️ Identical analysis found (data and rules unchanged): {entry['analysis_dir']}")
+        self.run_summary.update({
+            "analysis_id": entry["analysis_id"],
+            "analysis_dir": entry["analysis_dir"],
+            "report_path": entry["report_path"],
+            "memoized": True
+        })
+        if open_browser:
+            self._open_in_browser(entry["report_path"])
+        if self.run_summary["warnings"]:
+            return self._finish_run("partial", EXIT_PARTIAL, started)
+        return self._finish_run("success", EXIT_SUCCESS, started)
+    
+    def _start_cache_maintenance(self):
+        """Start an incremental cache maintenance pass in the background."""
+        retention = self.config.get("data_storage", {}).get("retention", {})
+        if not retention.get("background", True):
+            return
+        
+        import subprocess
+        maintenance_script = os.path.join(self.base_dir, "data-collection", "cache_maintenance.py")
+        command = [sys.executable, maintenance_script, "--budget", str(retention.get("budget_seconds", 30))]
+        try:
+            os.makedirs(self._analyses_dir(), exist_ok=True)
+            with open(os.path.join(self._analyses_dir(), ".maintenance.log"), 'a') as log_file:
+                # Detached, so the pass never delays the end of the run
+                subprocess.Popen(command, cwd=self.base_dir, stdin=subprocess.DEVNULL, stdout=log_file,
+                                 stderr=subprocess.STDOUT, start_new_session=True)
+            logger.info("Cache maintenance started in the background.")
+        except OSError as e:
+            logger.warning(f"Cache maintenance could not start: {e}")
+    
     def _open_in_browser(self, file_path):
         """Open the analysis report in the default web browser."""
         try:
+            import webbrowser
             file_url = f"file://{os.path.abspath(file_path)}"
             webbrowser.open(file_url)
             logger.info(f"Opening analysis report in browser: {file_url}")
         except Exception as e:
             logger.error(f"Failed to open browser: {e}")
     
-    def run_analysis(self, format_name, start_date, end_date):
-        """Run the complete analysis pipeline."""
+    def _finish_run(self, status, exit_code, started):
+        """Record the outcome of a run in the run summary."""
+        self.run_summary["status"] = status
+        self.run_summary["exit_code"] = exit_code
+        self.run_summary["duration_seconds"] = round(time.time() - started, 3)
+        return exit_code in (EXIT_SUCCESS, EXIT_PARTIAL)
+    
+    def run_analysis(self, format_name, start_date, end_date, preflight=False, open_browser=True, force=False):
+        """Run the complete analysis pipeline, reusing an identical previous analysis unless forced."""
+        started = time.time()
+        # Report engines memoize the tournament aggregates, so each run starts fresh
+        self._report_engines = {}
+        self.run_summary = {
+            "format": format_name,
+            "start_date": start_date,
+            "end_date": end_date,
+            "analysis_id": self.analysis_timestamp,
+            "analysis_dir": None,
+            "report_path": None,
+            "memoized": False,
+            "warnings": []
+        }
+        
         logger.info(f"🚀 Starting MTG Analytics Pipeline")
         logger.info(f"Format: {format_name}")
         logger.info(f"Period: {start_date} to {end_date}")
@@ -296,30 +534,37 @@ class MTGAnalyticsOrchestrator:
         days = self._calculate_days_between(start_date, end_date)
         if days is None:
             logger.error("Invalid date range. Aborting analysis.")
-            return False
+            return self._finish_run("invalid_input", EXIT_USAGE, started)
         
         logger.info(f"Analysis period: {days} days")
         
-        # Create output directory
-        analyses_dir = os.path.join(self.base_dir, "analyses")
-        analysis_dir = os.path.join(analyses_dir, f"{format_name}_{self.analysis_timestamp}")
-        os.makedirs(analysis_dir, exist_ok=True)
-        logger.info(f"Analysis output directory: {analysis_dir}")
-        
         # Step 1: Check data availability
-        data_available = self._check_data_availability(format_name, start_date, end_date)
-        
-        # Step 2: Collect data if needed
+        gaps = self._check_data_availability(format_name, start_date, end_date)
+        self.run_summary["collection_gaps"] = gaps
+        data_available = not gaps
+        
+        # Without new data to collect or process, an identical request is answered from the memo
+        if data_available and not force:
+            key, fingerprints = self._analysis_key(format_name, start_date, end_date)
+            entry = self._memoized_analysis(format_name, key)
+            if entry:
+                return self._reuse_analysis(entry, open_browser, started)
+        
+        # Step 2: Collect the missing date ranges of each source
         if not data_available:
             logger.info("📥 Data collection phase")
             
-            # Collect MTGO data
-            if not self._collect_mtgo_data(format_name, days):
-                logger.warning("MTGO data collection failed, but continuing...")
+            unreachable_sources = self._run_preflight() if preflight else set()
+            for source in gaps:
+                if source in unreachable_sources:
+                    logger.warning(f"{source} unreachable. Skipping {source} data collection.")
+                    self.run_summary["warnings"].append(f"{source}_unreachable")
             
-            # Collect MTGMelee data
-            if not self._collect_mtgmelee_data(format_name, days):
-                logger.warning("MTGMelee data collection failed, but continuing...")
+            reachable_gaps = {source: ranges for source, ranges in gaps.items() if source not in unreachable_sources}
+            if reachable_gaps:
+                for source in self._collect_data(format_name, reachable_gaps):
+                    logger.warning(f"{source} data collection failed, but continuing...")
+                    self.run_summary["warnings"].append(f"{source}_collection_failed")
         else:
             logger.info("📋 Using existing cached data")
         
@@ -327,29 +572,233 @@ class MTGAnalyticsOrchestrator:
         logger.info("⚙️ Data processing phase")
         if not self._process_data(format_name):
             logger.error("Data processing failed. Aborting analysis.")
-            return False
+            return self._finish_run("failed", EXIT_FAILURE, started)
+        if not self._update_player_index(format_name):
+            self.run_summary["warnings"].append("player_index_failed")
+        
+        # Collection and processing may have changed the data: compute the key on the final data
+        key, fingerprints = self._analysis_key(format_name, start_date, end_date)
+        self.run_summary["fingerprints"] = fingerprints
+        if not force:
+            entry = self._memoized_analysis(format_name, key)
+            if entry:
+                return self._reuse_analysis(entry, open_browser, started)
+        
+        # Create output directory
+        analysis_dir = os.path.join(self._analyses_dir(), f"{format_name}_{self.analysis_timestamp}")
+        os.makedirs(analysis_dir, exist_ok=True)
+        self.run_summary["analysis_dir"] = analysis_dir
+        logger.info(f"Analysis output directory: {analysis_dir}")
         
+        # Sections and charts whose inputs did not change are reused from the report cache
         # Step 4: Generate visualizations
         logger.info("📊 Visualization generation phase")
-        if not self._generate_visualizations(format_name, analysis_dir):
+        if not self._generate_visualizations(format_name, start_date, end_date, analysis_dir):
             logger.warning("Visualization generation failed, but continuing...")
+            self.run_summary["warnings"].append("visualization_failed")
         
         # Step 5: Create analysis report
         logger.info("📄 Creating analysis report")
         report_path = self._create_analysis_report(format_name, start_date, end_date, analysis_dir)
+        self.run_summary["report_path"] = report_path
+        if not report_path:
+            self.run_summary["warnings"].append("report_failed")
         
         # Step 6: Open in browser
-        if report_path:
+        if report_path and open_browser:
             logger.info("🌐 Opening analysis in browser")
             self._open_in_browser(report_path)
         
         logger.info(f"✅ Analysis completed successfully!")
         logger.info(f"📁 Results saved to: {analysis_dir}")
         
-        return True
+        # Only complete outputs are reused; collection warnings are covered by the data fingerprint
+        if report_path and not OUTPUT_WARNINGS.intersection(self.run_summary["warnings"]):
+            self._memoize_analysis(format_name, key, fingerprints, analysis_dir, report_path)
+        
+        self._start_cache_maintenance()
+        
+        if self.run_summary["warnings"]:
+            return self._finish_run("partial", EXIT_PARTIAL, started)
+        return self._finish_run("success", EXIT_SUCCESS, started)
+
+def enqueue_job(queue_dir, format_name, start_date, end_date, force=False):
+    """Add an analysis job to a local queue directory and return its id."""
+    import uuid
+    pending_dir = os.path.join(queue_dir, "pending")
+    os.makedirs(pending_dir, exist_ok=True)
+    
+    job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    job = {"job_id": job_id, "format": format_name, "start_date": start_date, "end_date": end_date, "force": force}
+    
+    # Write under a temporary name so workers never pick up a partial job file
+    tmp_path = os.path.join(pending_dir, f".{job_id}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, os.path.join(pending_dir, f"{job_id}.json"))
+    return job_id
+
+class AnalysisWorker:
+    """Long-lived worker running analysis jobs from a local queue directory.
+    
+    Jobs are JSON files in <queue>/pending. A worker claims a job by renaming it
+    into <queue>/running, so several workers can share a queue, and writes the
+    run summary to <queue>/done once the job is finished.
+    
+    While a job runs, its worker touches the running file every lease / 3
+    seconds. A running job not touched for a whole lease belongs to a worker
+    that died: it is moved back to <queue>/pending to be run again.
+    """
+    
+    def __init__(self, orchestrator, queue_dir, poll_interval=5, lease=JOB_LEASE):
+        """Initialize the worker with an already configured orchestrator."""
+        self.orchestrator = orchestrator
+        self.pending_dir = os.path.join(queue_dir, "pending")
+        self.running_dir = os.path.join(queue_dir, "running")
+        self.done_dir = os.path.join(queue_dir, "done")
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.stopping = False
+        
+        for directory in (self.pending_dir, self.running_dir, self.done_dir):
+            os.makedirs(directory, exist_ok=True)
+    
+    def _stop(self, signum, frame):
+        logger.info("Stop requested. Finishing current job before exiting.")
+        self.stopping = True
+    
+    def _requeue_stale_jobs(self):
+        """Move the running jobs whose lease expired back to the pending queue."""
+        now = time.time()
+        for name in os.listdir(self.running_dir):
+            if not name.endswith(".json"):
+                continue
+            running_path = os.path.join(self.running_dir, name)
+            try:
+                if now - os.path.getmtime(running_path) < self.lease:
+                    continue
+                os.rename(running_path, os.path.join(self.pending_dir, name))
+            except FileNotFoundError:
+                # Finished, or requeued by another worker
+                continue
+            logger.warning(f"Job {name} was abandoned by its worker. Requeued.")
+    
+    def _claim_next_job(self):
+        """Claim the oldest pending job, or return None if the queue is empty."""
+        self._requeue_stale_jobs()
+        for name in sorted(os.listdir(self.pending_dir)):
+            if not name.endswith(".json"):
+                continue
+            pending_path = os.path.join(self.pending_dir, name)
+            running_path = os.path.join(self.running_dir, name)
+            try:
+                # A renamed file keeps its mtime: start the lease before the job enters running/
+                os.utime(pending_path)
+                os.rename(pending_path, running_path)
+            except FileNotFoundError:
+                # Claimed by another worker
+                continue
+            return running_path
+        return None
+    
+    def _heartbeat(self, running_path, finished):
+        """Renew the lease of a running job until it is finished."""
+        while not finished.wait(self.lease / 3):
+            try:
+                os.utime(running_path)
+            except OSError as e:
+                logger.warning(f"Cannot renew the lease of {running_path}: {e}")
+    
+    @staticmethod
+    def _load_job(running_path):
+        """Read a job file, raising ValueError if it is not a valid analysis request."""
+        with open(running_path, 'r') as f:
+            job = json.load(f)
+        if not isinstance(job, dict):
+            raise ValueError("a job must be a JSON object")
+        if not isinstance(job.get("format"), str) or not job["format"].strip():
+            raise ValueError("'format' must be a non-empty string")
+        for field in ("start_date", "end_date"):
+            if not isinstance(job.get(field), str):
+                raise ValueError(f"'{field}' must be a YYYY-MM-DD string")
+            datetime.strptime(job[field], "%Y-%m-%d")
+        if job["start_date"] > job["end_date"]:
+            raise ValueError("'start_date' is after 'end_date'")
+        for field in ("force", "preflight"):
+            if not isinstance(job.get(field, False), bool):
+                raise ValueError(f"'{field}' must be a boolean")
+        return job
+    
+    def _run_job(self, running_path):
+        """Run a claimed job and record its summary; malformed jobs are recorded as invalid input."""
+        import threading
+        
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(running_path, finished), daemon=True)
+        heartbeat.start()
+        try:
+            job = self._load_job(running_path)
+        except (OSError, ValueError) as e:
+            # json.JSONDecodeError is a ValueError
+            logger.error(f"Invalid job file {running_path}: {e}")
+            job = {"job_id": os.path.splitext(os.path.basename(running_path))[0]}
+            summary = {"status": "invalid_input", "exit_code": EXIT_USAGE, "error": str(e)}
+        else:
+            try:
+                self.orchestrator.analysis_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.orchestrator.run_analysis(
+                    job["format"], job["start_date"], job["end_date"],
+                    preflight=job.get("preflight", False), open_browser=False, force=job.get("force", False)
+                )
+                summary = dict(self.orchestrator.run_summary)
+            except Exception as e:
+                logger.error(f"Job {running_path} failed: {e}")
+                summary = {"status": "failed", "exit_code": EXIT_FAILURE, "error": str(e)}
+        finally:
+            finished.set()
+            heartbeat.join()
+        
+        summary["job"] = job
+        with open(os.path.join(self.done_dir, os.path.basename(running_path)), 'w') as f:
+            json.dump(summary, f, indent=2)
+        try:
+            os.remove(running_path)
+        except FileNotFoundError:
+            # Its lease expired during the run: requeued by another worker
+            logger.warning(f"Job {running_path} was requeued while it ran.")
+        
+        print(json.dumps(summary), flush=True)
+        return summary
+    
+    def run(self, max_jobs=None):
+        """Process jobs until stopped, or until max_jobs jobs have been run."""
+        import signal
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(f"Worker started. Watching {self.pending_dir}")
+        
+        processed = 0
+        while not self.stopping and (max_jobs is None or processed < max_jobs):
+            running_path = self._claim_next_job()
+            if running_path is None:
+                time.sleep(self.poll_interval)
+                continue
+            self._run_job(running_path)
+            processed += 1
+        
+        logger.info(f"Worker stopped after {processed} jobs.")
+        return processed
 
-def main():
-    """Main function to run the orchestrator."""
+def configure_logging(stream=None, level=None):
+    """Configure logging for the command line entry point, with the pipeline's shared setup."""
+    data_collection_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data-collection")
+    if data_collection_dir not in sys.path:
+        sys.path.insert(0, data_collection_dir)
+    from log_setup import configure_logging as configure
+    configure(stream, level)
+
+def main(argv=None):
+    """Main function to run the orchestrator; returns the exit code."""
     parser = argparse.ArgumentParser(
         description="MTG Analytics Pipeline Orchestrator",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -360,49 +809,145 @@ Examples:
   
   # Analyze Modern for the last month
   python orchestrator.py --format modern --start-date 2024-06-22 --end-date 2024-07-22
+  
+  # Cron-friendly run: no browser, JSON summary on stdout, logs on stderr
+  python orchestrator.py --format modern --start-date 2024-06-22 --end-date 2024-07-22 --headless
+  
+  # Queue a job, and process queued jobs with a long-lived worker
+  python orchestrator.py --format modern --start-date 2024-06-22 --end-date 2024-07-22 --enqueue
+  python orchestrator.py --worker
+  
+  # Estimate the requests, time and storage of a backfill before running it
+  python orchestrator.py --format modern --start-date 2024-01-01 --end-date 2024-07-22 --plan
+
+Exit codes in headless mode:
+  0 success, 1 pipeline failure, 2 invalid input, 3 completed with warnings
         """
     )
     
     parser.add_argument(
         "--format",
-        required=True,
         choices=["standard", "modern", "pioneer", "legacy", "vintage", "pauper"],
         help="MTG format to analyze"
     )
     
     parser.add_argument(
         "--start-date",
-        required=True,
         help="Start date for analysis (YYYY-MM-DD format)"
     )
     
     parser.add_argument(
         "--end-date",
-        required=True,
         help="End date for analysis (YYYY-MM-DD format)"
     )
     
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Check source connectivity in parallel before collecting and skip unreachable sources"
+    )
+    
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild the analysis even if an identical one (same data and rules) already exists"
+    )
+    
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Do not open a browser; log to stderr and print a JSON run summary on stdout"
+    )
+    
+    parser.add_argument(
+        "--enqueue",
+        nargs="?",
+        const="",
+        metavar="QUEUE_DIR",
+        help="Add the analysis to a job queue instead of running it (default: analyses/.queue)"
+    )
+    
+    parser.add_argument(
+        "--worker",
+        nargs="?",
+        const="",
+        metavar="QUEUE_DIR",
+        help="Run as a long-lived headless worker processing queued jobs (default: analyses/.queue)"
+    )
+    
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5,
+        help="Seconds between queue polls in worker mode"
+    )
+    
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Estimate the requests, time and storage of collecting the missing data, then exit"
+    )
+    
     parser.add_argument(
         "--verbose",
         action="store_true",
         help="Enable verbose logging"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    if args.worker is None and not (args.format and args.start_date and args.end_date):
+        parser.error("--format, --start-date and --end-date are required unless running with --worker")
     
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
+    # In headless mode, stdout is kept for machine-readable output
+    headless = args.headless or args.worker is not None
+    configure_logging(sys.stderr if headless else sys.stdout, "DEBUG" if args.verbose else None)
     
     # Create and run orchestrator
     orchestrator = MTGAnalyticsOrchestrator()
-    success = orchestrator.run_analysis(args.format, args.start_date, args.end_date)
+    default_queue_dir = os.path.join(orchestrator.base_dir, "analyses", ".queue")
+    
+    if args.enqueue is not None:
+        job_id = enqueue_job(args.enqueue or default_queue_dir, args.format, args.start_date, args.end_date, args.force)
+        logger.info(f"Job {job_id} queued.")
+        if headless:
+            print(json.dumps({"job_id": job_id, "status": "queued"}))
+        return EXIT_SUCCESS
+    
+    if args.plan:
+        plan = orchestrator.plan_collection(args.format, args.start_date, args.end_date)
+        if plan is None:
+            return EXIT_FAILURE
+        if not plan:
+            logger.info("Cached data covers the whole period. Nothing to collect.")
+        if headless:
+            print(json.dumps(plan, indent=2))
+        incomplete = [estimate for estimate in plan.values() if estimate["listing_failures"] or estimate.get("truncated")]
+        # Failed or truncated listings leave tournaments out of the estimates
+        if incomplete and all(estimate["listing_failures"] >= estimate["targets"] for estimate in plan.values()):
+            return EXIT_FAILURE
+        return EXIT_PARTIAL if incomplete else EXIT_SUCCESS
+    
+    if args.worker is not None:
+        worker = AnalysisWorker(orchestrator, args.worker or default_queue_dir, args.poll_interval)
+        worker.run()
+        return EXIT_SUCCESS
+    
+    success = orchestrator.run_analysis(
+        args.format, args.start_date, args.end_date,
+        preflight=args.preflight, open_browser=not headless, force=args.force
+    )
+    
+    if headless:
+        print(json.dumps(orchestrator.run_summary, indent=2))
+        return orchestrator.run_summary["exit_code"]
     
     if success:
         logger.info("🎉 Pipeline completed successfully!")
-        sys.exit(0)
+        return 0
     else:
         logger.error("💥 Pipeline failed!")
-        sys.exit(1)
+        return 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
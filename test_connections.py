@@ -10,10 +10,12 @@ import os
 import sys
 import json
 import time
-import requests
+import argparse
 import subprocess
+import importlib.util
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import urlparse
 
 # Configuration des couleurs pour les messages
 class Colors:
@@ -24,6 +26,36 @@ class Colors:
     ENDC = '\033[0m'
     BOLD = '\033[1m'
 
+# URLs testées pour chaque source
+CONNECTIVITY_TARGETS = {
+    'mtgo': [
+        "https://www.mtgo.com/decklists",
+        "https://www.mtgo.com/tournaments",
+        "https://www.mtgo.com/standings"
+    ],
+    'mtgmelee': [
+        "https://melee.gg",
+        "https://melee.gg/Decklists",
+        "https://melee.gg/Tournaments"
+    ],
+    'topdeck': [
+        "https://topdeck.gg",
+        "https://topdeck.gg/decklists",
+        "https://topdeck.gg/tournaments"
+    ]
+}
+
+PYTHON_PACKAGES = [
+    'requests', 'bs4', 'numpy', 'pandas',
+    'click', 'rich', 'tqdm', 'yaml'
+]
+
+SYSTEM_COMMANDS = ['git', 'python3', 'dotnet', 'R']
+
+# Budget d'import pour `orchestrator.py --help` et modules qui ne doivent pas y être chargés
+STARTUP_BUDGET_MS = 40
+STARTUP_FORBIDDEN_MODULES = ['requests', 'numpy', 'pandas', 'matplotlib', 'analytics']
+
 def log_info(message):
     """Affiche un message d'information."""
     print(f"{Colors.BLUE}[INFO]{Colors.ENDC} {message}")
@@ -41,16 +73,19 @@ def log_error(message):
     print(f"{Colors.RED}[ERROR]{Colors.ENDC} {message}")
 
 def test_url_connectivity(url, timeout=10):
-    """Teste la connectivité vers une URL."""
+    """Teste la connectivité vers une URL.
+    
+    Toute réponse HTTP (y compris 403 ou 429) prouve que l'hôte est joignable ;
+    seules les erreurs réseau et les timeouts comptent comme des échecs.
+    """
+    # Import différé : requests n'est chargé que si une URL est testée
+    import requests
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         response = requests.get(url, headers=headers, timeout=timeout)
-        if response.status_code == 200:
-            return True, response.status_code, response.elapsed.total_seconds()
-        else:
-            return False, response.status_code, response.elapsed.total_seconds()
+        return True, response.status_code, response.elapsed.total_seconds()
     except requests.exceptions.RequestException as e:
         return False, str(e), 0
 
@@ -58,11 +93,7 @@ def test_mtgo_connectivity():
     """Teste la connectivité vers MTGO."""
     log_info("Testing MTGO connectivity...")
     
-    mtgo_urls = [
-        "https://www.mtgo.com/decklists",
-        "https://www.mtgo.com/tournaments",
-        "https://www.mtgo.com/standings"
-    ]
+    mtgo_urls = CONNECTIVITY_TARGETS['mtgo']
     
     results = {}
     for url in mtgo_urls:
@@ -84,11 +115,7 @@ def test_mtgmelee_connectivity():
     """Teste la connectivité vers MTGMelee."""
     log_info("Testing MTGMelee connectivity...")
     
-    melee_urls = [
-        "https://melee.gg",
-        "https://melee.gg/Decklists",
-        "https://melee.gg/Tournaments"
-    ]
+    melee_urls = CONNECTIVITY_TARGETS['mtgmelee']
     
     results = {}
     for url in melee_urls:
@@ -110,11 +137,7 @@ def test_topdeck_connectivity():
     """Teste la connectivité vers Topdeck."""
     log_info("Testing Topdeck connectivity...")
     
-    topdeck_urls = [
-        "https://topdeck.gg",
-        "https://topdeck.gg/decklists",
-        "https://topdeck.gg/tournaments"
-    ]
+    topdeck_urls = CONNECTIVITY_TARGETS['topdeck']
     
     results = {}
     for url in topdeck_urls:
@@ -190,10 +213,7 @@ def test_dependencies():
     log_info("Testing dependencies...")
     
     # Test Python packages
-    python_packages = [
-        'requests', 'bs4', 'numpy', 'pandas',
-        'click', 'rich', 'tqdm', 'yaml'
-    ]
+    python_packages = PYTHON_PACKAGES
     
     results = {'python_packages': {}, 'system_commands': {}}
     
@@ -207,7 +227,7 @@ def test_dependencies():
             results['python_packages'][package] = False
     
     # Test system commands
-    system_commands = ['git', 'python3', 'dotnet', 'R']
+    system_commands = SYSTEM_COMMANDS
     
     for command in system_commands:
         try:
@@ -270,6 +290,170 @@ def test_data_availability():
     
     return results
 
+def percentile(values, pct):
+    """Calcule un percentile par interpolation linéaire."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def check_system_command(command):
+    """Vérifie qu'une commande système répond à --version."""
+    try:
+        result = subprocess.run([command, '--version'],
+                                capture_output=True, text=True, timeout=10)
+        if result.returncode == 0:
+            return True, result.stdout.strip().split('\n')[0]
+        return False, f"exit code {result.returncode}"
+    except Exception as e:
+        return False, str(e)
+
+def run_parallel_checks(probes=3, deadline=15.0, timeout=5.0, max_workers=16):
+    """Exécute toutes les sondes URL et les vérifications de dépendances en parallèle.
+    
+    Chaque URL est sondée `probes` fois ; les latences sont agrégées par hôte.
+    Les vérifications non terminées avant `deadline` secondes sont marquées en échec.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+    
+    started = time.time()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    
+    url_futures = {}
+    for source, urls in CONNECTIVITY_TARGETS.items():
+        for url in urls:
+            for _ in range(probes):
+                future = executor.submit(test_url_connectivity, url, timeout)
+                url_futures[future] = (source, url)
+    
+    command_futures = {
+        executor.submit(check_system_command, command): command
+        for command in SYSTEM_COMMANDS
+    }
+    
+    done, not_done = wait(list(url_futures) + list(command_futures), timeout=deadline)
+    # Les sondes encore en cours sont abandonnées : le thread se termine seul après son timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    hosts = {}
+    for future, (source, url) in url_futures.items():
+        host = urlparse(url).netloc
+        entry = hosts.setdefault(host, {
+            'source': source, 'probes': 0, 'successes': 0,
+            'timed_out': 0, 'latencies': [], 'errors': []
+        })
+        entry['probes'] += 1
+        if future not in done:
+            entry['timed_out'] += 1
+            continue
+        success, status, response_time = future.result()
+        if success:
+            entry['successes'] += 1
+            entry['latencies'].append(response_time)
+        elif str(status) not in entry['errors']:
+            entry['errors'].append(str(status))
+    
+    for host, entry in hosts.items():
+        latencies = entry.pop('latencies')
+        entry['reachable'] = entry['successes'] > 0
+        entry['latency'] = {
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None
+        }
+    
+    dependencies = {'python_packages': {}, 'system_commands': {}}
+    for package in PYTHON_PACKAGES:
+        # find_spec évite d'importer réellement les paquets lourds
+        dependencies['python_packages'][package] = importlib.util.find_spec(package) is not None
+    for future, command in command_futures.items():
+        dependencies['system_commands'][command] = future in done and future.result()[0]
+    
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'elapsed': round(time.time() - started, 3),
+        'deadline': deadline,
+        'deadline_exceeded': bool(not_done),
+        'hosts': hosts,
+        'dependencies': dependencies
+    }
+
+def print_parallel_report(report):
+    """Affiche le résultat du mode parallèle."""
+    for host, entry in report['hosts'].items():
+        latency = entry['latency']
+        if entry['reachable']:
+            log_success(f"{entry['source']} {host} - {entry['successes']}/{entry['probes']} probes OK, "
+                        f"p50 {latency['p50']:.2f}s, p90 {latency['p90']:.2f}s, p99 {latency['p99']:.2f}s")
+        else:
+            reason = entry['errors'][0] if entry['errors'] else 'deadline exceeded'
+            log_error(f"{entry['source']} {host} - unreachable ({reason})")
+    
+    for package, available in report['dependencies']['python_packages'].items():
+        if not available:
+            log_error(f"Python package {package} is not available")
+    for command, available in report['dependencies']['system_commands'].items():
+        if not available:
+            log_error(f"System command {command} is not available")
+    
+    if report['deadline_exceeded']:
+        log_warning(f"Deadline of {report['deadline']}s exceeded, pending checks were marked as failed")
+    log_info(f"Parallel checks completed in {report['elapsed']:.2f}s")
+
+def measure_import_time(args):
+    """Retourne les imports de premier niveau d'une commande Python (module -> µs cumulées)."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                            capture_output=True, text=True, timeout=60)
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        imports[name.strip()] = (int(fields[1]), not name.startswith('  '))
+    return imports
+
+def test_startup_time(budget_ms=STARTUP_BUDGET_MS):
+    """Vérifie que le démarrage de `orchestrator.py --help` reste dans le budget d'import."""
+    log_info("Testing orchestrator startup time...")
+    
+    orchestrator_script = str(Path(__file__).parent / 'orchestrator.py')
+    baseline = measure_import_time(['-c', 'pass'])
+    imports = measure_import_time([orchestrator_script, '--help'])
+    
+    # Seuls les imports absents du démarrage nu de l'interpréteur sont comptés
+    import_ms = sum(
+        cumulative for name, (cumulative, top_level) in imports.items()
+        if top_level and name not in baseline
+    ) / 1000
+    forbidden = sorted(
+        name for name in imports
+        if name.split('.')[0] in STARTUP_FORBIDDEN_MODULES
+    )
+    success = import_ms <= budget_ms and not forbidden
+    
+    if forbidden:
+        log_error(f"orchestrator.py --help imports heavy modules: {', '.join(forbidden)}")
+    if success:
+        log_success(f"orchestrator.py --help imports in {import_ms:.1f}ms (budget {budget_ms}ms)")
+    else:
+        log_error(f"orchestrator.py --help imports in {import_ms:.1f}ms (budget {budget_ms}ms)")
+    
+    return {
+        'orchestrator_help': {
+            'success': success,
+            'import_ms': round(import_ms, 2),
+            'budget_ms': budget_ms,
+            'forbidden_modules': forbidden
+        }
+    }
+
 def generate_report(all_results):
     """Génère un rapport de test."""
     report = {
@@ -311,6 +495,37 @@ def save_report(report, output_file='connection_test_report.json'):
 
 def main():
     """Fonction principale."""
+    parser = argparse.ArgumentParser(description="MTG Analytics Pipeline - Connection Test")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Run all URL probes and dependency checks concurrently")
+    parser.add_argument("--probes", type=int, default=3,
+                        help="Number of probes per URL in parallel mode")
+    parser.add_argument("--deadline", type=float, default=15.0,
+                        help="Overall deadline in seconds for parallel mode")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="Per-request timeout in seconds for parallel mode")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the parallel report as JSON on stdout (implies --parallel)")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="Only check the orchestrator.py --help import-time budget")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS,
+                        help="Import-time budget in milliseconds for orchestrator.py --help")
+    args = parser.parse_args()
+    
+    if args.check_startup:
+        result = test_startup_time(args.startup_budget)
+        return 0 if result['orchestrator_help']['success'] else 1
+    
+    if args.parallel or args.json:
+        report = run_parallel_checks(args.probes, args.deadline, args.timeout)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_parallel_report(report)
+        
+        all_reachable = all(entry['reachable'] for entry in report['hosts'].values())
+        return 0 if all_reachable and not report['deadline_exceeded'] else 1
+    
     print(f"{Colors.BOLD}MTG Analytics Pipeline - Connection Test{Colors.ENDC}")
     print("=" * 50)
     
@@ -326,6 +541,7 @@ def main():
     all_results['configuration_files'] = test_configuration_files()
     all_results['dependencies'] = test_dependencies()
     all_results['data_availability'] = test_data_availability()
+    all_results['startup_time'] = test_startup_time(args.startup_budget)
     
     # Générer et sauvegarder le rapport
     report = generate_report(all_results)
@@ -0,0 +1,19 @@
+"""
+Shared pytest setup: the pipeline's scripts import each other through their
+directories rather than as packages, so those directories are put on sys.path.
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (
+    BASE_DIR,
+    os.path.join(BASE_DIR, "data-collection"),
+    os.path.join(BASE_DIR, "data-collection", "scraper"),
+    os.path.join(BASE_DIR, "data-collection", "scraper", "mtgmelee"),
+    os.path.join(BASE_DIR, "data-collection", "scraper", "topdeck"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
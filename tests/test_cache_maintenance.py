@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+
+from cache_maintenance import CacheMaintenance
+from cache_manager import CacheWriter, is_cache_file, is_cached, read_cached, read_manifest
+from coverage import manifest_metadata
+
+
+def tournament(tournament_id, date):
+    return {"tournament_id": tournament_id, "source": "MTGO", "format": "Modern", "date": date, "decks": []}
+
+
+def write_cache(cache_dir, dates):
+    with CacheWriter(str(cache_dir), fsync=False) as writer:
+        for i, date in enumerate(dates):
+            writer.write_json(f"mtgo-{i}.json", tournament(f"mtgo-{i}", date))
+
+
+def maintenance(base_dir, policy):
+    config = {"data_storage": {"raw_cache": "raw", "retention": {"raw_cache": policy}}}
+    return CacheMaintenance(str(base_dir), config, budget_seconds=60, now=datetime(2024, 7, 31))
+
+
+def test_caches_are_not_archived_by_default(tmp_path):
+    write_cache(tmp_path / "raw", ["2023-01-05", "2024-07-20"])
+    stats = CacheMaintenance(str(tmp_path), {"data_storage": {"raw_cache": "raw"}}, now=datetime(2024, 7, 31)).run()
+
+    assert stats["archived"] == 0
+    assert not os.path.exists(tmp_path / "raw" / "archive")
+
+
+def test_archived_tournaments_stay_readable_and_keep_their_manifest_metadata(tmp_path):
+    cache_dir = tmp_path / "raw"
+    write_cache(cache_dir, ["2024-03-02", "2024-03-20", "2024-07-20"])
+
+    stats = maintenance(tmp_path, {"hot_days": 30}).run()
+
+    assert stats["archived"] == 2
+    assert sorted(name for name in os.listdir(cache_dir) if is_cache_file(name)) == ["mtgo-2.json"]
+    assert is_cached(str(cache_dir), "mtgo-0.json")
+    assert read_cached(str(cache_dir), "mtgo-1.json")["date"] == "2024-03-20"
+    records = read_manifest(str(cache_dir))
+    assert records[-1] == {"state": "archive", "names": ["mtgo-0.json", "mtgo-1.json"], "bundle": "2024-03.zip"}
+    # Archiving only appends its record: no batch is recovered and no dictionary is trained
+    assert [record["state"] for record in records] == ["begin", "commit", "archive"]
+    assert not os.path.exists(cache_dir / ".dictionaries")
+    files, _ = manifest_metadata(str(cache_dir))
+    assert sorted(files) == ["mtgo-0.json", "mtgo-1.json", "mtgo-2.json"]
+
+
+def test_evicted_tournaments_leave_the_manifest(tmp_path):
+    cache_dir = tmp_path / "raw"
+    write_cache(cache_dir, ["2024-01-02", "2024-07-20"])
+
+    stats = maintenance(tmp_path, {"max_age_days": 60}).run()
+
+    assert stats["evicted"] == 1
+    assert not is_cached(str(cache_dir), "mtgo-0.json")
+    assert read_manifest(str(cache_dir))[-1] == {"state": "evict", "names": ["mtgo-0.json"]}
+    files, _ = manifest_metadata(str(cache_dir))
+    assert sorted(files) == ["mtgo-1.json"]
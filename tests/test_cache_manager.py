@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+
+from cache_manager import CacheWriter, read_cached, read_manifest
+
+
+def tournament(tournament_id, date="2024-07-01"):
+    return {"tournament_id": tournament_id, "source": "MTGO", "format": "Modern", "date": date, "decks": []}
+
+
+def test_files_are_committed_in_batches(tmp_path):
+    with CacheWriter(str(tmp_path), batch_size=2, fsync=False) as writer:
+        for i in range(3):
+            writer.write_json(f"mtgo-{i}.json", tournament(f"mtgo-{i}"))
+
+    states = [record["state"] for record in read_manifest(str(tmp_path))]
+    assert states == ["begin", "commit", "begin", "commit"]
+    assert sorted(writer.committed()) == ["mtgo-0.json", "mtgo-1.json", "mtgo-2.json"]
+    assert writer.committed()["mtgo-0.json"]["meta"]["format"] == "Modern"
+    assert read_cached(str(tmp_path), "mtgo-2.json")["tournament_id"] == "mtgo-2"
+    assert writer.verify() == []
+
+
+def test_an_interrupted_batch_is_completed_on_recovery(tmp_path, monkeypatch):
+    writer = CacheWriter(str(tmp_path), fsync=False)
+    writer.write_json("mtgo-1.json", tournament("mtgo-1"))
+    writer.write_json("mtgo-2.json", tournament("mtgo-2"))
+
+    # Crash after the begin record, before any file is installed
+    def crash(name, batch):
+        raise RuntimeError("crash")
+    monkeypatch.setattr(writer, "_install", crash)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert not os.path.exists(tmp_path / "mtgo-1.json")
+    assert [record["state"] for record in read_manifest(str(tmp_path))] == ["begin"]
+
+    recovered = CacheWriter(str(tmp_path), fsync=False)
+    assert sorted(recovered.committed()) == ["mtgo-1.json", "mtgo-2.json"]
+    assert json.loads((tmp_path / "mtgo-1.json").read_text())["tournament_id"] == "mtgo-1"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_a_batch_interrupted_between_two_files_is_completed_on_recovery(tmp_path, monkeypatch):
+    writer = CacheWriter(str(tmp_path), fsync=False)
+    for i in range(3):
+        writer.write_json(f"mtgo-{i}.json", tournament(f"mtgo-{i}"))
+
+    # Crash after the first file of the batch is installed
+    install = writer._install
+    def crash_after_first(name, batch):
+        if os.path.exists(tmp_path / "mtgo-0.json"):
+            raise RuntimeError("crash")
+        install(name, batch)
+    monkeypatch.setattr(writer, "_install", crash_after_first)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert os.path.exists(tmp_path / "mtgo-0.json")
+    assert not os.path.exists(tmp_path / "mtgo-1.json")
+
+    recovered = CacheWriter(str(tmp_path), fsync=False)
+    assert sorted(recovered.committed()) == ["mtgo-0.json", "mtgo-1.json", "mtgo-2.json"]
+    assert [record["state"] for record in read_manifest(str(tmp_path))] == ["begin", "commit"]
+    assert recovered.verify() == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_recovery_removes_the_files_of_an_unrecorded_batch(tmp_path):
+    (tmp_path / ".mtgo-1.json.123-1-1.tmp").write_text("{}")
+    writer = CacheWriter(str(tmp_path), fsync=False)
+    assert writer.committed() == {}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_a_torn_manifest_line_is_ignored(tmp_path):
+    with CacheWriter(str(tmp_path), fsync=False) as writer:
+        writer.write_json("mtgo-1.json", tournament("mtgo-1"))
+    with open(tmp_path / "manifest.jsonl", "a") as f:
+        f.write('{"batch": "9-9-9", "sta')
+
+    assert sorted(CacheWriter(str(tmp_path), fsync=False).committed()) == ["mtgo-1.json"]
+
+
+def test_a_dictionary_is_trained_once_the_cache_is_large_enough(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    from cache_manager import MIN_TRAINING_SAMPLES, load_dictionary
+
+    with CacheWriter(str(tmp_path), fsync=False, compression="zstd") as writer:
+        for i in range(MIN_TRAINING_SAMPLES * 10):
+            payload = tournament(f"mtgo-{i}")
+            payload["decks"] = [{"player": f"Player {i} {j}", "mainboard": [
+                {"card_name": f"Card {(i * j + k) % 97}", "count": k % 4 + 1} for k in range(30)
+            ]} for j in range(8)]
+            writer.write_json(f"mtgo-{i}.json", payload)
+    assert writer.codec.dict_id == 0
+    assert load_dictionary(str(tmp_path)) is None
+
+    with CacheWriter(str(tmp_path), fsync=False, compression="zstd") as writer:
+        writer.write_json("mtgo-new.json", tournament("mtgo-new"))
+    assert writer.codec.dict_id != 0
+    assert load_dictionary(str(tmp_path)).dict_id() == writer.codec.dict_id
+    with open(tmp_path / "mtgo-new.json.zst", "rb") as f:
+        assert zstandard.get_frame_parameters(f.read()).dict_id == writer.codec.dict_id
+    assert read_cached(str(tmp_path), "mtgo-new.json")["tournament_id"] == "mtgo-new"
+
+
+def test_an_interrupted_compressed_batch_is_completed_on_recovery(tmp_path, monkeypatch):
+    pytest.importorskip("zstandard")
+    with CacheWriter(str(tmp_path), fsync=False) as writer:
+        writer.write_json("mtgo-1.json", tournament("mtgo-1", "2024-06-01"))
+
+    writer = CacheWriter(str(tmp_path), fsync=False, compression="zstd")
+    writer.write_json("mtgo-1.json", tournament("mtgo-1", "2024-07-01"))
+    writer.write_json("mtgo-2.json", tournament("mtgo-2"))
+    def crash(name, batch):
+        raise RuntimeError("crash")
+    monkeypatch.setattr(writer, "_install", crash)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    recovered = CacheWriter(str(tmp_path), fsync=False)
+    assert sorted(recovered.committed()) == ["mtgo-1.json.zst", "mtgo-2.json.zst"]
+    # The compressed file replaces the plain one of the same tournament
+    assert not os.path.exists(tmp_path / "mtgo-1.json")
+    assert read_cached(str(tmp_path), "mtgo-1.json")["date"] == "2024-07-01"
+    assert read_cached(str(tmp_path), "mtgo-2.json")["tournament_id"] == "mtgo-2"
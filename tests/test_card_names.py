@@ -0,0 +1,69 @@
+from card_names import CardNameTable, build_table, clean_name, name_key, normalize_tournament
+
+SCRYFALL_CARDS = [
+    {"name": "Fire // Ice", "layout": "split", "card_faces": [{"name": "Fire"}, {"name": "Ice"}]},
+    {"name": "Delver of Secrets // Insectile Aberration", "layout": "transform",
+     "card_faces": [{"name": "Delver of Secrets"}, {"name": "Insectile Aberration"}]},
+    {"name": "Bonecrusher Giant // Stomp", "layout": "adventure",
+     "card_faces": [{"name": "Bonecrusher Giant"}, {"name": "Stomp"}]},
+    {"name": "Lim-Dûl's Vault", "layout": "normal"},
+    {"name": "Æther Vial", "layout": "normal"},
+    {"name": "Ice", "layout": "normal"},
+]
+
+
+def test_names_are_cleaned_and_keyed():
+    assert clean_name("  Fire/Ice ") == "Fire // Ice"
+    assert clean_name("Lim-Dûl’s   Vault") == "Lim-Dûl's Vault"
+    assert name_key("LIM-DUL'S VAULT") == name_key("Lim-Dûl’s Vault")
+    assert name_key("Aether Vial") == name_key("Æther Vial")
+
+
+def test_spellings_resolve_to_the_canonical_name():
+    table = CardNameTable(build_table(SCRYFALL_CARDS))
+    assert table.canonical("fire/ice") == "Fire // Ice"
+    assert table.canonical("Fire") == "Fire // Ice"
+    assert table.canonical("Delver of Secrets // Insectile Aberration") == "Delver of Secrets"
+    assert table.canonical("Insectile Aberration") == "Delver of Secrets"
+    assert table.canonical("Bonecrusher Giant // Stomp") == "Bonecrusher Giant"
+    assert table.canonical("Lim-Dul's Vault") == "Lim-Dûl's Vault"
+    assert table.canonical("aether vial") == "Æther Vial"
+    # A face named like another card does not shadow it
+    assert table.canonical("Ice") == "Ice"
+    # Unknown cards are only cleaned
+    assert table.canonical("Unknown  Card") == "Unknown Card"
+
+
+def test_normalize_tournament_merges_the_spellings_of_a_deck():
+    tournament = {"decks": [{
+        "mainboard": [
+            {"card_name": "Fire/Ice", "quantity": 2},
+            {"card_name": "Fire // Ice", "quantity": 1},
+            {"card_name": "Aether Vial", "quantity": 4},
+        ],
+        "sideboard": [{"card_name": "insectile aberration", "quantity": 3}],
+    }]}
+    normalize_tournament(tournament, CardNameTable(build_table(SCRYFALL_CARDS)))
+
+    deck = tournament["decks"][0]
+    assert deck["mainboard"] == [
+        {"card_name": "Fire // Ice", "quantity": 3},
+        {"card_name": "Æther Vial", "quantity": 4},
+    ]
+    assert deck["sideboard"] == [{"card_name": "Delver of Secrets", "quantity": 3}]
+
+
+def test_normalize_tournament_keeps_entries_without_a_name():
+    tournament = {"decks": [{"mainboard": [
+        {"card_name": None, "quantity": 3},
+        {"card_name": "Fire/Ice", "quantity": 2},
+        {"quantity": 1},
+        {"card_name": "Fire // Ice", "quantity": 1},
+    ]}]}
+    normalize_tournament(tournament, CardNameTable(build_table(SCRYFALL_CARDS)))
+
+    assert tournament["decks"][0]["mainboard"] == [
+        {"card_name": None, "quantity": 3},
+        {"card_name": "Fire // Ice", "quantity": 3},
+        {"quantity": 1},
+    ]
@@ -0,0 +1,39 @@
+import json
+import threading
+
+from analytics.card_store import CardCountStore, update_store
+
+
+def write_tournaments(data_dir, count):
+    data_dir.mkdir()
+    for i in range(count):
+        tournament = {
+            "tournament_id": f"t{i}", "source": "MTGO", "format": "Modern", "date": f"2024-05-{i + 1:02d}",
+            "decks": [{"deck_id": f"t{i}-{j}", "mainboard": [{"card_name": f"Card {j}", "quantity": 4}]}
+                      for j in range(3)]
+        }
+        (data_dir / f"t{i}.json").write_text(json.dumps(tournament), encoding="utf-8")
+
+
+def test_concurrent_updates_store_each_tournament_once(tmp_path):
+    write_tournaments(tmp_path / "data", 20)
+    store_dir = str(tmp_path / "store")
+    errors = []
+
+    def update():
+        try:
+            update_store(store_dir, str(tmp_path / "data"), batch_size=1)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=update) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors
+    store = CardCountStore(store_dir)
+    assert store.rows == 60
+    assert list(store.meta["tournaments"]) == [f"t{i}" for i in range(20)]
+    assert list(store.slice().deck_ids) == [f"t{i}-{j}" for i in range(20) for j in range(3)]
@@ -0,0 +1,60 @@
+import sys
+
+import numpy as np
+import pytest
+
+from analytics.confidence import beta_intervals, bootstrap_intervals, matchup_intervals
+
+
+def test_beta_intervals_are_the_posterior_quantiles():
+    beta = pytest.importorskip("scipy.stats").beta
+    low, high = beta_intervals([0, 7, 30], [0, 3, 70])
+
+    assert np.allclose(low, beta.ppf(0.025, [1, 8, 31], [1, 4, 71]))
+    assert np.allclose(high, beta.ppf(0.975, [1, 8, 31], [1, 4, 71]))
+
+
+def test_beta_intervals_without_scipy_match_the_exact_quantiles(monkeypatch):
+    exact_low, exact_high = beta_intervals([7, 30], [3, 70])
+    monkeypatch.setitem(sys.modules, "scipy.special", None)
+
+    low, high = beta_intervals([7, 30], [3, 70])
+
+    assert np.allclose(low, exact_low, atol=0.01)
+    assert np.allclose(high, exact_high, atol=0.01)
+
+
+def test_bootstrap_intervals_follow_the_binomial_spread():
+    low, high = bootstrap_intervals([60, 10, 0], [40, 0, 0])
+
+    # Normal approximation of 60 wins in 100 matches: 0.6 +/- 1.96 * 0.049
+    assert low[0] == pytest.approx(0.504, abs=0.02)
+    assert high[0] == pytest.approx(0.696, abs=0.02)
+    assert (low[1], high[1]) == (1.0, 1.0)
+    assert np.isnan(low[2]) and np.isnan(high[2])
+
+
+def test_bootstrap_intervals_do_not_depend_on_the_batch_size():
+    wins, losses = np.arange(40), np.arange(40)[::-1]
+
+    low, high = bootstrap_intervals(wins, losses, resamples=4000)
+    batched_low, batched_high = bootstrap_intervals(wins, losses, resamples=4000, batch_size=4000 * 3)
+
+    assert np.allclose(low, batched_low, atol=0.03)
+    assert np.allclose(high, batched_high, atol=0.03)
+
+
+@pytest.mark.parametrize("method", ["beta", "bootstrap"])
+def test_mirror_matches_have_no_interval(method):
+    aggregate = {"matchups": {
+        "Burn": {"Burn": [5, 5, 0], "Tron": [6, 4, 0]},
+        "Tron": {"Burn": [4, 6, 0]}
+    }}
+
+    result = matchup_intervals(aggregate, ["Burn", "Tron"], method)
+
+    assert result["intervals"][0][0] is None
+    low, high = result["intervals"][0][1]
+    assert low < 0.6 < high
+    assert result["overall"][0]["matches"] == 10
+    assert result["overall"][0]["interval"] == result["intervals"][0][1]
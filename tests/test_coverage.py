@@ -0,0 +1,61 @@
+from cache_manager import CacheWriter
+from coverage import covered_days, gap_ranges, missing_days
+
+
+def write_tournament(writer, name, date, source="MTGO", format_name="Modern"):
+    writer.write_json(name, {"tournament_id": name[:-5], "source": source, "format": format_name,
+                             "date": date, "decks": []})
+
+
+def test_recorded_coverage_leaves_only_the_other_days_missing(tmp_path):
+    writer = CacheWriter(str(tmp_path), fsync=False, settle_days=0)
+    writer.record_coverage("mtgo", "Modern", "2024-07-02", "2024-07-03")
+
+    missing = missing_days(str(tmp_path), ["mtgo", "topdeck"], "modern", "2024-07-01", "2024-07-04")
+    assert missing == [
+        ("mtgo", "modern", "2024-07-01"),
+        ("mtgo", "modern", "2024-07-04"),
+        ("topdeck", "modern", "2024-07-01"),
+        ("topdeck", "modern", "2024-07-02"),
+        ("topdeck", "modern", "2024-07-03"),
+        ("topdeck", "modern", "2024-07-04"),
+    ]
+
+
+def test_a_missing_cache_misses_every_day(tmp_path):
+    missing = missing_days(str(tmp_path / "none"), ["mtgo"], "Modern", "2024-07-01", "2024-07-02")
+    assert [day for _, _, day in missing] == ["2024-07-01", "2024-07-02"]
+
+
+def test_future_days_are_not_missing(tmp_path):
+    assert missing_days(str(tmp_path), ["mtgo"], "modern", "2999-01-01", "2999-01-02") == []
+
+
+def test_cached_tournaments_only_cover_days_before_coverage_records(tmp_path):
+    with CacheWriter(str(tmp_path), fsync=False, settle_days=0) as writer:
+        write_tournament(writer, "mtgo-1.json", "2024-06-01T10:00:00")
+        write_tournament(writer, "mtgo-2.json", "2024-07-10T10:00:00")
+        write_tournament(writer, "topdeck-1.json", "2024-07-10", source="Topdeck")
+    assert covered_days(str(tmp_path))[("mtgo", "modern")] == {"2024-06-01", "2024-07-10"}
+
+    # An interrupted run saved mtgo-2 after coverage started being recorded
+    writer.record_coverage("mtgo", "modern", "2024-07-01", "2024-07-05")
+    covered = covered_days(str(tmp_path))
+    assert "2024-06-01" in covered[("mtgo", "modern")]
+    assert "2024-07-10" not in covered[("mtgo", "modern")]
+    assert covered[("topdeck", "modern")] == {"2024-07-10"}
+
+
+def test_gap_ranges_group_contiguous_days_per_source():
+    missing = [
+        ("mtgo", "modern", "2024-07-01"),
+        ("mtgo", "modern", "2024-07-02"),
+        ("mtgo", "modern", "2024-07-04"),
+        ("topdeck", "modern", "2024-06-30"),
+        ("topdeck", "modern", "2024-07-01"),
+    ]
+    assert gap_ranges(missing) == {
+        "mtgo": [("2024-07-01", "2024-07-02"), ("2024-07-04", "2024-07-04")],
+        "topdeck": [("2024-06-30", "2024-07-01")],
+    }
+    assert gap_ranges([]) == {}
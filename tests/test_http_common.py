@@ -0,0 +1,114 @@
+from http_common import CircuitBreaker, HttpClient, RateLimiter, RetryPolicy
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+        self.sent_headers = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.sent_headers.append(headers)
+        return FakeResponse(self.status_codes.pop(0))
+
+
+def client(status_codes, max_retries=2):
+    http = HttpClient(RateLimiter(6000, 100000), RetryPolicy(0, 0), CircuitBreaker(5, 60), max_retries)
+    session = FakeSession(status_codes)
+    http._session = lambda: session
+    return http, session
+
+
+def test_a_token_refresh_does_not_use_a_retry_attempt():
+    http, session = client([401, 500, 200])
+
+    response = http.request("GET", "https://api.example/x", headers={"Authorization": "Bearer old"},
+                            on_unauthorized=lambda: {"Authorization": "Bearer new"})
+
+    assert response.status_code == 200
+    assert [headers["Authorization"] for headers in session.sent_headers] == ["Bearer old", "Bearer new", "Bearer new"]
+    assert http.get_run_summary()["retries"] == 1
+
+
+def test_a_failed_token_refresh_gives_up():
+    http, session = client([401, 200])
+
+    assert http.request("GET", "https://api.example/x", on_unauthorized=lambda: None) is None
+    assert len(session.sent_headers) == 1
+
+
+def test_a_second_401_is_not_refreshed_again():
+    http, session = client([401, 401, 200])
+    refreshes = []
+
+    response = http.request("GET", "https://api.example/x",
+                            on_unauthorized=lambda: refreshes.append(1) or {"Authorization": "Bearer new"})
+
+    assert response is None
+    assert len(refreshes) == 1
+    assert http.get_run_summary()["fatal_errors"] == 1
+
+
+def test_only_transient_statuses_are_retryable():
+    policy = RetryPolicy()
+
+    assert all(policy.is_retryable(status) for status in (408, 425, 429, 500, 502, 503))
+    assert not any(policy.is_retryable(status) for status in (400, 401, 403, 404, 410))
+
+
+def test_a_permanent_error_is_not_retried_and_counts_the_skipped_waits():
+    http, session = client([404, 200], max_retries=3)
+    http.retry_policy.base_delay = 2
+
+    assert http.get("https://api.example/x") is None
+    assert len(session.sent_headers) == 1
+    summary = http.get_run_summary()
+    assert summary["fatal_errors"] == 1
+    assert summary["retries"] == 0
+    # Two skipped attempts, each after a 2-second wait
+    assert 4 <= summary["time_saved"] < 5
+
+
+def test_the_circuit_opens_after_the_threshold_and_half_opens_after_the_timeout(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("http_common.time.time", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+
+    breaker.record_failure("host")
+    assert breaker.allow_request("host")
+    breaker.record_failure("host")
+    assert breaker.is_open("host")
+    assert not breaker.allow_request("host")
+
+    now[0] += 60
+    assert breaker.allow_request("host")
+    # Only one trial request passes while half-open
+    assert not breaker.allow_request("host")
+
+    breaker.record_success("host")
+    assert not breaker.is_open("host")
+    assert breaker.allow_request("host")
+
+
+def test_requests_to_an_open_circuit_are_skipped():
+    http, session = client([500, 500, 200], max_retries=3)
+    http.circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    http.timeout = 10
+
+    assert http.get("https://api.example/x") is None
+    assert http.get("https://api.example/y") is None
+
+    assert len(session.sent_headers) == 2
+    summary = http.get_run_summary()
+    assert summary["short_circuited"] == 1
+    assert summary["open_circuits"] == ["api.example"]
+    # One attempt abandoned after the circuit opened, then a full cycle of three skipped
+    assert summary["time_saved"] == 10 + 3 * 10
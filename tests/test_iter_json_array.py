@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from topdeck_client import iter_json_array
+
+ELEMENTS = [
+    {"TID": "a", "name": "Modern [Open] \"Weekly\"", "standings": [{"name": "Jöhn", "decklist": "4 Bolt"}]},
+    {"TID": "b", "name": "Braces } and ] in strings", "standings": []},
+    [1, 2.5, None, True],
+    "text with \\ and \" escapes",
+    42,
+    -1.5e3,
+    None,
+    {"nested": {"deep": [[{"}": "]"}]]}},
+]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10 ** 6])
+def test_elements_are_decoded_from_any_chunking(size):
+    data = json.dumps(ELEMENTS, ensure_ascii=False, indent=1).encode("utf-8")
+    assert list(iter_json_array(chunked(data, size))) == ELEMENTS
+
+
+def test_elements_are_yielded_before_the_array_ends():
+    chunks = iter([b'[{"TID": "a"}, ', b'{"TID": "b"}'])
+    elements = iter_json_array(chunks)
+    assert next(elements) == {"TID": "a"}
+    assert next(elements) == {"TID": "b"}
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+def test_empty_array():
+    assert list(iter_json_array([b" [ ] "])) == []
+
+
+def test_a_non_array_response_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"error": "unauthorized"}']))
+
+
+def test_a_truncated_array_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[{"TID": "a"}, {"TID": ']))
+
+
+def test_a_large_element_is_decoded_once(monkeypatch):
+    import topdeck_client
+    calls = []
+    loads = topdeck_client.json.loads
+    monkeypatch.setattr(topdeck_client.json, "loads", lambda text: calls.append(len(text)) or loads(text))
+
+    element = {"standings": [{"name": f"Player {i}", "decklist": "4 Lightning Bolt"} for i in range(2000)]}
+    data = json.dumps([element]).encode("utf-8")
+    assert list(iter_json_array(chunked(data, 100))) == [element]
+    assert len(calls) == 1
@@ -0,0 +1,70 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from mtgmelee_client import AuthManager
+
+
+def auth_manager(cache_path, expires_in):
+    manager = AuthManager("https://melee.example/login", "https://melee.example/refresh", str(cache_path),
+                          refresh_margin=300)
+    manager._username = "user"
+    manager._set_token("old", datetime.now() + timedelta(seconds=expires_in))
+    return manager
+
+
+def fake_refresh(manager, calls):
+    def refresh():
+        calls.append(manager)
+        time.sleep(0.05)
+        manager._set_token("new", datetime.now() + timedelta(hours=1))
+        manager._save_cached_token()
+        return True
+    return refresh
+
+
+def test_a_token_close_to_expiry_is_refreshed(tmp_path):
+    manager = auth_manager(tmp_path / "token.json", expires_in=60)
+    calls = []
+    manager._refresh = fake_refresh(manager, calls)
+
+    assert manager.get_headers() == {"Authorization": "Bearer new"}
+    assert manager.get_headers() == {"Authorization": "Bearer new"}
+    assert len(calls) == 1
+
+
+def test_a_fresh_token_is_not_refreshed(tmp_path):
+    manager = auth_manager(tmp_path / "token.json", expires_in=3600)
+    calls = []
+    manager._refresh = fake_refresh(manager, calls)
+
+    assert manager.get_headers() == {"Authorization": "Bearer old"}
+    assert not calls
+
+
+def test_workers_sharing_a_token_cache_refresh_once(tmp_path):
+    managers = [auth_manager(tmp_path / "token.json", expires_in=60) for _ in range(4)]
+    calls = []
+    for manager in managers:
+        manager._refresh = fake_refresh(manager, calls)
+
+    workers = [threading.Thread(target=manager.ensure_valid_token) for manager in managers]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(calls) == 1
+    assert all(manager.token == "new" for manager in managers)
+
+
+def test_a_rejected_token_is_not_adopted_again_from_the_cache(tmp_path):
+    manager = auth_manager(tmp_path / "token.json", expires_in=3600)
+    manager._save_cached_token()
+    calls = []
+    manager._refresh = fake_refresh(manager, calls)
+
+    # The server answered 401 with the cached token: it must be renewed
+    assert manager.refresh_token()
+    assert len(calls) == 1
+    assert manager.token == "new"
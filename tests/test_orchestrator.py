@@ -0,0 +1,26 @@
+import pytest
+
+import orchestrator
+from orchestrator import EXIT_FAILURE, EXIT_PARTIAL, EXIT_SUCCESS, MTGAnalyticsOrchestrator
+
+
+def estimate(targets=1, listing_failures=0, truncated=0):
+    return {"targets": targets, "tournaments": 3, "cached": 0, "listing_failures": listing_failures,
+            "truncated": truncated, "requests": 3, "seconds": 3, "bytes": 3000, "listing_requests": 1}
+
+
+@pytest.mark.parametrize("plan, exit_code", [
+    ({}, EXIT_SUCCESS),
+    ({"mtgo": estimate(), "topdeck": estimate()}, EXIT_SUCCESS),
+    ({"mtgo": estimate(truncated=1), "topdeck": estimate()}, EXIT_PARTIAL),
+    ({"mtgo": estimate(listing_failures=1), "topdeck": estimate()}, EXIT_PARTIAL),
+    ({"mtgo": estimate(targets=2, listing_failures=1)}, EXIT_PARTIAL),
+    ({"mtgo": estimate(listing_failures=1), "topdeck": estimate(listing_failures=1)}, EXIT_FAILURE),
+    (None, EXIT_FAILURE),
+])
+def test_plan_exit_codes(plan, exit_code, monkeypatch, capsys):
+    monkeypatch.setattr(MTGAnalyticsOrchestrator, "plan_collection", lambda self, *args: plan)
+    monkeypatch.setattr(orchestrator, "configure_logging", lambda *args: None)
+
+    assert orchestrator.main(["--format", "modern", "--start-date", "2024-07-01", "--end-date", "2024-07-22",
+                              "--plan", "--headless"]) == exit_code
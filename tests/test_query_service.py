@@ -0,0 +1,41 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from analytics.query_service import MetagameStore, create_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = MetagameStore(str(tmp_path))
+    store.formats = {"modern": {"dates": [], "aggregates": []}}
+    server = create_server(store, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method)) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_a_failed_reload_keeps_the_loaded_data(server, monkeypatch):
+    def fail():
+        raise OSError("disk unavailable")
+    monkeypatch.setattr(server.store, "load", fail)
+
+    status, body = request(server, "POST", "/reload")
+
+    assert status == 500
+    assert "disk unavailable" in body["error"]
+    assert request(server, "GET", "/formats") == (200, {"formats": ["modern"]})
@@ -0,0 +1,46 @@
+import json
+import threading
+
+from analytics.report_engine import ReportEngine
+
+
+def test_chart_titles_are_escaped_in_the_report(tmp_path):
+    data_dir = tmp_path / "data"
+    output_dir = tmp_path / "report"
+    data_dir.mkdir()
+    output_dir.mkdir()
+    title = "<img src=x onerror=alert(1)> Matchups"
+    (output_dir / "archetype_x.png").write_bytes(b"")
+    (output_dir / "charts.json").write_text(json.dumps([{"file": "archetype_x.png", "title": title}]))
+
+    engine = ReportEngine(str(data_dir), str(tmp_path / "cache"))
+    report_path = engine.build(str(output_dir), "modern", "2024-07-01", "2024-07-22", "<b>id</b>")
+
+    with open(report_path, encoding="utf-8") as f:
+        html = f.read()
+    assert "<img src=x" not in html
+    assert "<b>id</b>" not in html
+    assert '<h2>&lt;img src=x onerror=alert(1)&gt; Matchups</h2>' in html
+    assert 'alt="&lt;img src=x onerror=alert(1)&gt; Matchups"' in html
+
+
+def test_concurrent_engines_can_share_the_aggregate_cache(tmp_path):
+    engines = [ReportEngine(str(tmp_path / "data"), str(tmp_path / "cache")) for _ in range(4)]
+    errors = []
+
+    def save(engine, worker):
+        try:
+            for i in range(50):
+                engine._save_aggregate_cache({f"t{worker}-{i}.json": {"decks": i}})
+        except OSError as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=save, args=(engine, i)) for i, engine in enumerate(engines)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors
+    assert len(engines[0]._load_aggregate_cache()) == 1
+    assert [path.name for path in (tmp_path / "cache").iterdir()] == ["aggregates.json"]
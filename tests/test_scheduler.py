@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import scheduler
+from http_common import RateLimiter
+from scheduler import CollectionScheduler
+
+
+class FakeClient:
+    def get_run_summary(self):
+        return {"requests": 0}
+
+
+class FakeSource:
+    """Source listing one tournament per (date, size) pair of its target's format, recording the fetch order."""
+
+    name = "fake"
+    tournaments = {
+        "modern": [("2024-07-01", 32), ("2024-07-03", 8), ("2024-07-03", 64)],
+        "legacy": [("2024-07-02", 16), (None, 128)]
+    }
+    fetched = []
+
+    def __init__(self, refresh=False):
+        self.client = FakeClient()
+
+    def listing_groups(self, targets):
+        return [[target] for target in targets]
+
+    def list(self, targets):
+        return {target: [
+            {"name": f"fake-{target.format_name}-{i}.json", "date": date, "size": size,
+             "run": lambda writer, job=(target.format_name, date, size): self.fetch(job)}
+            for i, (date, size) in enumerate(self.tournaments[target.format_name])
+        ] for target in targets}
+
+    @property
+    def rate_limiter(self):
+        return RateLimiter(requests_per_minute=60, requests_per_hour=1000)
+
+    def fetch_requests(self, job):
+        return 1
+
+    def fetch(self, job):
+        self.fetched.append(job)
+        return 1, 0, 0
+
+
+def test_fetches_are_served_most_recent_first_then_largest_first(tmp_path, monkeypatch):
+    monkeypatch.setitem(scheduler.SOURCE_TYPES, "fake", FakeSource)
+    monkeypatch.setattr(FakeSource, "fetched", [])
+    # A single worker serves the queue in priority order
+    collection = CollectionScheduler(str(tmp_path), {"fake": {"scraping_config": {"workers": 1}}})
+    for format_name in ("modern", "legacy"):
+        collection.add_target("fake", format_name, datetime(2024, 7, 1), datetime(2024, 7, 4))
+
+    stats = collection.run()
+
+    assert FakeSource.fetched == [
+        ("modern", "2024-07-03", 64),
+        ("modern", "2024-07-03", 8),
+        ("legacy", "2024-07-02", 16),
+        ("modern", "2024-07-01", 32),
+        ("legacy", None, 128)
+    ]
+    assert stats["fake"]["saved"] == 5
+    assert stats["fake"]["covered"] == 2
+
+
+def test_a_plan_counts_failed_listings_and_fetches_nothing(tmp_path, monkeypatch):
+    class FailingSource(FakeSource):
+        def list(self, targets):
+            if targets[0].format_name == "legacy":
+                raise OSError("listing unavailable")
+            return super().list(targets)
+
+    monkeypatch.setitem(scheduler.SOURCE_TYPES, "fake", FailingSource)
+    monkeypatch.setattr(FakeSource, "fetched", [])
+    (tmp_path / "fake-modern-0.json").write_text("{}")
+    collection = CollectionScheduler(str(tmp_path), {})
+    for format_name in ("modern", "legacy"):
+        collection.add_target("fake", format_name, datetime(2024, 7, 1), datetime(2024, 7, 4))
+
+    plan = collection.plan()["fake"]
+
+    assert not FakeSource.fetched
+    assert (plan["targets"], plan["listing_failures"], plan["truncated"]) == (2, 1, 0)
+    assert (plan["tournaments"], plan["cached"], plan["requests"]) == (2, 1, 2)
+    assert plan["seconds"] == 2
+    assert plan["bytes"] is None
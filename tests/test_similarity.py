@@ -0,0 +1,53 @@
+import numpy as np
+
+from analytics.card_matrix import DeckCardMatrix
+from analytics.similarity import DeckSimilarityIndex, cluster_unclassified_decks
+
+
+def deck(deck_id, cards, archetype=None):
+    return {"deck_id": deck_id, "archetype": archetype,
+            "mainboard": [{"card_name": card, "quantity": 4} for card in cards]}
+
+
+BURN = [f"Burn {i}" for i in range(15)]
+CONTROL = [f"Control {i}" for i in range(15)]
+
+
+def test_near_duplicates_returns_every_pair_of_a_bucket():
+    matrix = DeckCardMatrix.from_decks([deck(f"d{i}", BURN) for i in range(3)] + [deck("other", CONTROL)])
+    index = DeckSimilarityIndex().fit(matrix)
+
+    pairs = {(left, right) for left, right, _ in index.near_duplicates(0.9)}
+    assert pairs == {("d0", "d1"), ("d0", "d2"), ("d1", "d2")}
+
+
+def test_large_buckets_are_capped_but_stay_connected_for_clustering():
+    matrix = DeckCardMatrix.from_decks([deck(f"d{i}", BURN) for i in range(10)])
+    index = DeckSimilarityIndex().fit(matrix)
+
+    assert len(index.near_duplicates(0.9, max_bucket_size=10)) == 45
+    # Each deck is paired with the next 3 decks of the bucket: pairs 1, 2 and 3 apart
+    assert len(index.near_duplicates(0.9, max_bucket_size=4)) == 9 + 8 + 7
+    assert len(np.unique(index.cluster(0.9))) == 1
+
+
+def test_signatures_match_a_deck_by_deck_minhash():
+    decks = [deck("a", BURN[:10]), deck("empty", []), deck("b", BURN[5:] + CONTROL[:3])]
+    index = DeckSimilarityIndex(num_perm=16, bands=4, chunk_size=16 * 15).fit(DeckCardMatrix.from_decks(decks))
+
+    for row in (0, 2):
+        pointer, features = index._features(index.matrix, np.array([row]))
+        expected = ((features[:, None] * index._a + index._b) >> np.uint64(32)).min(axis=0)
+        assert (index.signatures[row] == expected).all()
+    assert (index.signatures[1] == np.iinfo(np.uint32).max).all()
+
+
+def test_unclassified_decks_are_clustered_by_list():
+    decks = ([deck(f"burn{i}", BURN[:14] + [f"Flex {i}"]) for i in range(4)]
+             + [deck(f"control{i}", CONTROL) for i in range(3)]
+             + [deck("known", BURN, archetype="Burn")])
+    clusters = cluster_unclassified_decks(DeckCardMatrix.from_decks(decks), threshold=0.6)
+
+    assert [cluster["size"] for cluster in clusters] == [4, 3]
+    assert clusters[0]["deck_ids"] == ["burn0", "burn1", "burn2", "burn3"]
+    assert set(clusters[0]["core_cards"]) == set(BURN[:14])
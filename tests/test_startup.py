@@ -0,0 +1,7 @@
+import test_connections
+
+
+def test_orchestrator_help_stays_within_the_import_budget():
+    result = test_connections.test_startup_time()["orchestrator_help"]
+    assert not result["forbidden_modules"]
+    assert result["success"], f"{result['import_ms']}ms imported, budget {result['budget_ms']}ms"